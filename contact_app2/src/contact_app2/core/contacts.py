@@ -7,7 +7,7 @@ def create_contact(name: str, phone: str) -> Dict[str, str]:
     """
     创建联系人字典
     """
-    logger.info(f"成功创建联系人字典：{{'name': {name}, 'phone': {phone}}}")
+    logger.info("成功创建联系人字典：{'name': %s, 'phone': %s}", name, phone)
     return {"name": name, "phone": phone}
 
 def add_contact(contacts: List[Dict], name: str, phone: str) -> List[Dict]:
@@ -16,7 +16,7 @@ def add_contact(contacts: List[Dict], name: str, phone: str) -> List[Dict]:
     返回新列表
     """
     new_contact = create_contact(name, phone)
-    logger.info(f"成功添加联系人：{name} - {phone}")
+    logger.info("成功添加联系人：%s - %s", name, phone)
     return contacts + [new_contact]
 
 def find_contact(contacts: List[Dict], name: str) -> Dict | None:
@@ -25,9 +25,9 @@ def find_contact(contacts: List[Dict], name: str) -> Dict | None:
     """
     for contact in contacts:
         if contact["name"] == name:
-            logger.info(f"成功找到联系人：{name} - {contact['phone']}")
+            logger.info("成功找到联系人：%s - %s", name, contact['phone'])
             return contact
-    logger.info(f"未找到联系人：{name}")
+    logger.info("未找到联系人：%s", name)
     return None
 
 def delete_contact(contacts: List[Dict], name: str) -> List[Dict]:
@@ -39,9 +39,9 @@ def delete_contact(contacts: List[Dict], name: str) -> List[Dict]:
     # for i, contacts in enumerate(contacts):
     #     if contacts["name"] == name:
     #         contacts.pop(i)
-    #         logger.info(f"成功删除联系人：{name}")
+    #         logger.info("成功删除联系人：%s", name)
     #         return contacts # 返回新列表
-    # logger.info(f"未找到联系人：{name}")
+    # logger.info("未找到联系人：%s", name)
     # return contacts # 返回原列表
 
     # 以上是复杂的业务逻辑，下面是简单的业务逻辑
@@ -18,10 +18,10 @@ def ensure_data_dir():
     """
     确保data目录存在
     """
-    # logger.debug(f"确保data目录存在：{DATA_FILE.parent}")
+    # logger.debug("确保data目录存在：%s", DATA_FILE.parent)
     # DATA_FILE.parent.mkdir(exist_ok=True)
 
-    logger.debug(f"确保data目录存在：{DATA_DIR}")
+    logger.debug("确保data目录存在：%s", DATA_DIR)
     os.makedirs(DATA_DIR, exist_ok=True) # 自动创建目录
 
 def save_contacts(contacts: List[Dict]):
@@ -29,11 +29,11 @@ def save_contacts(contacts: List[Dict]):
     保存联系人到json
     """
     ensure_data_dir()
-    # logger.debug(f"保存联系人到json：{DATA_FILE}")
+    # logger.debug("保存联系人到json：%s", DATA_FILE)
     # with open(DATA_FILE, "w", encoding="utf-8") as f:
     #     json.dump(contacts, f, ensure_ascii=False, indent=2)
 
-    logger.debug(f"保存联系人到json：{CONTACTS_FILE}")
+    logger.debug("保存联系人到json：%s", CONTACTS_FILE)
     with open(CONTACTS_FILE, "w", encoding="utf-8") as f:
         json.dump(contacts, f, ensure_ascii=False, indent=2)
 
@@ -44,11 +44,11 @@ def load_contacts() -> List[Dict]:
     """
     # if not DATA_FILE.exists():
     #     return []
-    # logger.debug(f"从json文件加载联系人：{DATA_FILE}")
+    # logger.debug("从json文件加载联系人：%s", DATA_FILE)
     # with open(DATA_FILE, "r", encoding="utf-8") as f:
     #     return json.load(f)
 
-    logger.debug(f"从json文件加载联系人：{CONTACTS_FILE}")
+    logger.debug("从json文件加载联系人：%s", CONTACTS_FILE)
     if not os.path.exists(CONTACTS_FILE):
         return []
     with open(CONTACTS_FILE, "r", encoding="utf-8") as f:
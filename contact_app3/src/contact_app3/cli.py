@@ -3,6 +3,7 @@ import logging
 import click
 import os
 from dotenv import load_dotenv
+from contact_app3.log_setup import setup_logging
 from contact_app3.core.contacts import add_contact, find_contact, delete_contact
 from contact_app3.core.storage import load_contacts, save_contacts
 from contact_app3.models import Contact
@@ -13,15 +14,15 @@ load_dotenv()  # 加载 .env配置文件
 LOG_FILE = os.getenv("LOG_FILE", "contact_app3.log") #从配置读取，如果没有设置，就使用默认值"contact_app3.log"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
-# 🔧 配置日志：同时输出到控制台和文件
-logging.basicConfig(
-    # level=logging.INFO,
-    level=getattr(logging, LOG_LEVEL.upper(), logging.INFO), # 将字符串转换为日志级别，如果无法转换，使用默认级别INFO
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding="utf-8"),  # 写入文件
-        logging.StreamHandler(),  # 输出到终端
-    ],
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() in ("true", "1")  # 输出 JSON 行
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))  # INFO 日志的采样比例
+
+# 🔧 配置日志：同时输出到控制台和文件，由后台线程写，命令本身不用等磁盘
+setup_logging(
+    level=LOG_LEVEL,
+    log_file=LOG_FILE,
+    json_lines=LOG_JSON,
+    sample_rate=LOG_SAMPLE_RATE,
 )
 # 获取当前模块的日志器
 logger = logging.getLogger(__name__)
@@ -47,17 +48,17 @@ def cli(debug):
 def add(name, phone):
     """添加联系人"""
     # 记录用户的操作
-    logger.info(f"收到添加请求：name = {name}, phone ={phone}")
+    logger.info("收到添加请求：name = %s, phone =%s", name, phone)
 
     try:
         contacts = load_contacts() # 从"data/contacts.json"文件中加载通讯录对象列表
         contacts = add_contact(contacts, name, phone)
         save_contacts(contacts) # 保存通讯录对象列表到"data/contacts.json"文件中
-        logger.info(f"添加联系人成功：name = {name}, phone = {phone}") #成功记录
+        logger.info("添加联系人成功：name = %s, phone = %s", name, phone) #成功记录
         click.echo(click.style("✅ 添加成功: name = {name}, phone = {phone}", fg="green"))
     except Exception as e:
         # 记录错误 + 完整堆栈
-        logger.error(f"添加联系人失败：{e}", exc_info=True)  #记录错误堆栈
+        logger.error("添加联系人失败：%s", e, exc_info=True)  #记录错误堆栈
         click.echo(click.style("❌ 添加失败", fg="red", bold=True), err=True)
         raise click.Abort()
 
@@ -80,29 +81,29 @@ def list():
 @click.argument("name")
 def find(name):
     """查找联系人"""
-    logger.info(f"收到查找请求：name = {name}")
+    logger.info("收到查找请求：name = %s", name)
     contacts = load_contacts()  # 从"data/contacts.json"文件中获取通讯录对象列表
     found_contact = find_contact(contacts, name)
     if found_contact:
-        logger.info(f"找到联系人：name = {found_contact.name}, phone = {found_contact.phone}")
+        logger.info("找到联系人：name = %s, phone = %s", found_contact.name, found_contact.phone)
         click.echo(f"找到: {found_contact.name} - {found_contact.phone}")
     else:
-        logger.warning(f"未找到：name = {name}")
+        logger.warning("未找到：name = %s", name)
         click.echo(f"未找到: {name}")
 
 @cli.command()
 @click.argument("name")
 def delete(name):
     """删除联系人"""
-    logger.info(f"收到删除请求：name = {name}")
+    logger.info("收到删除请求：name = %s", name)
     contacts = load_contacts()
     if name not in (contact.name for contact in contacts):
-        logger.info(f"未找到联系人：name = {name}")
+        logger.info("未找到联系人：name = %s", name)
         click.echo(click.style("❌ 未找到联系人", fg="red"))
         return
     new_contacts = delete_contact(contacts, name)
     save_contacts(new_contacts)
-    logger.info(f"删除联系人成功：name = {name}")
+    logger.info("删除联系人成功：name = %s", name)
     click.echo(click.style("✅ 删除成功", fg="green"))
 
 if __name__ == "__main__":
@@ -22,7 +22,7 @@ def add_contact(contacts: List[Contact], name: str, phone: str) -> List[Contact]
             f"无效的联系人：{contact}，姓名不能为空，电话必须是11位，电话必须是数字"
         )
     contacts.append(contact)
-    logger.info(f"成功添加联系人：{name} - {phone}")
+    logger.info("成功添加联系人：%s - %s", name, phone)
     return contacts
 
 
@@ -34,9 +34,9 @@ def find_contact(contacts: List[Contact], name: str) -> Contact | None:
     """
     for contact in contacts:
         if contact.name == name:
-            logger.info(f"成功找到联系人：{name} - {contact.phone}")
+            logger.info("成功找到联系人：%s - %s", name, contact.phone)
             return contact
-    logger.info(f"未找到联系人：{name}")
+    logger.info("未找到联系人：%s", name)
     return None
 
 
@@ -50,9 +50,9 @@ def delete_contact(contacts: List[Contact], name: str) -> List[Contact]:
     # for i, contacts in enumerate(contacts):
     #     if contacts["name"] == name:
     #         contacts.pop(i)
-    #         logger.info(f"成功删除联系人：{name}")
+    #         logger.info("成功删除联系人：%s", name)
     #         return contacts # 返回新列表
-    # logger.info(f"未找到联系人：{name}")
+    # logger.info("未找到联系人：%s", name)
     # return contacts # 返回原列表
 
     # 以上是复杂的业务逻辑，下面是简单的业务逻辑
@@ -20,7 +20,7 @@ def save_contacts(contacts: List[Contact]):  # 传入的是Contact对象列表
     """
     保存联系人到json
     """
-    logger.debug(f"保存联系人到json：{CONTACTS_FILE}")
+    logger.debug("保存联系人到json：%s", CONTACTS_FILE)
 
     DATA_DIR.mkdir(exist_ok=True)
     data=[contact.to_dict() for contact in contacts] # 将对象列表转换为字典列表存到json文件中
@@ -32,7 +32,7 @@ def load_contacts() -> List[Contact]:  # 返回的是Contact对象列表
     """
     从json文件加载联系人
     """
-    logger.debug(f"从json文件加载联系人：{CONTACTS_FILE}")
+    logger.debug("从json文件加载联系人：%s", CONTACTS_FILE)
     if not CONTACTS_FILE.exists():
         return []
     with open(CONTACTS_FILE, "r", encoding="utf-8") as f:
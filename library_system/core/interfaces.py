@@ -1,4 +1,5 @@
 #  第二步：定义抽象接口（`core/interfaces.py`）
+from collections.abc import Iterable, Iterator
 from typing import Protocol
 from .models import Book, User
 
@@ -6,8 +7,40 @@ class BookRepository(Protocol): # 定义图书接口
     def get_by_isbn(self, isbn: str) -> Book | None: ... # 根据 isbn 获取图书
     def save(self,book: Book) -> None: ...  # 保存图书
     def list_all(self) -> list[Book]: ...  # 获取所有图书
+class BorrowerIndexedBookRepository(BookRepository, Protocol): # 可选能力：借阅人索引
+    def list_by_borrower(self, user_id: str) -> list[Book]: ... # 获取用户借阅的图书
+class BulkBookRepository(BookRepository, Protocol): # 可选能力：批量保存
+    def save_many(self, books: list[Book]) -> None: ... # 一批图书只持久化一次
+class PagedBookRepository(BookRepository, Protocol): # 可选能力：按 ISBN 游标分页
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None) -> Iterator[Book]: ... # 按 ISBN 升序逐本产出
+class SearchableBookRepository(BookRepository, Protocol): # 可选能力：全文检索
+    def search(self, query: str, limit: int = 20) -> list[Book]: ... # 按相关度排序
+class SuggestingBookRepository(BookRepository, Protocol): # 可选能力：前缀补全
+    def suggest(self, prefix: str, k: int = 10) -> list[str]: ... # 常见的排前面
+    def stats(self) -> dict: ... # 存储/索引的规模和内存占用
+class BatchReadBookRepository(BookRepository, Protocol): # 可选能力：批量读取
+    def get_many(self, isbns: Iterable[str]) -> dict[str, Book]: ... # 找不到的不在结果里
+class AtomicLoanBookRepository(BookRepository, Protocol): # 可选能力：原子借还
+    # “判断能不能借 + 改状态”在存储里一步完成（如带条件的 UPDATE），多进程同时借也安全
+    # 借书同时记下应还时间 due_at，还书时清掉
+    def try_borrow(self, isbn: str, user_id: str, due_at: float | None = None) -> bool: ... # 书存在且未借出才成功
+    def try_return(self, isbn: str) -> bool: ... # 书存在且已借出才成功
+class BatchLoanBookRepository(BookRepository, Protocol): # 可选能力：批量原子借还
+    # 整批在一个事务里逐本判断 + 修改，返回成功的 isbn
+    def try_borrow_many(self, isbns: list[str], user_id: str, due_at: float | None = None) -> list[str]: ...
+    def try_return_many(self, isbns: list[str]) -> list[str]: ...
+class OverdueIndexedBookRepository(BookRepository, Protocol): # 可选能力：逾期索引
+    # 应还时间 <= now 的书，最早到期的在前；按应还时间建了索引，不用扫描全库
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]: ...
 class UserRepository(Protocol): # 定义用户接口
     def get_by_id(self, user_id: str) -> User | None: ... # 根据 id 获取用户
     def save(self, user: User) -> None: ... # 保存用户
 
+def supports(repo: object, method: str) -> bool:
+    """仓库是否实现了某个可选能力。
+
+    只看类上有没有定义这个方法，这样 Mock 之类动态生成属性的对象不会被误判。
+    """
+    return callable(getattr(type(repo), method, None))
+
 # ✅ 这就是你学的 `Protocol` —— 定义“角色”，不绑定实现
\ No newline at end of file
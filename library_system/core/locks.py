@@ -0,0 +1,26 @@
+# 🔒 分段锁（`core/locks.py`）：同一本书的操作串行，不同的书互不阻塞
+import threading
+import zlib
+
+LOCK_STRIPES = 64  # 锁的段数：越多冲突越少，占用也越多
+
+
+class StripedLock:
+    """按 key 的哈希把锁分成 stripes 段。
+
+    用 crc32 而不是内置 hash()：内置 hash 对 str 每次启动都随机，
+    同一个 ISBN 落到哪一段在不同进程/测试里会不一样。
+    """
+
+    def __init__(self, stripes: int = LOCK_STRIPES, lock_factory=threading.Lock):
+        self._locks = [lock_factory() for _ in range(stripes)]
+
+    def _index(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % len(self._locks)
+
+    def for_key(self, key: str):
+        return self._locks[self._index(key)]
+
+    def for_keys(self, keys) -> list:
+        """多个 key 对应的锁，去重并按固定顺序排好，依次加锁就不会死锁"""
+        return [self._locks[i] for i in sorted({self._index(k) for k in keys})]
@@ -1,14 +1,33 @@
 # 🔧 第一步：定义核心模型（`core/models.py`）
-from dataclasses import dataclass
-@dataclass
+import heapq
+from dataclasses import dataclass, field
+@dataclass(slots=True)  # 没有 __dict__，百万本书时每个对象省下一大块内存
 class Book:
     isbn: str # ISBN是唯一的，这是图书的标识
     title: str # 书名
     author: str # 作者
     is_borrowed: bool = False # 是否借出
     borrowed_by: str | None = None # 借出用户ID
-@dataclass
+    due_at: float | None = None # 应还时间（Unix 时间戳，秒），没借出时为 None
+    version: int = field(default=0, compare=False) # 每次保存加一，API 用作 ETag
+@dataclass(slots=True)
 class User:
     user_id: str # 用户ID
     name: str # 姓名
+def to_dict(record) -> dict:
+    """模型 -> dict（slots 的类没有 __dict__）；比 dataclasses.asdict 快，不做深拷贝"""
+    return {name: getattr(record, name) for name in record.__slots__}
+def next_version(stored: Book | None, book: Book) -> int:
+    """保存时的新版本号：存储里现有的版本和书自带的版本取大的，再加一。
+
+    版本号只增不减：迁移、导入到新存储的书接着原来的版本往上加，
+    客户端手里旧存储的 ETag 不会撞上内容不同的同一个版本号
+    """
+    return max(0 if stored is None else stored.version, book.version) + 1
+def overdue_books(books, now: float, limit: int | None = None) -> list[Book]:
+    """逐本检查的退回方案：应还时间 <= now 的书，最早到期的在前"""
+    late = (b for b in books if b.due_at is not None and b.due_at <= now)
+    if limit is None:
+        return sorted(late, key=lambda b: (b.due_at, b.isbn))
+    return heapq.nsmallest(limit, late, key=lambda b: (b.due_at, b.isbn))
 # ✅ 用 `dataclass` 简化类，专注业务语义
\ No newline at end of file
@@ -1,49 +1,210 @@
 # ⚙️ 第三步：实现核心业务逻辑（`core/services.py`）
-from .models import Book
-from .interfaces import UserRepository, BookRepository
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from itertools import islice
+from .models import Book, overdue_books
+from .interfaces import UserRepository, BookRepository, supports
+from .locks import StripedLock
+from .text import rank_books, rank_completions
 import logging  # 👈 只用于 getLogger，不配置！
 # 创建一个 logger，名字通常是当前模块名
 logger = logging.getLogger(__name__)
+BULK_CHUNK_SIZE = 1000  # 批量导入时每批持久化一次
+
+# borrow_many / return_many 里每本书的结果
+OK = "ok"
+NOT_FOUND = "not_found"  # 没有这本书
+UNAVAILABLE = "unavailable"  # 借：已经借出；还：本来就没借出
+UNKNOWN_USER = "unknown_user"  # 借书的用户不存在
+LOAN_DAYS = 30  # 默认借期（天）
+DAY_SECONDS = 24 * 60 * 60
 
 class LibraryService:
-    def __init__(self, book_repo: BookRepository, user_repo: UserRepository):
+    def __init__(self, book_repo: BookRepository, user_repo: UserRepository, loan_days: float = LOAN_DAYS):
         self._book_repo = book_repo
         self._user_repo = user_repo
+        self._loan_seconds = loan_days * DAY_SECONDS
+        # 借书/还书是“读-判断-写”，同一本书必须串行；按 ISBN 分段加锁，不同的书可以并行
+        self._locks = StripedLock()
 
     def add_book(self, isbn: str, title: str, author: str) -> Book:  # 添加图书
         book = Book(isbn=isbn, title=title, author=author)
-        self._book_repo.save(book)
-        logger.info(f"图书 {title} 添加成功")
+        with self._locks.for_key(isbn):
+            self._book_repo.save(book)
+        logger.info("图书 %s 添加成功", title)
         return book
 
+    def add_books(self, books: Iterable[Book], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        """批量添加图书，每 chunk_size 本持久化一次，返回添加的数量"""
+        it = iter(books)
+        total = 0
+        while chunk := list(islice(it, chunk_size)):
+            if supports(self._book_repo, "save_many"):
+                self._book_repo.save_many(chunk)  # 一批只写一次
+            else:
+                for book in chunk:
+                    self._book_repo.save(book)
+            total += len(chunk)
+        logger.info("批量导入 %d 本图书", total)
+        return total
+
+    def _due_at(self) -> float:  # 现在借出的书的应还时间
+        return time.time() + self._loan_seconds
+
     def borrow_book(self, isbn: str, user_id: str) -> bool:  # 借阅图书
-        book = self._book_repo.get_by_isbn(isbn)
         user = self._user_repo.get_by_id(user_id)
-        if not book or not user:
-            return False
-        if book.is_borrowed:
-            return False
-        book.is_borrowed = True
-        book.borrowed_by = user_id
-        self._book_repo.save(book) 
-        logger.info(f"用户 {user.name} 借阅了图书 {book.title}")
+        if supports(self._book_repo, "try_borrow"):  # 存储自己保证原子性（多进程安全）
+            if not user:
+                return False
+            with self._locks.for_key(isbn):
+                if not self._book_repo.try_borrow(isbn, user_id, self._due_at()):
+                    return False
+            logger.info("用户 %s 借阅了图书 %s", user.name, isbn)
+            return True
+        with self._locks.for_key(isbn):
+            book = self._book_repo.get_by_isbn(isbn)
+            if not book or not user:
+                return False
+            if book.is_borrowed:
+                return False
+            book.is_borrowed = True
+            book.borrowed_by = user_id
+            book.due_at = self._due_at()
+            self._book_repo.save(book) 
+        logger.info("用户 %s 借阅了图书 %s", user.name, book.title)
         return True
     def return_book(self, isbn: str) -> bool:  # 还书
-        book = self._book_repo.get_by_isbn(isbn)
-        if not book or not book.is_borrowed:
-            return False
-        book.is_borrowed = False
-        book.borrowed_by = None
-        self._book_repo.save(book)
-        logger.info(f"图书 {book.title} 还书成功")
+        if supports(self._book_repo, "try_return"):
+            with self._locks.for_key(isbn):
+                if not self._book_repo.try_return(isbn):
+                    return False
+            logger.info("图书 %s 还书成功", isbn)
+            return True
+        with self._locks.for_key(isbn):
+            book = self._book_repo.get_by_isbn(isbn)
+            if not book or not book.is_borrowed:
+                return False
+            book.is_borrowed = False
+            book.borrowed_by = None
+            book.due_at = None
+            self._book_repo.save(book)
+        logger.info("图书 %s 还书成功", book.title)
         return True
     
+    def borrow_many(self, user_id: str, isbns: Iterable[str]) -> dict[str, str]:
+        """一个用户一次借多本：用户只查一次，整批只持久化一次。
+
+        返回 {isbn: OK / NOT_FOUND / UNAVAILABLE}，部分成功时成功的照样生效
+        """
+        isbns = list(dict.fromkeys(isbns))
+        user = self._user_repo.get_by_id(user_id)
+        if not user:
+            return dict.fromkeys(isbns, UNKNOWN_USER)
+        results = self._change_many(isbns, user_id)
+        done = sum(r == OK for r in results.values())
+        logger.info("用户 %s 批量借阅 %d/%d 本图书", user.name, done, len(isbns))
+        return results
+
+    def return_many(self, isbns: Iterable[str]) -> dict[str, str]:  # 批量还书
+        isbns = list(dict.fromkeys(isbns))
+        results = self._change_many(isbns, None)
+        done = sum(r == OK for r in results.values())
+        logger.info("批量还书 %d/%d 本", done, len(isbns))
+        return results
+
+    def _change_many(self, isbns: list[str], user_id: str | None) -> dict[str, str]:
+        # user_id 为 None 表示还书；整批的 ISBN 锁按固定顺序一起拿住
+        borrow = user_id is not None
+        due_at = self._due_at() if borrow else None
+        with ExitStack() as stack:
+            for lock in self._locks.for_keys(isbns):
+                stack.enter_context(lock)
+            if supports(self._book_repo, "try_borrow_many"):  # 如 sqlite：一个事务
+                if borrow:
+                    done = set(
+                        self._book_repo.try_borrow_many(isbns, user_id, due_at)
+                    )
+                else:
+                    done = set(self._book_repo.try_return_many(isbns))
+                failed = [isbn for isbn in isbns if isbn not in done]
+                found = self.get_books(failed) if failed else {}
+            else:
+                found = self.get_books(isbns)
+                changed = [b for b in found.values() if b.is_borrowed != borrow]
+                for book in changed:
+                    book.is_borrowed, book.borrowed_by = borrow, user_id
+                    book.due_at = due_at
+                if changed:
+                    if supports(self._book_repo, "save_many"):
+                        self._book_repo.save_many(changed)  # 整批只写一次
+                    else:
+                        for book in changed:
+                            self._book_repo.save(book)
+                done = {book.isbn for book in changed}
+        return {
+            isbn: OK if isbn in done else UNAVAILABLE if isbn in found else NOT_FOUND
+            for isbn in isbns
+        }
+
+    def get_books(self, isbns: Iterable[str]) -> dict[str, Book]:  # 批量获取图书
+        isbns = list(dict.fromkeys(isbns))  # 去重，保持顺序
+        if supports(self._book_repo, "get_many"):  # 如 sqlite：一条 SQL 查完
+            return self._book_repo.get_many(isbns)
+        found = {}
+        for isbn in isbns:
+            book = self._book_repo.get_by_isbn(isbn)
+            if book is not None:
+                found[isbn] = book
+        return found
+
+    def availability(self, isbns: Iterable[str]) -> dict[str, bool]:  # 批量查是否可借
+        isbns = list(dict.fromkeys(isbns))
+        books = self.get_books(isbns)
+        return {i: i in books and not books[i].is_borrowed for i in isbns}
+
     def is_available(self, isbn: str) -> bool:  # 图书是否可借阅
         book = self._book_repo.get_by_isbn(isbn)
         return book is not None and not book.is_borrowed
     def get_user_books(self, user_id: str) -> list[Book]:  # 获取用户借阅的图书
-        all_books = self._book_repo.list_all()
+        if supports(self._book_repo, "list_by_borrower"):  # 有借阅人索引就直接查
+            return self._book_repo.list_by_borrower(user_id)
+        all_books = self._book_repo.list_all()  # 否则退回全表扫描
         return [b for b in all_books if b.borrowed_by == user_id]
+
+    def overdue(
+        self, now: float | None = None, limit: int | None = None
+    ) -> list[Book]:  # 逾期未还的图书，最早到期的在前；now 缺省是当前时间
+        now = time.time() if now is None else now
+        if supports(self._book_repo, "list_overdue"):  # 走应还时间索引
+            return self._book_repo.list_overdue(now, limit)
+        return overdue_books(self._book_repo.list_all(), now, limit)  # 否则全表扫描
+
+    def iter_books(
+        self, after_isbn: str | None = None, limit: int | None = None
+    ) -> Iterator[Book]:  # 按 ISBN 顺序分页遍历图书，after_isbn 是上一页最后一本
+        if supports(self._book_repo, "iter_books"):
+            return self._book_repo.iter_books(after_isbn, limit)
+        books = sorted(self._book_repo.list_all(), key=lambda b: b.isbn)
+        if after_isbn is not None:
+            books = [b for b in books if b.isbn > after_isbn]
+        return iter(books if limit is None else books[:limit])
+
+    def search(self, query: str, limit: int = 20) -> list[Book]:  # 按书名/作者片段搜索
+        if supports(self._book_repo, "search"):  # 走倒排索引
+            return self._book_repo.search(query, limit)
+        return rank_books(self._book_repo.list_all(), query, limit)  # 否则逐本打分
+
+    def suggest(self, prefix: str, k: int = 10) -> list[str]:  # 书名/作者前缀补全
+        if supports(self._book_repo, "suggest"):
+            return self._book_repo.suggest(prefix, k)
+        return rank_completions(self._book_repo.list_all(), prefix, k)
+
+    def storage_stats(self) -> dict:  # 存储和索引的规模、内存占用、未落盘的修改
+        stats = self._book_repo.stats() if supports(self._book_repo, "stats") else {}
+        if supports(self._user_repo, "stats"):
+            stats["users"] = self._user_repo.stats()
+        return stats
     
 # ✅ **关键点**：
 
@@ -0,0 +1,70 @@
+# 🔤 文本切词（`core/text.py`）：全文检索的索引和查询都用这一套规则
+import heapq
+import re
+from collections import Counter
+from .models import Book
+
+_WORD = re.compile(r"[0-9a-z]+")  # 英文、数字按单词切
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")  # 连续的中日韩汉字
+TITLE_WEIGHT = 2  # 命中书名比命中作者更相关
+AUTHOR_WEIGHT = 1
+
+
+def tokenize(text: str, for_query: bool = False) -> set[str]:
+    """切词：英文按单词，汉字按相邻两个字（bigram）。
+
+    汉字之间没有空格，按字切噪音太大、按词切又需要词典，bigram 是常用的折中：
+    “西游记” -> “西游”“游记”。索引时额外存单字，这样只搜一个字也能命中；
+    查询时两个字以上只用 bigram，单字反而会把结果放得太宽。
+    """
+    text = text.lower()
+    tokens = set(_WORD.findall(text))
+    for run in _CJK.findall(text):
+        if len(run) == 1 or not for_query:
+            tokens.update(run)
+        tokens.update(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def book_terms(book: Book) -> dict[str, int]:
+    """一本书的所有词及权重：书名里的词权重高，书名和作者都有就相加"""
+    terms = dict.fromkeys(tokenize(book.title), TITLE_WEIGHT)
+    for term in tokenize(book.author):
+        terms[term] = terms.get(term, 0) + AUTHOR_WEIGHT
+    return terms
+
+
+def rank_books(books, query: str, limit: int) -> list[Book]:
+    """不依赖索引的兜底实现：逐本打分，要求命中查询里的所有词"""
+    tokens = tokenize(query, for_query=True)
+    if not tokens:
+        return []
+    scored = []
+    for book in books:
+        terms = book_terms(book)
+        if tokens <= terms.keys():
+            scored.append((-sum(terms[t] for t in tokens), book.isbn, book))
+    return [book for _, _, book in heapq.nsmallest(limit, scored)]
+
+
+def prefix_key(text: str) -> str:
+    """前缀补全用的归一化：不区分大小写；本来就是小写时复用原字符串，省内存"""
+    key = text.lower()
+    return text if key == text else key
+
+
+def rank_completions(books, prefix: str, k: int) -> list[str]:
+    """不依赖索引的兜底实现：统计所有以 prefix 开头的书名/作者，出现多的排前面"""
+    key = prefix_key(prefix)
+    if not key:
+        return []
+    counts = Counter()
+    labels = {}
+    for book in books:
+        for label in (book.title, book.author):
+            label_key = prefix_key(label)
+            if label_key.startswith(key):
+                counts[label_key] += 1
+                labels.setdefault(label_key, label)
+    best = heapq.nsmallest(k, counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return [labels[label_key] for label_key, _ in best]
@@ -0,0 +1,97 @@
+# 🏭 根据配置创建仓库：main.py / api/main.py 只需调用这里，不关心具体用哪种存储
+import logging
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_repos(settings: Settings):
+    """返回 (book_repo, user_repo)，配置了 CACHE_SIZE 时图书仓库外面再包一层读缓存"""
+    _check_workers(settings)
+    book_repo, user_repo = _create_storage(settings)
+    if settings.CACHE_SIZE > 0:
+        from infrastructure.caching_repo import CachingBookRepo
+
+        book_repo = CachingBookRepo(
+            book_repo, maxsize=settings.CACHE_SIZE, ttl=settings.CACHE_TTL
+        )
+    return book_repo, user_repo
+
+
+def _check_workers(settings: Settings) -> None:
+    if settings.WORKERS <= 1:
+        return
+    if settings.STORAGE != "sqlite":
+        # json 等后端的数据在每个进程自己的内存里，多个 worker 会互相覆盖文件
+        raise ValueError(
+            f"WEB_CONCURRENCY={settings.WORKERS}：多进程部署只支持 "
+            f"LIBRARY_STORAGE=sqlite，当前是 {settings.STORAGE}"
+        )
+    if settings.CACHE_SIZE > 0 and settings.CACHE_TTL is None:
+        # 借还走数据库的条件 UPDATE，不会丢更新；但缓存读到的可能是别的进程改之前的
+        logger.warning("多进程部署时读缓存可能读到旧数据，建议设置 LIBRARY_CACHE_TTL")
+
+
+def _json_user_repo(settings: Settings, data_lock):
+    from infrastructure.json_repos import JsonUserRepo
+
+    return JsonUserRepo(
+        settings.DATA_DIR / "users.json",
+        flush_delay=settings.FLUSH_DELAY,
+        flush_every=settings.FLUSH_EVERY,
+        data_lock=data_lock,
+    )
+
+
+def _create_storage(settings: Settings):
+    settings.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if settings.STORAGE == "sqlite":
+        from infrastructure.sqlite_repos import SqliteBookRepo, SqliteUserRepo
+
+        return SqliteBookRepo(settings.SQLITE_PATH), SqliteUserRepo(
+            settings.SQLITE_PATH
+        )
+    if settings.STORAGE not in ("json", "lazy", "sharded"):
+        raise ValueError(
+            f"未知的存储类型：{settings.STORAGE}（可选 json / sqlite / lazy / sharded）"
+        )
+    from infrastructure.file_lock import DataDirLock
+
+    # 加载、迁移之前先拿锁：同一个数据目录只能有一个进程在用，用户仓库关闭时释放
+    data_lock = DataDirLock(settings.DATA_DIR)
+    try:
+        return _json_book_repo(settings), _json_user_repo(settings, data_lock)
+    except BaseException:
+        data_lock.release()
+        raise
+
+
+def _json_book_repo(settings: Settings):
+    """数据放在 DATA_DIR 里、由本进程独占的几种图书仓库"""
+    if settings.STORAGE == "json":
+        from infrastructure.json_repos import JsonBookRepo
+
+        return JsonBookRepo(
+            settings.DATA_DIR / "books.json",
+            journal=settings.JOURNAL,
+            flush_delay=settings.FLUSH_DELAY,
+            flush_every=settings.FLUSH_EVERY,
+        )
+    if settings.STORAGE == "lazy":
+        from infrastructure.json_repos import read_books
+        from infrastructure.lazy_repos import LazyBookRepo
+
+        book_repo = LazyBookRepo(settings.DATA_DIR / "books.jsonl")
+        json_file = settings.DATA_DIR / "books.json"
+        if not book_repo.stats()["books"] and json_file.exists():
+            # 第一次用：导入（只读 books.json，版本号接着往上加，ETag 不会撞上）
+            book_repo.save_many(read_books(json_file))
+        return book_repo
+    from infrastructure.sharded_repos import ShardedBookRepo, is_migrated, migrate
+
+    shard_dir = settings.DATA_DIR / "books"
+    json_file = settings.DATA_DIR / "books.json"
+    if not is_migrated(shard_dir) and json_file.exists():
+        migrate(json_file, shard_dir, settings.SHARDS)  # 第一次用：转换现有数据
+    return ShardedBookRepo(shard_dir, settings.SHARDS)
+
@@ -0,0 +1,43 @@
+# 🔒 数据目录锁（`infrastructure/file_lock.py`）
+# json / lazy / sharded 的数据都在进程自己的内存里，两个进程打开同一个数据目录
+# 会互相覆盖文件。光看 WEB_CONCURRENCY 不够（uvicorn --workers 4 不设这个变量），
+# 所以打开存储前先对 DATA_DIR/.lock 加一把不阻塞的排他 flock：
+# 别的进程已经拿着锁就直接启动失败。进程退出（包括崩溃）时锁由操作系统释放，
+# 不会留下要手工删除的锁文件
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 flock：不加锁，只剩 WEB_CONCURRENCY 检查
+    fcntl = None
+
+LOCK_FILE = ".lock"
+
+
+class DataDirLock:
+    """拿到锁才能构造成功；release() 或进程退出时释放"""
+
+    def __init__(self, data_dir: Path):
+        self._path = data_dir / LOCK_FILE
+        # 锁的寿命就是这个句柄的寿命：一直开到 release()
+        self._file = open(self._path, "a+", encoding="utf-8")  # noqa: SIM115
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.seek(0)
+            holder = self._file.read().strip() or "?"
+            self._file.close()
+            raise RuntimeError(
+                f"数据目录 {data_dir} 已被进程 {holder} 占用：json / lazy / sharded "
+                "存储同时只能有一个进程打开，多进程部署请用 LIBRARY_STORAGE=sqlite"
+            ) from None
+        self._file.truncate(0)
+        self._file.write(str(os.getpid()))  # 只是方便排查是谁拿着锁
+        self._file.flush()
+
+    def release(self) -> None:
+        if not self._file.closed:
+            self._file.close()  # 关掉文件描述符，flock 随之释放
@@ -1,9 +1,19 @@
 # ✅ 新增：JSON 持久化实现
+import dataclasses
+import gc
 import json
-# import os
+import logging
+import marshal
+import os
+import threading
+import time
 from pathlib import Path
-from core.models import User, Book
+from core.models import User, Book, to_dict, next_version
+from infrastructure.group_commit import GroupCommitter
+from infrastructure.indexes import BookIndexes
+from infrastructure.write_behind import FLUSH_EVERY, WriteBehindFlusher
 # from core.interfaces import UserRepository, BookRepository
+logger = logging.getLogger(__name__)
 
 # E:\Projects\vscode\python-demo\library_system\data
 # 将数据文件放在项目根目录library_system\data
@@ -12,6 +22,7 @@ PROJECT_ROOT = _CURRENT_DIR.parent
 DATA_DIR = PROJECT_ROOT / "data"
 BOOKS_FILE = DATA_DIR / "books.json"
 USERS_FILE = DATA_DIR / "users.json"
+COMPACT_THRESHOLD = 4 * 1024 * 1024  # 日志超过 4MB 就合并回快照
 
 # 确保目录存在
 DATA_DIR.mkdir(exist_ok=True)
@@ -21,43 +32,360 @@ def _load_json(file_path: Path, default: dict) -> dict:
         return default
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
-# 保存数据
+# 保存数据：先写临时文件再 rename，写到一半崩溃也不会留下半个文件
 def _save_json(file_path: Path, data: dict) -> None:
-    with open(file_path, "w", encoding="utf-8") as f:
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, file_path)
+# 二进制快照放在 JSON 旁边：books.json -> books.snapshot.bin
+# 用 marshal 存成元组列表，加载比 json.load + Book(**dict) 快得多；
+# 快照里记下 JSON 的 mtime_ns 和大小，对不上（JSON 被改过）就作废重建。
+# 平时 save 只重写 JSON；快照在加载时发现过期、合并日志、close 的时候才写
+SNAPSHOT_VERSION = 1
 
+
+def _snapshot_path(file_path: Path) -> Path:
+    return file_path.with_name(file_path.stem + ".snapshot.bin")
+
+
+def _source_key(file_path: Path) -> tuple[int, int]:
+    st = file_path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _field_names(cls) -> tuple[str, ...]:
+    return tuple(f.name for f in dataclasses.fields(cls))
+
+
+def _load_snapshot(file_path: Path, fields: tuple[str, ...]) -> list | None:
+    try:
+        with open(_snapshot_path(file_path), "rb") as f:
+            # 整个读进来再 loads：marshal.load 直接读文件对象要慢好几倍
+            version, source, snapshot_fields, rows = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None  # 没有快照，或者快照坏了
+    if (version, source, snapshot_fields) != (
+        SNAPSHOT_VERSION,
+        _source_key(file_path),
+        fields,  # 模型加了字段也要作废
+    ):
+        return None
+    return rows
+
+
+def _save_snapshot(file_path: Path, fields: tuple[str, ...], rows: list) -> None:
+    path = _snapshot_path(file_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(
+                marshal.dumps((SNAPSHOT_VERSION, _source_key(file_path), fields, rows))
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:  # 快照只是加速用的，写不了不影响数据
+        logger.warning("写快照 %s 失败：%s", path, e)
+
+
+def _load_records(file_path: Path, cls, rebuild_snapshot: bool = True) -> list:
+    """加载 JSON 文件里的全部记录，快照有效就直接读快照。
+
+    rebuild_snapshot=False 时快照失效也不重建，只读不写（迁移、导入时读旧数据用）
+    """
+    if not file_path.exists():
+        return []
+    start = time.perf_counter()
+    fields = _field_names(cls)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # 一次创建几十万个对象会反复触发分代 GC，加载期间先关掉
+    try:
+        rows = _load_snapshot(file_path, fields)
+        if rows is not None:
+            records = [cls(*row) for row in rows]
+            source = "快照"
+        else:
+            records = [cls(**raw) for raw in _load_json(file_path, {}).values()]
+            source = "JSON"
+            if rebuild_snapshot:
+                _save_snapshot(file_path, fields, _to_rows(records, fields))
+                source = "JSON，已重建快照"
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    logger.info(
+        "加载 %s：%d 条，耗时 %.1f ms（%s）",
+        file_path.name,
+        len(records),
+        (time.perf_counter() - start) * 1000,
+        source,
+    )
+    return records
+
+
+def _to_rows(records, fields: tuple[str, ...]) -> list[tuple]:
+    return [tuple(getattr(r, name) for name in fields) for r in records]
+
+
+def _save_rows(file_path: Path, fields: tuple[str, ...], rows: list, snapshot: bool = False) -> None:
+    """把行写成 JSON（第一个字段是键）；snapshot=True 时用同一份行再写快照"""
+    _save_json(file_path, {row[0]: dict(zip(fields, row)) for row in rows})
+    if snapshot:
+        _save_snapshot(file_path, fields, rows)
+
+
+def _save_records(file_path: Path, records: dict, cls, snapshot: bool = False) -> None:
+    """保存 {key: 记录} 到 JSON，记录只遍历一次：要在持有锁的时候调用"""
+    fields = _field_names(cls)
+    _save_rows(file_path, fields, _to_rows(records.values(), fields), snapshot)
+
+
+# 日志文件放在快照旁边：books.json -> books.journal.jsonl
+def _journal_path(file_path: Path) -> Path:
+    return file_path.with_name(file_path.stem + ".journal.jsonl")
+
+
+def _read_journal(journal_file: Path):
+    """逐条产出日志里的记录（dict）"""
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 只可能是崩溃时最后一行没写完，丢掉即可
+                logger.warning("日志 %s 末尾有不完整的记录，已忽略", journal_file)
+                return
+
+
+def read_books(books_file: Path) -> list[Book]:
+    """只读地加载 books.json 连同没合并的日志。
+
+    和 JsonBookRepo(books_file).list_all() 结果一样，但不写快照、不合并日志，
+    迁移到别的存储时原文件保持原样
+    """
+    books = {book.isbn: book for book in _load_records(books_file, Book, False)}
+    journal_file = _journal_path(books_file)
+    if journal_file.exists():
+        for record in _read_journal(journal_file):
+            books[record["isbn"]] = Book(**record)
+    return list(books.values())
+
+# 延迟写盘时在 stats 里带上持久化滞后（还有多少秒的修改没落盘）
+def _write_behind_stats(flusher: WriteBehindFlusher | None) -> dict:
+    return {} if flusher is None else {"write_behind": flusher.stats()}
 # JSON 持久化实现
 class JsonBookRepo:
-    def __init__(self):
+    """图书仓库，数据存在 books.json。
+
+    journal=True 时每次 save 只往日志追加一行紧凑的 JSON 并 fsync，
+    并发的 save 通过组提交共用一次 fsync（见 group_commit.py）；
+    日志超过 compact_threshold 字节后再合并回 books.json（快照）。
+    flush_delay 是秒数时开启延迟写盘：save 只标记“脏”，后台线程最多每
+    flush_delay 秒（或每 flush_every 次修改）重写一次文件，见 write_behind.py。
+    """
+    def __init__(self, books_file: Path | None = None, journal: bool = False,
+                 compact_threshold: int = COMPACT_THRESHOLD,
+                 flush_delay: float | None = None, flush_every: int = FLUSH_EVERY):
+        self._file = books_file or BOOKS_FILE
+        self._journal_file = _journal_path(self._file)
+        self._use_journal = journal
+        self._compact_threshold = compact_threshold
+        self._journal = None  # 日志的追加句柄，第一次写入时才打开
+        self._journal_size = 0
+        # 多个线程同时 save 时，改字典和写文件都要串行，否则文件内容会交错
+        self._lock = threading.RLock()
+        self._committer = GroupCommitter(self._write_journal)
+        self._snapshot_stale = False  # JSON 重写过、快照还没跟上
         self._load_books()
+        self._flusher = None
+        if flush_delay is not None and not journal:  # 日志模式本来就只追加，不需要
+            self._flusher = WriteBehindFlusher(
+                self._flush_books, self._file.name, flush_delay, flush_every
+            )
     def _load_books(self):
-        raw_books = _load_json(BOOKS_FILE, {})  # 从本地文件加载json数据
-        self._books = {isbn: Book(**book) for isbn, book in raw_books.items()} # 将本地的json数据转换成Book对象
-    def _save_books(self):
-        raw_books = {isbn: book.__dict__ for isbn,book in self._books.items()} # 将Book对象转换成json数据
-        _save_json(BOOKS_FILE, raw_books) # 将json数据保存到本地文件
+        books = _load_records(self._file, Book)  # 从本地文件（或快照）加载
+        self._books = {book.isbn: book for book in books}
+        replayed = self._replay_journal()  # 快照之后的修改都在日志里
+        self._index = BookIndexes()
+        self._index.rebuild(self._books.values()) # 启动时建一次借阅人索引
+        if replayed and not self._use_journal:
+            self.compact()  # 之前用过日志模式，现在关掉了：先把日志合并掉
+    def _replay_journal(self) -> int:
+        if not self._journal_file.exists():
+            return 0
+        count = 0
+        for record in _read_journal(self._journal_file):
+            self._books[record["isbn"]] = Book(**record)
+            count += 1
+        self._journal_size = self._journal_file.stat().st_size
+        return count
+    def _save_books(self, snapshot: bool = False):
+        _save_records(self._file, self._books, Book, snapshot)  # 将最新的数据保存到本地文件
+        self._snapshot_stale = not snapshot
+    def _flush_books(self):
+        fields = _field_names(Book)
+        # 锁里只把图书转成元组（之后别的线程再改 Book 对象也不影响），写文件不挡住 save
+        with self._lock:
+            rows = _to_rows(self._books.values(), fields)
+        _save_rows(self._file, fields, rows)
+        self._snapshot_stale = True
+    def _save_snapshot_if_stale(self) -> None:
+        # 只在 JSON 和内存一致时调用（close 时非日志模式）：快照照内存里的写
+        if self._snapshot_stale:
+            fields = _field_names(Book)
+            _save_snapshot(self._file, fields, _to_rows(self._books.values(), fields))
+            self._snapshot_stale = False
+    def _append_journal(self, books: list[Book]):
+        # 在 self._lock 里排队，日志里的顺序和内存里修改的顺序一致
+        return self._committer.submit(
+            [
+                json.dumps(to_dict(book), ensure_ascii=False, separators=(",", ":"))
+                + "\n"
+                for book in books
+            ]
+        )
+    def _write_journal(self, lines: list[str]) -> None:
+        """组提交的 leader 调用：攒下的一批记录一次写入、一次 fsync"""
+        if self._journal is None:
+            # 追加句柄一直开着，compact / close 时关
+            self._journal = open(self._journal_file, "a", encoding="utf-8")  # noqa: SIM115
+        data = "".join(lines)
+        self._journal.write(data)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())  # 返回之前确实落盘
+        self._journal_size += len(data.encode("utf-8"))
+    def _wait_journal(self, batch) -> None:
+        # 在锁外面等：等待 fsync 的时候别的线程还能继续修改、排队
+        self._committer.wait(batch)
+        if self._journal_size >= self._compact_threshold:
+            with self._lock:
+                # 几个线程可能同时看到超过阈值：拿到锁再看一次，只有第一个去合并
+                if self._journal_size >= self._compact_threshold:
+                    self.compact()
+    def compact(self) -> None:
+        """把日志合并回快照：先写新快照，再清空日志"""
+        with self._lock:
+            self._committer.commit([])  # 等已经排队的记录写完；持有锁，不会再有新的
+            self._save_books(snapshot=True)
+            # 先写快照后清日志：中间崩溃的话，重放日志也只是重复覆盖，结果一样
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._journal_file.unlink(missing_ok=True)
+            self._journal_size = 0
+        logger.info("日志已合并到 %s", self._file)
+    def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.close()  # 把还没落盘的修改写完
+        with self._lock:
+            self._committer.commit([])
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if not self._use_journal:  # 日志模式的 JSON 比内存旧，快照等合并时再写
+                self._save_snapshot_if_stale()
     # 下面三个方法：BookRepository的实现：鸭子类型 + Protocol
     def get_by_isbn(self, isbn: str) -> Book | None:
         return self._books.get(isbn)
+    def get_many(self, isbns) -> dict[str, Book]:  # 批量获取，找不到的不在结果里
+        books = self._books
+        return {isbn: books[isbn] for isbn in isbns if isbn in books}
     def save(self, book: Book) -> None:
-        self._books[book.isbn] = book # 借书还书都要保存，放到_books里，key是isbn，不会重复
-        self._save_books()  # 每次保存都要将最新的数据保存到本地文件
+        batch = None
+        with self._lock:
+            book.version = next_version(self._books.get(book.isbn), book)
+            self._books[book.isbn] = book # 借书还书都要保存，放到_books里，key是isbn，不会重复
+            self._index.update(book)
+            if self._use_journal:
+                batch = self._append_journal([book])  # 日志模式：只追加一行
+            elif self._flusher is not None:
+                self._flusher.mark_dirty()  # 延迟写盘：交给后台线程
+            else:
+                self._save_books()  # 每次保存都要将最新的数据保存到本地文件
+        if batch is not None:
+            self._wait_journal(batch)
+    def save_many(self, books: list[Book]) -> None:
+        batch = None
+        with self._lock:
+            for book in books:
+                book.version = next_version(self._books.get(book.isbn), book)
+                self._books[book.isbn] = book
+            self._index.update_many(books)
+            if self._use_journal:
+                batch = self._append_journal(books)
+            elif self._flusher is not None:
+                self._flusher.mark_dirty(len(books))
+            else:
+                self._save_books()  # 整批只重写一次文件
+        if batch is not None:
+            self._wait_journal(batch)
     def list_all(self) -> list[Book]:
         return list(self._books.values()) # 获取所有图书
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        return [self._books[isbn] for isbn in self._index.borrowers.isbns_of(user_id)]
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        with self._lock:  # 堆和字典一起读，别读到 save 改了一半的
+            return [self._books[isbn] for isbn in self._index.due.overdue(now, limit)]
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        for isbn in self._index.keys.iter(after_isbn, limit):  # 按 ISBN 顺序逐本产出
+            yield self._books[isbn]
+    def search(self, query: str, limit: int = 20) -> list[Book]:
+        with self._lock:  # 文字索引 save 时会改（词没了就删掉），读的时候也拿锁
+            return [self._books[isbn] for isbn in self._index.text.search(query, limit)]
+    def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        with self._lock:
+            return self._index.prefixes.suggest(prefix, k)
+    def stats(self) -> dict:
+        return {"books": len(self._books), "suggest_index": self._index.prefixes.stats(),
+                **_write_behind_stats(self._flusher),
+                **({"group_commit": self._committer.stats()} if self._use_journal else {})}
     
 class JsonUserRepo:
-    def __init__(self):
+    def __init__(self, users_file: Path | None = None,
+                 flush_delay: float | None = None, flush_every: int = FLUSH_EVERY,
+                 data_lock=None):
+        self._file = users_file or USERS_FILE
+        self._data_lock = data_lock  # 工厂拿的数据目录锁（file_lock.py），close 时释放
+        self._lock = threading.Lock()
+        self._snapshot_stale = False
         self._load_users()
+        self._flusher = None
+        if flush_delay is not None:
+            self._flusher = WriteBehindFlusher(
+                self._flush_users, self._file.name, flush_delay, flush_every
+            )
     def _load_users(self):
-        raw_users = _load_json(USERS_FILE, {})
-        self._users = {user_id: User(**user) for user_id, user in raw_users.items()}
+        users = _load_records(self._file, User)
+        self._users = {user.user_id: user for user in users}
     def _save_users(self):
-        raw_users = {user_id: user.__dict__ for user_id, user in self._users.items()}
-        _save_json(USERS_FILE, raw_users)
+        _save_records(self._file, self._users, User)
+        self._snapshot_stale = True
+    def _flush_users(self):
+        fields = _field_names(User)
+        with self._lock:
+            rows = _to_rows(self._users.values(), fields)
+        _save_rows(self._file, fields, rows)
+        self._snapshot_stale = True
     # 下面两个方法：UserRepository的实现：鸭子类型 + Protocol
     def get_by_id(self, user_id: str) -> User | None:
         return self._users.get(user_id)
     def save(self, user: User) -> None:
-        self._users[user.user_id] = user # key是user_id，不会重复
-        self._save_users()  # 每次保存都要将最新的数据保存到本地文件
+        with self._lock:
+            self._users[user.user_id] = user # key是user_id，不会重复
+            if self._flusher is not None:
+                self._flusher.mark_dirty()  # 延迟写盘：交给后台线程
+            else:
+                self._save_users()  # 每次保存都要将最新的数据保存到本地文件
+    def stats(self) -> dict:
+        return {"users": len(self._users), **_write_behind_stats(self._flusher)}
+    def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.close()
+        with self._lock:
+            if self._snapshot_stale:
+                fields = _field_names(User)
+                rows = _to_rows(self._users.values(), fields)
+                _save_snapshot(self._file, fields, rows)
+                self._snapshot_stale = False
+        if self._data_lock is not None:
+            self._data_lock.release()
 # ✅ 这个实现 **完全满足 `BookRepository` 和 `UserRepository` 协议**，但数据存在 JSON 文件中！
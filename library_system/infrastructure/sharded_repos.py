@@ -0,0 +1,201 @@
+# 🧩 分片 JSON 存储（`infrastructure/sharded_repos.py`）
+# 图书按 ISBN 的 crc32 分到 N 个文件（books/shard-00.json ...），
+# 保存一本书只重写它所在的那个分片，启动时各分片在线程池里并行加载。
+#
+# 把现有的 books.json 转成分片格式：
+#   python -m infrastructure.sharded_repos data/books.json data/books --shards 16
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from core.models import Book, next_version
+from infrastructure.file_lock import DataDirLock
+from infrastructure.indexes import BookIndexes
+from infrastructure.json_repos import (
+    _field_names,
+    _load_records,
+    _save_records,
+    _save_snapshot,
+    _to_rows,
+    read_books,
+)
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = 16
+_MANIFEST = "manifest.json"  # 记下分片数：分片数变了，ISBN 落到哪个文件也就变了
+
+
+def shard_of(isbn: str, shards: int) -> int:
+    # 和 StripedLock 一样用 crc32：内置 hash() 每次启动都不一样
+    return zlib.crc32(isbn.encode("utf-8")) % shards
+
+
+class ShardedBookRepo:
+    """实现 BookRepository 协议，查询能力和 JsonBookRepo 相同"""
+
+    def __init__(self, shard_dir: Path, shards: int = SHARD_COUNT):
+        self._dir = shard_dir
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._shard_count = self._read_manifest(shards)
+        self._shards = [{} for _ in range(self._shard_count)]  # [{isbn: Book}, ...]
+        # 不同分片的文件可以同时写；索引是共用的，单独一把锁
+        self._shard_locks = [threading.Lock() for _ in range(self._shard_count)]
+        self._lock = threading.Lock()
+        self._index = BookIndexes()
+        self._stale_snapshots = set()  # 重写过 JSON、快照还没跟上的分片，close 时补写
+        self._load_shards()
+
+    def _read_manifest(self, shards: int) -> int:
+        manifest = self._dir / _MANIFEST
+        if manifest.exists():
+            existing = json.loads(manifest.read_text(encoding="utf-8"))["shards"]
+            if existing != shards:
+                logger.warning(
+                    "%s 已按 %d 个分片存储，忽略配置的 %d", self._dir, existing, shards
+                )
+            return existing
+        manifest.write_text(json.dumps({"shards": shards}), encoding="utf-8")
+        return shards
+
+    def _path(self, shard: int) -> Path:
+        return self._dir / f"shard-{shard:02d}.json"
+
+    def _load_shards(self) -> None:
+        with ThreadPoolExecutor() as pool:
+            loaded = pool.map(
+                lambda i: _load_records(self._path(i), Book), range(self._shard_count)
+            )
+            for shard, books in zip(self._shards, loaded):
+                shard.update((book.isbn, book) for book in books)
+        self._index.rebuild(self.list_all())
+
+    def _write_shard(self, shard: int) -> None:
+        _save_records(self._path(shard), self._shards[shard], Book)  # 临时文件 + rename
+        self._stale_snapshots.add(shard)
+
+    def close(self) -> None:
+        fields = _field_names(Book)
+        for shard in sorted(self._stale_snapshots):
+            with self._shard_locks[shard]:
+                rows = _to_rows(self._shards[shard].values(), fields)
+                _save_snapshot(self._path(shard), fields, rows)
+                self._stale_snapshots.discard(shard)
+
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        return self._shards[shard_of(isbn, self._shard_count)].get(isbn)
+
+    def get_many(self, isbns) -> dict[str, Book]:
+        found = {}
+        for isbn in isbns:
+            book = self.get_by_isbn(isbn)
+            if book is not None:
+                found[isbn] = book
+        return found
+
+    def save(self, book: Book) -> None:
+        self.save_many([book])
+
+    def save_many(self, books: list[Book]) -> None:
+        by_shard = {}
+        for book in books:
+            shard = shard_of(book.isbn, self._shard_count)
+            by_shard.setdefault(shard, []).append(book)
+        for shard in sorted(by_shard):  # 固定顺序加锁
+            group = by_shard[shard]
+            with self._shard_locks[shard]:
+                books_in_shard = self._shards[shard]
+                for book in group:
+                    book.version = next_version(books_in_shard.get(book.isbn), book)
+                    books_in_shard[book.isbn] = book
+                self._write_shard(shard)  # 每个涉及到的分片只重写一次
+                with self._lock:
+                    self._index.update_many(group)
+
+    def list_all(self) -> list[Book]:
+        books = []
+        for shard, lock in zip(self._shards, self._shard_locks):
+            with lock:  # 同时有 save 往这个分片里加书时，遍历字典会报错：先拷一份
+                books.extend(shard.values())
+        return books
+
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        isbns = self._index.borrowers.isbns_of(user_id)
+        return [self.get_by_isbn(isbn) for isbn in isbns]
+
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        with self._lock:
+            isbns = self._index.due.overdue(now, limit)
+        return [self.get_by_isbn(isbn) for isbn in isbns]
+
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        for isbn in self._index.keys.iter(after_isbn, limit):  # 按 ISBN 顺序逐本产出
+            yield self.get_by_isbn(isbn)
+
+    def search(self, query: str, limit: int = 20) -> list[Book]:
+        with self._lock:  # 文字索引 save 时会改（词没了就删掉），读的时候也拿锁
+            isbns = self._index.text.search(query, limit)
+        return [self.get_by_isbn(isbn) for isbn in isbns]
+
+    def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        with self._lock:
+            return self._index.prefixes.suggest(prefix, k)
+
+    def stats(self) -> dict:
+        return {
+            "books": sum(len(shard) for shard in self._shards),
+            "shards": self._shard_count,
+            "suggest_index": self._index.prefixes.stats(),
+        }
+
+
+def is_migrated(shard_dir: Path) -> bool:
+    """分片目录是否已经建好：manifest 在，目录就是完整的"""
+    return (shard_dir / _MANIFEST).exists()
+
+
+def migrate(books_file: Path, shard_dir: Path, shards: int = SHARD_COUNT) -> int:
+    """把单个 books.json（连同没合并的日志）转成分片格式，返回图书数量。
+
+    先写到旁边的临时目录，全部写完再整个 rename 成 shard_dir：中途崩溃只会留下
+    临时目录，shard_dir 要么不存在、要么是完整的，下次启动会重新迁移。
+    原文件只读不写（也不生成快照），确认没问题后再手工删除。
+    """
+    if is_migrated(shard_dir):
+        raise ValueError(f"{shard_dir} 已经是分片存储，不能重复迁移")
+    books = read_books(books_file)
+    tmp_dir = shard_dir.with_name(shard_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)  # 上次迁移到一半留下的
+    repo = ShardedBookRepo(tmp_dir, shards)
+    repo.save_many(books)
+    repo.close()  # 顺便写好快照，第一次启动不用再解析 JSON
+    os.replace(tmp_dir, shard_dir)  # shard_dir 不存在或是空目录时才会成功
+    logger.info("已把 %s 的 %d 本图书迁移到 %s", books_file, len(books), shard_dir)
+    return len(books)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="把 books.json 转成分片存储")
+    parser.add_argument("books_file", type=Path, help="现有的 books.json")
+    parser.add_argument("shard_dir", type=Path, help="分片目录，例如 data/books")
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT, help="分片数")
+    args = parser.parse_args(argv)
+    data_dir = args.shard_dir.parent
+    data_dir.mkdir(parents=True, exist_ok=True)
+    # 和 factory.py 拿同一把锁：服务正在用这个数据目录时不能迁移
+    data_lock = DataDirLock(data_dir)
+    try:
+        count = migrate(args.books_file, args.shard_dir, args.shards)
+    finally:
+        data_lock.release()
+    print(f"迁移完成：{count} 本图书 -> {args.shard_dir}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
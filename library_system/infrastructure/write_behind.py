@@ -0,0 +1,114 @@
+# ⏱️ 延迟合并写盘（`infrastructure/write_behind.py`）
+# save 只把仓库标记为“脏”，后台线程最多每 delay 秒（或攒够 max_pending 次修改）
+# 写一次整个文件。突发的大量请求不再每次都同步重写文件，代价是崩溃时可能丢掉
+# 最近 delay 秒内的修改：stats() 里的 lag_seconds 就是当前有多少秒的数据还没落盘
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY = 0.2  # 默认最多攒 200ms
+FLUSH_EVERY = 1000  # 或者攒够这么多次修改就马上写
+
+
+class WriteBehindFlusher:
+    """后台线程定期调用 flush()；close() 时把剩下的修改写完再退出"""
+
+    def __init__(
+        self,
+        flush,
+        name: str,
+        delay: float = FLUSH_DELAY,
+        max_pending: int = FLUSH_EVERY,
+    ):
+        self._flush = flush
+        self._name = name
+        self._delay = delay
+        self._max_pending = max_pending
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # 后台线程和 close / flush_now 不能同时写
+        self._pending = 0  # 还没落盘的修改次数
+        self._dirty_since = None  # 最早一次没落盘的修改的时间
+        self._closed = False
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name=f"write-behind-{name}", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)  # 忘了调 close 也不会丢数据
+
+    def mark_dirty(self, changes: int = 1) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self._name} 已经关闭，不能再写")
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._pending += changes
+            if self._pending == changes or self._pending >= self._max_pending:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._dirty_since is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # 从第一次修改开始最多等 delay 秒，攒够 max_pending 次就提前写
+                deadline = self._dirty_since + self._delay
+                while self._pending < self._max_pending and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush_now()
+            except Exception:  # 写失败了下次再试，不能让后台线程退出
+                logger.exception("%s 写盘失败，稍后重试", self._name)
+                time.sleep(self._delay)
+
+    def flush_now(self) -> None:
+        with self._flush_lock:
+            with self._cond:
+                if self._dirty_since is None:
+                    return
+                pending, dirty_since = self._pending, self._dirty_since
+                # 先清标记再写：写的过程中又来的修改会让下一轮再写一次
+                self._pending, self._dirty_since = 0, None
+            start = time.perf_counter()
+            try:
+                self._flush()
+            except BaseException:
+                with self._cond:  # 没写成功，标记恢复回去
+                    self._pending += pending
+                    self._dirty_since = dirty_since
+                raise
+            self.flushes += 1
+            self.last_flush_seconds = time.perf_counter() - start
+        logger.debug("%s 合并写入 %d 次修改", self._name, pending)
+
+    def lag(self) -> float:
+        """持久化滞后：最早一次没落盘的修改到现在的秒数，全部落盘时是 0"""
+        dirty_since = self._dirty_since
+        return 0.0 if dirty_since is None else time.monotonic() - dirty_since
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "lag_seconds": self.lag(),
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush_now()
+        atexit.unregister(self.close)
@@ -1,24 +1,31 @@
 # ✅ 第二步：改造 `main.py` —— 加 CLI 菜单
-import logging  # 👈 只在这里 import logging 用于配置
+from config import settings
+from log_setup import setup_logging
 
-# 🔧【唯一配置点】设置日志格式、级别、输出位置
-logging.basicConfig(
-    level=logging.INFO,  # 显示 INFO 及以上级别
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    force=True  # Python 3.8+：强制覆盖可能存在的旧配置
+# 🔧【唯一配置点】设置日志格式、级别、输出位置（由 LIBRARY_LOG_* 环境变量控制）
+# 日志交给后台线程写终端 / 文件，菜单操作不用等 I/O
+setup_logging(
+    level=settings.LOG_LEVEL,
+    log_file=settings.LOG_FILE,
+    json_lines=settings.LOG_JSON,
+    sample_rate=settings.LOG_SAMPLE_RATE,
 )
-# 然后导入你的业务代码（注意：导入必须在 basicConfig 之后！）
+# 然后导入你的业务代码（注意：导入必须在 setup_logging 之后！）
+import logging
 import sys
-from core.services import LibraryService
-from infrastructure.json_repos import JsonBookRepo, JsonUserRepo # 用json版本
+import time
+from datetime import datetime
+from core.services import DAY_SECONDS, LibraryService
+from infrastructure.factory import create_repos # 按配置选择 json / sqlite 存储
 from core.models import User
+from core.interfaces import supports
+PAGE_SIZE = 20  # 查询所有图书时每页显示多少本
+OVERDUE_LIMIT = 100  # 逾期报告最多列出多少本（最早到期的在前）
 
-def ensure_default_user():
+def ensure_default_user(user_repo):
     """
     确保有一个默认用户
     """
-    user_repo = JsonUserRepo()
     if not user_repo.get_by_id("u1"):
         user_repo.save(User("u1", "Alice"))
         print("默认用户已创建")
@@ -29,74 +36,111 @@ def display_menu():
     print("3. 还书")
     print("4. 查询所有图书")
     print("5. 查询用户借阅的图书")
-    print("6. 退出")
-def main():
-    ensure_default_user()
-    book_repo = JsonBookRepo()
-    user_repo = JsonUserRepo()
-    library = LibraryService(book_repo, user_repo)
+    print("6. 查询逾期未还的图书")
+    print("7. 退出")
+def list_books(library: LibraryService):
+    """
+    分页显示图书库：每次只从仓库取一页，图书再多也不会一次全部加载
+    """
+    cursor = None
+    shown = 0
     while True:
-        display_menu()
-        choice = input("\n 请选择操作(1-6)：").strip()
-        try:
-            if choice == '1':
-                isbn = input("请输入 ISBN：").strip()
-                title = input("请输入书名：").strip()
-                author = input("请输入作者：").strip()
-                if not all([isbn, title, author]):
-                    print("图书信息不能为空！")
-                    continue
-                book = library.add_book(isbn,title,author)
-                print(f"图书 {book.title} 添加成功！")
-            elif choice =='2':
-                isbn = input("请输入 ISBN：").strip()
-                user_id = input("请输入用户 ID：").strip() or "u1"
-                if library.borrow_book(isbn, user_id):
-                    book = book_repo.get_by_isbn(isbn)
+        books = list(library.iter_books(after_isbn=cursor, limit=PAGE_SIZE))
+        if not books:
+            if shown == 0:
+                print("图书库为空！")
+            return
+        if shown == 0:
+            print("\n 当前的图书库:")
+        for b in books:
+            status = "已借出" if b.is_borrowed else "可借阅"
+            borrower = f"-> {b.borrowed_by}" if b.borrowed_by else ""
+            print(f"{b.isbn}\t{b.title}\t{b.author}\t{status}{borrower}")
+        shown += len(books)
+        cursor = books[-1].isbn
+        if len(books) < PAGE_SIZE:
+            return
+        if input(f"已显示 {shown} 本，回车查看下一页，输入 q 返回：").strip().lower() == "q":
+            return
+def list_overdue(library: LibraryService):
+    """
+    逾期报告：走应还时间索引，只取到期的那几本，不扫描整个图书库
+    """
+    now = time.time()
+    books = library.overdue(now, limit=OVERDUE_LIMIT)
+    if not books:
+        print("没有逾期未还的图书！")
+        return
+    print(f"\n 逾期未还的图书（最早到期的在前，最多 {OVERDUE_LIMIT} 本）:")
+    for b in books:
+        due = datetime.fromtimestamp(b.due_at).strftime("%Y-%m-%d")
+        days = int((now - b.due_at) // DAY_SECONDS)
+        print(f"{b.isbn}\t{b.title}\t-> {b.borrowed_by}\t应还 {due}，已逾期 {days} 天")
+def main():
+    book_repo, user_repo = create_repos(settings)
+    ensure_default_user(user_repo)
+    library = LibraryService(book_repo, user_repo, settings.LOAN_DAYS)
+    try:
+        while True:
+            display_menu()
+            try:
+                choice = input("\n 请选择操作(1-7)：").strip()  # 在 try 里：菜单处按 Ctrl+C / Ctrl+D 也正常退出
+                if choice == '1':
+                    isbn = input("请输入 ISBN：").strip()
+                    title = input("请输入书名：").strip()
+                    author = input("请输入作者：").strip()
+                    if not all([isbn, title, author]):
+                        print("图书信息不能为空！")
+                        continue
+                    book = library.add_book(isbn,title,author)
+                    print(f"图书 {book.title} 添加成功！")
+                elif choice =='2':
+                    isbn = input("请输入 ISBN：").strip()
+                    user_id = input("请输入用户 ID：").strip() or "u1"
+                    if library.borrow_book(isbn, user_id):
+                        book = book_repo.get_by_isbn(isbn)
+                        user = user_repo.get_by_id(user_id)
+                        print(f"用户 {user.name} 借阅了图书 {book.title}")
+                    else:
+                        print(f"图书 {isbn} 借阅失败！（书不存在/已被借/用户无效）")
+                elif choice =='3':
+                    isbn = input("请输入 ISBN：").strip()
+                    if library.return_book(isbn):
+                        book = book_repo.get_by_isbn(isbn)
+                        print(f"图书 {book.title} 还书成功")
+                    else:
+                        print(f"图书 {isbn} 归还失败！（书不存在或未被借出）")
+                elif choice =='4':
+                    list_books(library)
+                elif choice == '5':
+                    user_id = input("请输入用户 ID：").strip() or "u1"
+                    books = library.get_user_books(user_id)
                     user = user_repo.get_by_id(user_id)
-                    print(f"用户 {user.name} 借阅了图书 {book.title}")
-                else:
-                    print(f"图书 {isbn} 借阅失败！（书不存在/已被借/用户无效）")
-            elif choice =='3':
-                isbn = input("请输入 ISBN：").strip()
-                if library.return_book(isbn):
-                    book = book_repo.get_by_isbn(isbn)
-                    print(f"图书 {book.title} 还书成功")
-                else:
-                    print(f"图书 {isbn} 归还失败！（书不存在或未被借出）")
-            elif choice =='4':
-                books = book_repo.list_all()
-                if not books:
-                    print("图书库为空！")
-                else:
-                    print("\n 当前的图书库:")
-                    for b in books:
-                        status = "已借出" if b.is_borrowed else "可借阅"
-                        borrower = f"-> {b.borrowed_by}" if b.borrowed_by else ""
-                        print(f"{b.isbn}\t{b.title}\t{b.author}\t{status}{borrower}")
-            elif choice == '5':
-                user_id = input("请输入用户 ID：").strip() or "u1"
-                books = library.get_user_books(user_id)
-                user = user_repo.get_by_id(user_id)
-                if not books:
-                    print(f"用户 {user.name} 没有借阅任何图书！")
+                    if not books:
+                        print(f"用户 {user.name} 没有借阅任何图书！")
+                    else:
+                        print(f"\n 用户 {user.name} 借阅的图书:")
+                        for b in books:
+                            print(f"{b.isbn}\t{b.title}\t{b.author}")
+
+                elif choice == '6':
+                    list_overdue(library)
+                elif choice == '7':
+                    print("再见！")
+                    break
                 else:
-                    print(f"\n 用户 {user.name} 借阅的图书:")
-                    for b in books:
-                        print(f"{b.isbn}\t{b.title}\t{b.author}")
+                    print("无效的操作！请输入 1-7 之间的数字！")
 
-            elif choice == '6':
-                print("再见！")
+            except (KeyboardInterrupt, EOFError):  # Ctrl+C / 输入流结束
+                print("\n\n👋 再见！")
                 break
-            else:
-                print("无效的操作！请输入 1-6 之间的数字！")
-
-        except KeyboardInterrupt as e:
-            print("\n\n👋 再见！")
-            break
-        except Exception as e:
-            print(f"发生异常：{e}")
-            logging.exception("Unexpected error")
+            except Exception as e:
+                print(f"发生异常：{e}")
+                logging.exception("Unexpected error")
+    finally:
+        for repo in (book_repo, user_repo):  # 所有退出路径都走到这里
+            if supports(repo, "close"):
+                repo.close()  # 把延迟写盘的修改、日志、偏移量索引之类的落盘
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
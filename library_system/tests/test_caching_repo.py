@@ -0,0 +1,122 @@
+# tests/test_caching_repo.py
+import sys
+import os
+import threading
+from unittest.mock import Mock
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book, User
+from core.services import LibraryService
+from infrastructure.caching_repo import CachingBookRepo
+from infrastructure.in_memory_repos import InMemoryBookRepo, InMemoryUserRepo
+
+
+class CountingBookRepo(InMemoryBookRepo):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_by_isbn(self, isbn):
+        self.reads += 1
+        return super().get_by_isbn(isbn)
+
+
+class TestCachingBookRepo:
+    def test_borrow_reads_inner_repo_once(self):
+        inner = CountingBookRepo()
+        repo = CachingBookRepo(inner)
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        service = LibraryService(repo, user_repo)
+        service.add_book("1", "Python入门", "张三")
+
+        assert service.is_available("1")
+        assert service.borrow_book("1", "u1")
+        assert not service.is_available("1")
+
+        assert inner.reads == 0  # add_book 写穿后都命中缓存
+        assert repo.cache_stats()["hits"] == 3
+        assert repo.stats()["books"] == 1  # 底层仓库的统计也带上
+
+    def test_get_many_only_loads_misses(self):
+        inner = CountingBookRepo()
+        inner.save_many([Book("1", "A", "X"), Book("2", "B", "Y")])
+        repo = CachingBookRepo(inner)
+        repo.get_by_isbn("1")
+
+        assert set(repo.get_many(["1", "2", "3"])) == {"1", "2"}
+        assert inner.reads == 1  # 没命中的走底层 get_many，不逐本读
+        assert set(repo.get_many(["1", "2"])) == {"1", "2"}
+        assert repo.cache_stats()["hits"] == 3
+
+    def test_evicts_least_recently_used(self):
+        inner = InMemoryBookRepo()
+        inner.save_many([Book(str(i), f"书{i}", "作者") for i in range(3)])
+        repo = CachingBookRepo(inner, maxsize=2)
+
+        repo.get_by_isbn("0")
+        repo.get_by_isbn("1")
+        repo.get_by_isbn("0")  # 0 变成最近用过的
+        repo.get_by_isbn("2")  # 挤掉 1
+
+        repo.get_by_isbn("0")
+        stats = repo.cache_stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1)
+        assert stats["size"] == 2
+
+    def test_expired_entries_are_reloaded(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(
+            "infrastructure.caching_repo.time.monotonic", lambda: now[0]
+        )
+        inner = Mock()
+        inner.get_by_isbn.return_value = Book("1", "旧书名", "作者")
+        repo = CachingBookRepo(inner, ttl=10)
+
+        repo.get_by_isbn("1")
+        inner.get_by_isbn.return_value = Book("1", "新书名", "作者")  # 别的进程改了
+        assert repo.get_by_isbn("1").title == "旧书名"
+        now[0] += 11
+        assert repo.get_by_isbn("1").title == "新书名"
+        assert repo.cache_stats()["expirations"] == 1
+
+    def test_failed_save_invalidates_entry(self):
+        inner = Mock()
+        inner.get_by_isbn.return_value = Book("1", "Python入门", "张三")
+        inner.save.side_effect = OSError("磁盘满了")
+        repo = CachingBookRepo(inner)
+        book = repo.get_by_isbn("1")
+        book.is_borrowed = True
+
+        try:
+            repo.save(book)
+        except OSError:
+            pass
+
+        repo.get_by_isbn("1")
+        assert inner.get_by_isbn.call_count == 2  # 改了一半的对象没有留在缓存里
+
+    def test_read_racing_a_write_does_not_cache_stale_book(self):
+        inner = InMemoryBookRepo()
+        inner.save(Book("1", "Python入门", "张三"))
+        fetched, resume = threading.Event(), threading.Event()
+        real_get = inner.get_by_isbn
+
+        def slow_get(isbn):  # 第一次读到旧值之后卡住，等借书完成
+            book = Book(**{f: getattr(real_get(isbn), f) for f in Book.__slots__})
+            if not fetched.is_set():
+                fetched.set()
+                resume.wait(5)
+            return book
+
+        inner.get_by_isbn = slow_get
+        repo = CachingBookRepo(inner)
+        reader = threading.Thread(target=repo.get_by_isbn, args=("1",))
+        reader.start()
+        fetched.wait(5)
+        assert repo.try_borrow("1", "u1")  # 底层不支持原子借书：读-改-写穿
+        resume.set()
+        reader.join()
+
+        inner.get_by_isbn = real_get
+        assert repo.get_by_isbn("1").is_borrowed  # 缓存里不是读者拿到的旧值
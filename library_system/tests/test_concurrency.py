@@ -0,0 +1,194 @@
+# tests/test_concurrency.py —— 并发借书的压力测试
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book, User
+from core.services import LibraryService
+from infrastructure.in_memory_repos import InMemoryBookRepo, InMemoryUserRepo
+from infrastructure import json_repos
+from infrastructure.group_commit import GroupCommitter
+from infrastructure.json_repos import JsonBookRepo
+
+
+class SlowReadBookRepo(InMemoryBookRepo):
+    # 像数据库一样每次读出一个副本，并且读得慢一点，把“读-判断-写”的竞争窗口放大
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        book = super().get_by_isbn(isbn)
+        time.sleep(0.001)
+        return replace(book) if book else None
+
+
+class RendezvousBookRepo(InMemoryBookRepo):
+    # 两个线程必须同时在 save 里才能通过：借书被串行化的话 barrier 会超时
+    def __init__(self):
+        super().__init__()
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def save(self, book: Book) -> None:
+        if book.is_borrowed:
+            self.barrier.wait()
+        super().save(book)
+
+
+def _make_users(user_repo, count):
+    for i in range(count):
+        user_repo.save(User(f"u{i}", f"用户{i}"))
+
+
+class TestConcurrentBorrow:
+    def test_same_book_is_borrowed_exactly_once(self):
+        book_repo = SlowReadBookRepo()
+        user_repo = InMemoryUserRepo()
+        _make_users(user_repo, 32)
+        service = LibraryService(book_repo, user_repo)
+        service.add_book("1", "西游记", "吴承恩")
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(
+                pool.map(lambda i: service.borrow_book("1", f"u{i}"), range(32))
+            )
+
+        assert results.count(True) == 1
+        winner = f"u{results.index(True)}"
+        assert book_repo.get_by_isbn("1").borrowed_by == winner
+        assert [b.isbn for b in service.get_user_books(winner)] == ["1"]
+
+    def test_different_books_are_borrowed_in_parallel(self):
+        book_repo = RendezvousBookRepo()
+        user_repo = InMemoryUserRepo()
+        _make_users(user_repo, 2)
+        service = LibraryService(book_repo, user_repo)
+        service.add_book("1", "西游记", "吴承恩")
+        service.add_book("2", "水浒传", "施耐庵")
+        assert service._locks.for_key("1") is not service._locks.for_key("2")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(
+                pool.map(service.borrow_book, ["1", "2"], ["u0", "u1"])
+            )
+
+        assert results == [True, True]
+
+    def test_json_repo_concurrent_saves_stay_consistent(self, tmp_path):
+        book_repo = JsonBookRepo(tmp_path / "books.json", journal=True)
+        user_repo = InMemoryUserRepo()
+        _make_users(user_repo, 8)
+        service = LibraryService(book_repo, user_repo)
+        service.add_books(Book(str(i), f"书{i}", "作者") for i in range(200))
+
+        def borrow_and_return(i):
+            isbn = str(i % 200)
+            if service.borrow_book(isbn, f"u{i % 8}"):
+                service.return_book(isbn)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(borrow_and_return, range(2000)))
+        book_repo.close()
+
+        reopened = JsonBookRepo(tmp_path / "books.json", journal=True)
+        assert len(reopened.list_all()) == 200
+        assert not any(b.is_borrowed for b in reopened.list_all())
+
+
+class TestIndexReads:
+    @pytest.mark.parametrize("method, arg", [("suggest", "西"), ("search", "西游")])
+    def test_text_queries_wait_for_index_updates(self, tmp_path, method, arg):
+        for repo in (InMemoryBookRepo(), JsonBookRepo(tmp_path / "books.json")):
+            repo.save(Book("1", "西游记", "吴承恩"))
+            # 模拟 save 正改到一半的索引：先拿着锁，退出 with 时先放锁、再等线程池
+            with ThreadPoolExecutor(max_workers=1) as pool, repo._lock:
+                future = pool.submit(getattr(repo, method), arg)
+                time.sleep(0.05)
+                assert not future.done()  # 读的一方在等锁，不会读到改了一半的
+            assert len(future.result()) == 1
+
+
+class TestGroupCommit:
+    def test_concurrent_journal_saves_share_fsyncs(self, tmp_path, monkeypatch):
+        fsyncs = []
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.02)  # 模拟磁盘延迟
+
+        monkeypatch.setattr(json_repos.os, "fsync", slow_fsync)
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file, journal=True)
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            books = [Book(str(i), f"书{i}", "作者") for i in range(64)]
+            list(pool.map(repo.save, books))
+
+        assert len(fsyncs) < 64 / 4  # 一次 fsync 平均落盘好几条记录
+        assert repo.stats()["group_commit"]["records"] == 64
+        repo.close()
+        assert len(JsonBookRepo(books_file, journal=True).list_all()) == 64
+
+    def test_write_error_reaches_every_waiter(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def write(records):
+            if not started.is_set():  # 第一批卡住，让后面的请求攒成第二批
+                started.set()
+                release.wait()
+                return
+            raise OSError("磁盘满了")
+
+        committer = GroupCommitter(write)
+        first = threading.Thread(target=committer.commit, args=(["a"],))
+        first.start()
+        started.wait()
+        batches = [committer.submit([r]) for r in ("b", "c")]
+        release.set()
+        errors = []
+        for batch in batches:
+            try:
+                committer.wait(batch)
+            except OSError as e:
+                errors.append(e)
+        first.join()
+
+        assert len(errors) == 2 and committer.batches == 2
+
+    def test_unexpected_error_still_wakes_waiters(self):
+        def write(records):
+            raise TypeError("bug")
+
+        committer = GroupCommitter(write)
+        batch = committer.submit(["a"])
+        with pytest.raises(TypeError):
+            committer.wait(batch)  # leader：原样抛出
+        with pytest.raises(TypeError):
+            committer.wait(batch)  # 同一批的等待者：不会卡住，也拿到同一个异常
+        assert committer.stats()["batches"] == 1
+
+    def test_threshold_is_rechecked_before_compacting(self, tmp_path, monkeypatch):
+        repo = JsonBookRepo(tmp_path / "books.json", journal=True)
+        repo.save(Book("1", "西游记", "吴承恩"))
+        repo._compact_threshold = 1  # 日志已经超过阈值
+        compacts = []
+        compact = repo.compact
+        monkeypatch.setattr(repo, "compact", lambda: compacts.append(1) or compact())
+
+        with repo._lock:  # 两个线程都过了锁外的检查，在锁上排队
+            threads = [
+                threading.Thread(
+                    target=repo._wait_journal, args=(repo._append_journal([]),)
+                )
+                for _ in range(2)
+            ]
+            for t in threads:
+                t.start()
+            time.sleep(0.05)
+        for t in threads:
+            t.join()
+
+        assert compacts == [1]
+        repo.close()
@@ -0,0 +1,107 @@
+# tests/test_sharded_repos.py
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book
+from infrastructure import sharded_repos
+from infrastructure.file_lock import DataDirLock
+from infrastructure.json_repos import JsonBookRepo
+from infrastructure.sharded_repos import ShardedBookRepo, migrate, shard_of
+
+
+class TestShardedBookRepo:
+    def test_save_rewrites_only_one_shard(self, tmp_path):
+        repo = ShardedBookRepo(tmp_path / "books", shards=4)
+        repo.save_many([Book(str(i), f"书{i}", "作者") for i in range(40)])
+
+        with patch.object(
+            sharded_repos, "_save_records", wraps=sharded_repos._save_records
+        ) as save_records:
+            repo.save(Book("7", "书7", "作者", is_borrowed=True, borrowed_by="u1"))
+
+        assert save_records.call_count == 1
+        written = save_records.call_args.args[0]
+        assert written.name == f"shard-{shard_of('7', 4):02d}.json"
+        reopened = ShardedBookRepo(tmp_path / "books", shards=4)
+        assert len(reopened.list_all()) == 40
+        assert [b.isbn for b in reopened.list_by_borrower("u1")] == ["7"]
+
+    def test_shard_count_comes_from_manifest(self, tmp_path):
+        repo = ShardedBookRepo(tmp_path / "books", shards=4)
+        repo.save(Book("1", "西游记", "吴承恩"))
+
+        reopened = ShardedBookRepo(tmp_path / "books", shards=8)  # 配置改了也不乱
+        assert reopened.stats()["shards"] == 4
+        assert reopened.get_by_isbn("1").title == "西游记"
+
+    def test_migrate_from_single_json(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        JsonBookRepo(books_file).save_many(
+            [Book(str(i), f"书{i}", "作者") for i in range(10)]
+        )
+
+        assert migrate(books_file, tmp_path / "books", shards=3) == 10
+        repo = ShardedBookRepo(tmp_path / "books", shards=3)
+        assert sorted(b.isbn for b in repo.list_all()) == [str(i) for i in range(10)]
+        assert len(list((tmp_path / "books").glob("shard-*.json"))) == 3
+
+    def test_migrate_keeps_versions_increasing(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        source = JsonBookRepo(books_file)
+        for _ in range(3):
+            source.save(Book("1", "西游记", "吴承恩"))
+        assert source.get_by_isbn("1").version == 3  # 客户端手里的 ETag 是 "3"
+
+        migrate(books_file, tmp_path / "books", shards=2)
+
+        assert ShardedBookRepo(tmp_path / "books").get_by_isbn("1").version > 3
+
+    def test_migrate_leaves_source_untouched(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        source = JsonBookRepo(books_file, journal=True)
+        source.save_many([Book(str(i), f"书{i}", "作者") for i in range(5)])
+        source.close()
+        (tmp_path / "books.snapshot.bin").unlink(missing_ok=True)
+        before = sorted(p.name for p in tmp_path.iterdir())
+
+        assert migrate(books_file, tmp_path / "books", shards=2) == 5  # 日志里的也算
+        after = sorted(p.name for p in tmp_path.iterdir())
+        assert after == sorted(before + ["books"])  # 没有快照，日志也没被合并
+
+    def test_interrupted_migrate_is_retried(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        JsonBookRepo(books_file).save_many(
+            [Book(str(i), f"书{i}", "作者") for i in range(6)]
+        )
+        shard_dir = tmp_path / "books"
+
+        full = OSError("满了")
+        with (
+            patch.object(ShardedBookRepo, "save_many", side_effect=full),
+            pytest.raises(OSError),
+        ):
+            migrate(books_file, shard_dir, shards=3)
+        assert not sharded_repos.is_migrated(shard_dir)  # 半成品只在临时目录里
+
+        assert migrate(books_file, shard_dir, shards=3) == 6
+        assert len(ShardedBookRepo(shard_dir).list_all()) == 6
+        assert not (tmp_path / "books.tmp").exists()
+        with pytest.raises(ValueError):
+            migrate(books_file, shard_dir, shards=3)
+
+    def test_cli_refuses_while_data_dir_is_in_use(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        JsonBookRepo(books_file).save(Book("1", "西游记", "吴承恩"))
+        args = [str(books_file), str(tmp_path / "books"), "--shards", "2"]
+
+        server_lock = DataDirLock(tmp_path)  # 服务正在用这个数据目录
+        with pytest.raises(RuntimeError):
+            sharded_repos.main(args)
+        server_lock.release()
+
+        sharded_repos.main(args)
+        assert sharded_repos.is_migrated(tmp_path / "books")
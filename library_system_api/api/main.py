@@ -1,45 +1,272 @@
-from fastapi import FastAPI, HTTPException
-from core.services import LibraryService
-from core.models import Book
-from infrastructure.json_repos import JsonUserRepo, JsonBookRepo
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import Body, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from core.async_services import AsyncLibraryService
+from core.services import BATCH_LIMIT, BULK_CHUNK_SIZE, OK
+from core.models import Book, to_dict
+from config import settings
+from infrastructure.factory import create_async_repos
+from infrastructure.indexes import SUGGEST_TOP_K
+from infrastructure.metrics import registry
+from log_setup import setup_logging, shutdown_logging
 
-app = FastAPI(title="Library API", version="1.0.0")
-# 初始化服务（这里你可以注入真实的 JSON Repository）
-book_repo = JsonBookRepo()  # 从本地文件加载图书数据
-user_repo = JsonUserRepo()  # 从本地文件加载用户数据
-library_service = LibraryService(book_repo, user_repo)
+# 应用自己的日志（core.* / infrastructure.*）由后台线程写；uvicorn 的访问日志不受影响
+setup_logging(
+    level=settings.LOG_LEVEL,
+    log_file=settings.LOG_FILE,
+    json_lines=settings.LOG_JSON,
+    sample_rate=settings.LOG_SAMPLE_RATE,
+)
+
+# 初始化服务：LIBRARY_STORAGE=json（默认）/ sqlite 决定用哪种 Repository
+# 接口都是 async def，仓库的阻塞 I/O 在线程池里执行，一个 worker 能同时挂起大量请求
+book_repo, user_repo = create_async_repos(settings)
+library_service = AsyncLibraryService(book_repo, user_repo, settings.LOAN_DAYS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 关闭时把延迟写盘 / 日志里还没落盘的修改写完
+    await book_repo.close()
+    await user_repo.close()
+    shutdown_logging()  # 把队列里剩下的日志写完
+
+
+app = FastAPI(title="Library API", version="1.0.0", lifespan=lifespan)
+
+REQUEST_SECONDS = registry.histogram(
+    "library_http_request_seconds", "每个路由的请求耗时（秒）", ("method", "route")
+)
+REQUESTS = registry.counter(
+    "library_http_requests_total", "每个路由的请求数", ("method", "route", "status")
+)
+
+
+class RouteMetricsMiddleware:
+    """纯 ASGI 中间件：比 @app.middleware("http") 少一层请求/响应对象的包装。
+
+    route 标签用路由模板（/books/{isbn}）而不是实际路径，序列个数不会随 ISBN 增长
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500  # 没来得及发响应头就出错了
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")  # 路由匹配后 FastAPI 把它写进 scope
+            path = route.path if route is not None else "<unmatched>"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=method, route=path
+            )
+            REQUESTS.inc(method=method, route=path, status=str(status))
+
+
+app.add_middleware(RouteMetricsMiddleware)
 
 
 @app.post("/books", response_model=Book)  # 添加图书
-def add_book(isbn: str, title: str, author: str) -> Book:
-    return library_service.add_book(isbn, title, author)
+async def add_book(isbn: str, title: str, author: str) -> Book:
+    return await library_service.add_book(isbn, title, author)
+
+
+@app.post("/books:bulk")  # 批量导入图书：请求体是 NDJSON，每行一本书
+async def bulk_add_books(request: Request, chunk_size: int = BULK_CHUNK_SIZE):
+    if chunk_size <= 0:
+        raise HTTPException(status_code=400, detail="chunk_size 必须大于 0")
+    imported = 0
+    chunk: list[Book] = []
+    buffer = b""
+    line_no = 0
+
+    async def flush():
+        nonlocal imported, chunk
+        if chunk:
+            imported += await library_service.add_books(chunk, chunk_size)
+            chunk = []
+
+    def parse(line: bytes) -> Book:
+        try:
+            record = json.loads(line)
+            fields = [record["isbn"], record["title"], record["author"]]
+        except (ValueError, KeyError, TypeError):
+            fields = None
+        # 三个字段都得是非空字符串：{"isbn": 1} 这种也在这里拦下，不会进到存储里
+        if not fields or not all(isinstance(f, str) and f for f in fields):
+            raise HTTPException(
+                status_code=400,
+                detail=f"第 {line_no} 行格式错误（已导入 {imported} 本）",
+            )
+        return Book(*fields)
+
+    async for data in request.stream():  # 边收边解析，不把整个请求体读进内存
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                chunk.append(parse(line))
+            if len(chunk) >= chunk_size:
+                await flush()
+    if buffer.strip():  # 最后一行可能没有换行符
+        line_no += 1
+        chunk.append(parse(buffer))
+    await flush()
+    return {"imported": imported}
+
+
+@app.get("/books")  # 分页列出图书：cursor 是上一页最后一本的 ISBN
+async def list_books(
+    cursor: str | None = None, limit: int = Query(100, ge=1, le=10000)
+):
+    async def body():
+        # 边查边写：不先把整页放进列表，首字节很快就能发出去
+        yield '{"items":['
+        last_isbn = None
+        count = 0
+        async for book in library_service.iter_books(cursor, limit):
+            yield ("," if count else "") + json.dumps(to_dict(book), ensure_ascii=False)
+            last_isbn = book.isbn
+            count += 1
+        next_cursor = last_isbn if count == limit else None  # 不满一页说明到头了
+        yield f'],"next_cursor":{json.dumps(next_cursor, ensure_ascii=False)}}}'
+
+    return StreamingResponse(body(), media_type="application/json")
+
 
+@app.get("/books/search", response_model=list[Book])  # 按书名/作者片段搜索
+async def search_books(q: str, limit: int = Query(20, ge=1, le=100)):
+    # 注意：这个路由要写在 /books/{isbn} 前面，否则 "search" 会被当成 isbn
+    return await library_service.search(q, limit)
 
-@app.get("/books/{isbn}", response_model=Book)  # 获取图书
-def get_book(isbn: str):
-    book = library_service.get_book_by_isbn(isbn)
+
+@app.get("/books/suggest", response_model=list[str])  # 搜索框的前缀补全
+async def suggest_books(prefix: str, k: int = Query(10, ge=1, le=SUGGEST_TOP_K)):
+    return await library_service.suggest(prefix, k)
+
+
+def _check_batch(isbns: list[str]) -> None:
+    if len(isbns) > BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400, detail=f"一次最多查询 {BATCH_LIMIT} 个 ISBN"
+        )
+
+
+@app.post("/books:batchGet")  # 批量获取图书：一次请求拿到一整页
+async def batch_get_books(isbns: list[str] = Body(..., embed=True)):
+    _check_batch(isbns)
+    books = await library_service.get_books(isbns)
+    return {
+        "books": [books[i] for i in dict.fromkeys(isbns) if i in books],  # 按请求顺序
+        "missing": [i for i in dict.fromkeys(isbns) if i not in books],
+    }
+
+
+@app.post("/books:availability")  # 批量查是否可借：{isbn: true/false}，不存在的是 false
+async def batch_availability(isbns: list[str] = Body(..., embed=True)):
+    _check_batch(isbns)
+    return await library_service.availability(isbns)
+
+
+def _etag(book: Book) -> str:
+    # 每次保存版本号都会加一；迁移、导入到别的存储也只增不减（见 next_version）
+    return f'"{book.version}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+@app.get("/books/{isbn}", response_model=Book)  # 获取图书，支持 If-None-Match
+async def get_book(isbn: str, if_none_match: str | None = Header(None)):
+    book = await library_service.get_book_by_isbn(isbn)
     if not book:
         raise HTTPException(status_code=404, detail="图书不存在")
-    return book
+    etag = _etag(book)
+    if _etag_matches(if_none_match, etag):  # 没变过：不用再序列化、传输
+        return Response(status_code=304, headers={"ETag": etag})
+    # 直接返回 JSON，跳过 response_model 的校验和序列化
+    return Response(
+        json.dumps(to_dict(book), ensure_ascii=False),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 @app.post("/books/{isbn}/borrow")  # 借阅图书
-def borrow_book(isbn: str, user_id: str):
-    success = library_service.borrow_book(isbn, user_id)
+async def borrow_book(isbn: str, user_id: str):
+    success = await library_service.borrow_book(isbn, user_id)
     if not success:
         raise HTTPException(status_code=400, detail="借阅失败")
     return {"message": "借阅成功"}
 
 
 @app.post("/books/{isbn}/return")  # 还书
-def return_book(isbn: str):
-    success = library_service.return_book(isbn)
+async def return_book(isbn: str):
+    success = await library_service.return_book(isbn)
     if not success:
         raise HTTPException(status_code=400, detail="还书失败")
     return {"message": "还书成功"}
 
 
+@app.post("/books:borrow")  # 一个用户一次借多本：{"user_id": ..., "isbns": [...]}
+async def borrow_books(
+    user_id: str = Body(..., embed=True), isbns: list[str] = Body(..., embed=True)
+):
+    _check_batch(isbns)
+    # 部分成功也返回 200，每本书的结果见 results：ok / not_found / unavailable
+    results = await library_service.borrow_many(user_id, isbns)
+    return {"results": results, "succeeded": sum(r == OK for r in results.values())}
+
+
+@app.post("/books:return")  # 批量还书：{"isbns": [...]}
+async def return_books(isbns: list[str] = Body(..., embed=True)):
+    _check_batch(isbns)
+    results = await library_service.return_many(isbns)
+    return {"results": results, "succeeded": sum(r == OK for r in results.values())}
+
+
 @app.get("/users/{user_id}/books", response_model=list[Book])  # 获取用户借阅的图书
-def get_user_books(user_id: str):
-    books = library_service.get_user_books(user_id)
+async def get_user_books(user_id: str):
+    books = await library_service.get_user_books(user_id)
     return books
+
+
+@app.get("/loans/overdue", response_model=list[Book])  # 逾期未还的图书，最早到期的在前
+async def overdue_loans(
+    now: float | None = None, limit: int = Query(100, ge=1, le=10000)
+):
+    # now 缺省是服务器当前时间；传一个将来的时间戳可以预先看看哪些书到时会逾期
+    return await library_service.overdue(now, limit)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)  # Prometheus 抓取
+async def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/stats")  # 存储和索引的规模、内存占用（如补全索引的字节数）
+async def storage_stats():
+    return await library_service.storage_stats()
@@ -0,0 +1 @@
+# 📊 性能基准脚本：在 library_system_api 目录下用 python -m benchmarks.xxx 运行
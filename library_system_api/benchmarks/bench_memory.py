@@ -0,0 +1,99 @@
+# 📊 内存基准：不同的图书存储方式，每本书占多少字节
+#
+#   cd library_system_api
+#   python -m benchmarks.bench_memory            # 默认 100 万本
+#   python -m benchmarks.bench_memory -n 100000
+#
+# 用 tracemalloc 统计建库前后 Python 分配的内存差，书名、作者等字符串都算在内
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from core.models import Book
+from infrastructure.columnar import ColumnarBookStore
+from infrastructure.in_memory_repos import CompactBookRepo
+
+
+@dataclass
+class DictBook:  # 改动前的 Book：普通 dataclass，每个对象带一个 __dict__
+    isbn: str
+    title: str
+    author: str
+    is_borrowed: bool = False
+    borrowed_by: str | None = None
+
+
+def generate(n: int, cls=Book):
+    """模拟真实数据：作者和借阅人大量重复，约 10% 的书被借出"""
+    for i in range(n):
+        borrowed = i % 10 == 0
+        yield cls(
+            f"978-7-{i:09d}",
+            f"图书标题 第{i}册",
+            f"作者{i % 5000}",  # 每次都是新字符串，和从 JSON 解析出来的一样
+            borrowed,
+            f"u{i % 1000}" if borrowed else None,
+        )
+
+
+def dict_of_dict_books(n: int):
+    return {book.isbn: book for book in generate(n, DictBook)}
+
+
+def dict_of_slotted_books(n: int):
+    return {book.isbn: book for book in generate(n)}
+
+
+def columnar_store(n: int):
+    store = ColumnarBookStore()
+    for book in generate(n):
+        store.put(book)
+    return store
+
+
+def compact_repo(n: int):
+    repo = CompactBookRepo()  # 含借阅人索引和有序 ISBN
+    batch = []
+    for book in generate(n):
+        batch.append(book)
+        if len(batch) == 10000:
+            repo.save_many(batch)
+            batch = []
+    repo.save_many(batch)
+    return repo
+
+
+CASES = [
+    ("dict + dataclass（改动前）", dict_of_dict_books),
+    ("dict + slots dataclass", dict_of_slotted_books),
+    ("按列存储 ColumnarBookStore", columnar_store),
+    ("CompactBookRepo（含索引）", compact_repo),
+]
+
+
+def measure(build, n: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(n)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del store
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图书存储的内存占用")
+    parser.add_argument("-n", type=int, default=1_000_000, help="图书数量")
+    args = parser.parse_args()
+    baseline = None
+    print(f"{args.n:,} 本图书")
+    for name, build in CASES:
+        per_book = measure(build, args.n) / args.n
+        baseline = baseline or per_book
+        print(f"{per_book:8.1f} 字节/本  {per_book / baseline:5.0%}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# ⏱️ LibraryService 基准：每种存储、每种规模下常用操作的耗时、启动时间和内存
+#
+#   cd library_system_api
+#   python -m benchmarks.bench_service run            # 1k / 100k / 1M，全部后端
+#   python -m benchmarks.bench_service run --sizes 1k,100k --backends json,sqlite
+#   python -m benchmarks.bench_service run -o new.json --baseline old.json
+#   python -m benchmarks.bench_service compare old.json new.json --threshold 0.2
+#
+# 每个后端先用 add_books 导入合成的图书目录，关掉后重新打开（计启动时间，
+# 再用 tracemalloc 统计打开后占用的内存），然后逐个计时 add_book、borrow_book、
+# return_book、get_user_books。每种操作最多跑 --ops 次或 --max-seconds 秒：
+# 每次保存都重写整个文件的 json 后端在 100 万本时一次就要几百毫秒。
+# 注意 tracemalloc 只统计 Python 分配的内存，sqlite 自己的页缓存不算在内。
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from benchmarks.bench_memory import generate
+from config import Settings
+from core.interfaces import supports
+from core.models import User
+from core.services import LibraryService
+from infrastructure.factory import create_repos
+from infrastructure.in_memory_repos import (
+    CompactBookRepo,
+    InMemoryBookRepo,
+    InMemoryUserRepo,
+)
+
+# 后端名 -> 对 Settings 的修改；None 表示纯内存，不落盘也就没有“重新打开”
+BACKENDS = {
+    "memory": None,
+    "compact": None,
+    "json": {"STORAGE": "json"},
+    "json-journal": {"STORAGE": "json", "JOURNAL": True},
+    "lazy": {"STORAGE": "lazy"},
+    "sharded": {"STORAGE": "sharded"},
+    "sqlite": {"STORAGE": "sqlite"},
+}
+SIZES = "1k,100k,1M"
+OPS = 1000  # 每种操作最多计时多少次
+MAX_SECONDS = 5.0  # 每种操作最多跑多少秒
+MIN_OPS = 5  # 超时也至少跑这么多次，样本太少分位数没有意义
+USERS = 100  # 基准里借书的用户数
+THRESHOLD = 0.2  # 比基线慢 20% 以上算退化
+# 差值小于这些就当作噪声，不算退化（微秒级的操作抖动很大）
+NOISE = {"p50_us": 2.0, "startup_seconds": 0.005, "bytes_per_book": 1.0}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    units = {"k": 1_000, "m": 1_000_000}
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def open_repos(backend: str, data_dir: Path):
+    if backend == "memory":
+        return InMemoryBookRepo(), InMemoryUserRepo()
+    if backend == "compact":
+        return CompactBookRepo(), InMemoryUserRepo()
+    settings = Settings()
+    # 不受运行环境里 LIBRARY_* 变量的影响
+    settings.DATA_DIR = data_dir
+    settings.SQLITE_PATH = data_dir / "library.db"
+    settings.JOURNAL = False
+    settings.FLUSH_DELAY = None
+    settings.CACHE_SIZE = 0
+    settings.WORKERS = 1
+    for name, value in BACKENDS[backend].items():
+        setattr(settings, name, value)
+    return create_repos(settings)
+
+
+def close_repos(*repos) -> None:
+    for repo in repos:
+        if supports(repo, "close"):
+            repo.close()
+
+
+def with_memory(build):
+    """返回 (build() 的结果, 期间新分配且还活着的字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e6
+
+    return {
+        "ops": len(ordered),
+        "mean_us": sum(ordered) / len(ordered) * 1e6 if ordered else 0.0,
+        "p50_us": pct(0.50) if ordered else 0.0,
+        "p95_us": pct(0.95) if ordered else 0.0,
+        "p99_us": pct(0.99) if ordered else 0.0,
+    }
+
+
+def time_ops(func, calls, max_ops: int, max_seconds: float) -> tuple[dict, list]:
+    """逐次计时 func(*args)，返回 (统计, 每次的返回值)"""
+    samples, results = [], []
+    deadline = time.perf_counter() + max_seconds
+    for args in calls:
+        if len(samples) >= max_ops:
+            break
+        start = time.perf_counter()
+        results.append(func(*args))
+        samples.append(time.perf_counter() - start)
+        if start > deadline and len(samples) >= MIN_OPS:
+            break
+    return summarize(samples), results
+
+
+def run_case(
+    backend: str, n: int, max_ops: int = OPS, max_seconds: float = MAX_SECONDS
+) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        result = {"backend": backend, "books": n}
+
+        def build():
+            repos = open_repos(backend, data_dir)
+            if BACKENDS[backend] is None:  # 纯内存：“启动”就是导入全部图书
+                LibraryService(*repos).add_books(generate(n))
+            return repos
+
+        if BACKENDS[backend] is not None:
+            book_repo, user_repo = open_repos(backend, data_dir)
+            start = time.perf_counter()
+            LibraryService(book_repo, user_repo).add_books(generate(n))
+            result["bulk_load_seconds"] = time.perf_counter() - start
+            close_repos(book_repo, user_repo)
+            gc.collect()
+        start = time.perf_counter()
+        close_repos(*build())
+        result["startup_seconds"] = time.perf_counter() - start
+        (book_repo, user_repo), memory = with_memory(build)
+        result["memory_bytes"] = memory
+        result["bytes_per_book"] = memory / n if n else 0.0
+
+        service = LibraryService(book_repo, user_repo)
+        for i in range(USERS):
+            user_repo.save(User(f"bench-u{i}", f"读者{i}"))
+        # isbn 下标个位是 1 的书在目录里都没借出（见 generate），均匀取遍整个目录
+        step = max(10, n // max_ops // 10 * 10)
+        available = [f"978-7-{i:09d}" for i in range(1, n, step)]
+        ops = {}
+        ops["add_book"], _ = time_ops(
+            service.add_book,
+            ((f"bench-{i:09d}", f"新书{i}", "基准") for i in range(max_ops)),
+            max_ops,
+            max_seconds,
+        )
+        ops["borrow_book"], borrowed = time_ops(
+            service.borrow_book,
+            ((isbn, f"bench-u{j % USERS}") for j, isbn in enumerate(available)),
+            max_ops,
+            max_seconds,
+        )
+        if not all(borrowed):
+            raise RuntimeError(f"{backend}：基准里有借书失败")
+        ops["return_book"], _ = time_ops(
+            service.return_book,
+            ((isbn,) for isbn in available[: len(borrowed)]),
+            max_ops,
+            max_seconds,
+        )
+        ops["get_user_books"], _ = time_ops(
+            service.get_user_books,
+            ((f"u{j % 1000}",) for j in range(max_ops)),  # 目录里的借阅人
+            max_ops,
+            max_seconds,
+        )
+        result["ops"] = ops
+        close_repos(book_repo, user_repo)
+        return result
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD) -> list:
+    """返回退化列表：[(后端, 规模, 指标, 基线值, 当前值), ...]；越小越好的指标才比"""
+    old = {(r["backend"], r["books"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        base = old.get((r["backend"], r["books"]))
+        if base is None:
+            continue
+        pairs = [
+            (m, base.get(m), r.get(m)) for m in ("startup_seconds", "bytes_per_book")
+        ]
+        for op, stats in r["ops"].items():
+            if op in base["ops"]:
+                before = base["ops"][op]["p50_us"]
+                pairs.append((f"{op}.p50_us", before, stats["p50_us"]))
+        for metric, before, after in pairs:
+            if before is None or after is None:
+                continue
+            noise = NOISE[metric.rsplit(".", 1)[-1]]
+            if after > before * (1 + threshold) and after - before > noise:
+                regressions.append((r["backend"], r["books"], metric, before, after))
+    return regressions
+
+
+def report(results: list[dict]) -> None:
+    ops = ("add_book", "borrow_book", "return_book", "get_user_books")
+    header = f"{'后端':<14}{'图书':>10}{'启动(s)':>10}{'字节/本':>10}"
+    print(header + "".join(f"{op + ' p50(µs)':>24}" for op in ops))
+    for r in results:
+        line = (
+            f"{r['backend']:<14}{r['books']:>10,}"
+            f"{r['startup_seconds']:>10.3f}{r['bytes_per_book']:>10.0f}"
+        )
+        print(line + "".join(f"{r['ops'][op]['p50_us']:>24.1f}" for op in ops))
+
+
+def print_regressions(regressions: list, threshold: float) -> None:
+    if not regressions:
+        print(f"没有超过 {threshold:.0%} 的退化")
+        return
+    print(f"发现 {len(regressions)} 项退化（阈值 {threshold:.0%}）：")
+    for backend, books, metric, before, after in regressions:
+        # 基线是 0（比如没有测到耗时）算不出百分比，当作新出现的开销
+        change = f"{after / before - 1:+.0%}" if before else "新增"
+        print(
+            f"  {backend:<14}{books:>10,}  {metric:<24}"
+            f"{before:>12.3f} -> {after:.3f}（{change}）"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="LibraryService 各存储后端的性能基准")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="跑基准，结果写入 JSON")
+    run.add_argument("--sizes", default=SIZES, help="图书数量，逗号分隔，如 1k,100k,1M")
+    run.add_argument(
+        "--backends", default=",".join(BACKENDS), help="逗号分隔：" + ",".join(BACKENDS)
+    )
+    run.add_argument("--ops", type=int, default=OPS, help="每种操作最多计时多少次")
+    run.add_argument("--max-seconds", type=float, default=MAX_SECONDS)
+    run.add_argument("-o", "--output", type=Path, default=Path("bench_results.json"))
+    run.add_argument("--baseline", type=Path, help="跑完和这个结果文件比较")
+    run.add_argument("--threshold", type=float, default=THRESHOLD)
+    cmp = commands.add_parser("compare", help="比较两个结果文件")
+    cmp.add_argument("baseline", type=Path)
+    cmp.add_argument("current", type=Path)
+    cmp.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+    else:
+        backends = [b.strip() for b in args.backends.split(",")]
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            parser.error(f"未知的后端：{', '.join(sorted(unknown))}")
+        results = []
+        for n in (parse_size(s) for s in args.sizes.split(",")):
+            for backend in backends:
+                print(f"{backend} × {n:,} ...", file=sys.stderr, flush=True)
+                results.append(run_case(backend, n, args.ops, args.max_seconds))
+        current = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        args.output.write_text(
+            json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        report(results)
+        print(f"结果已写入 {args.output}")
+        if args.baseline is None:
+            return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(baseline, current, args.threshold)
+    print_regressions(regressions, args.threshold)
+    return 1 if regressions else 0  # 非 0 退出码，CI 里可以直接拦下
+
+
+if __name__ == "__main__":
+    sys.exit(main())
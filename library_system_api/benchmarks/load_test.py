@@ -0,0 +1,356 @@
+# 🚦 本机压测：起一个 uvicorn 跑 api.main:app，按目标 RPS 回放混合请求
+#
+#   cd library_system_api
+#   python -m benchmarks.load_test --rps 500 --duration 30
+#   python -m benchmarks.load_test --storage sqlite --workers 4 --rps 2000
+#   python -m benchmarks.load_test --mix get=8,borrow=1,return=1 --duration 600
+#   python -m benchmarks.load_test --url http://127.0.0.1:8000 --no-seed
+# 最后一条压已经在跑的服务；--duration 设长一些就是浸泡测试（每 10 秒打印进度）
+#
+# 只用 asyncio：每个连接一个协程，HTTP/1.1 keep-alive，不依赖 httpx / wrk 等工具。
+# 请求按计划时间发出（开环），延迟从计划时间算起：服务端变慢时排队的时间也算在内，
+# 不会因为客户端跟着变慢而把延迟“藏”起来。
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+from benchmarks.bench_memory import generate
+from benchmarks.bench_service import close_repos, summarize
+from config import Settings
+from core.models import User
+from core.services import LibraryService
+from infrastructure.factory import create_repos
+
+APP_DIR = Path(__file__).parent.parent
+OPERATIONS = ("add", "get", "borrow", "return", "user_books")
+MIX = "add=1,get=6,borrow=1,return=1,user_books=1"
+USERS = 1000  # generate() 里的借阅人是 u0 ~ u999
+REPORT_EVERY = 10.0  # 浸泡测试时每隔多少秒打印一次进度
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"未知的操作：{name}（可选 {', '.join(OPERATIONS)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class HttpConnection:
+    """最简单的 HTTP/1.1 keep-alive 客户端：一次一个请求，只关心状态码"""
+
+    def __init__(self, host: str, port: int):
+        self._host = host
+        self._port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> int:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(
+                self._host, self._port
+            )
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self._host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        try:
+            self._writer.write(head.encode("latin-1") + body)
+            await self._writer.drain()
+            return await self._read_response()
+        except BaseException:
+            self.close()  # 连接状态不明，下次重连
+            raise
+
+    async def _read_response(self) -> int:
+        status = int((await self._reader.readline()).split()[1])
+        length, chunked, keep_alive = 0, False, True
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                keep_alive = value != "close"
+        if chunked:
+            while size := int((await self._reader.readline()).split(b";")[0], 16):
+                await self._reader.readexactly(size + 2)
+            await self._reader.readline()
+        elif length:
+            await self._reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+class Workload:
+    """按权重随机生成请求；记下大致的借出状态，借书多半能借到、还书多半有书可还"""
+
+    def __init__(self, mix: dict[str, float], books: int, seed: int = 0):
+        self._ops = list(mix)
+        self._weights = [mix[op] for op in self._ops]
+        self._books = books
+        self._random = random.Random(seed)
+        self._borrowed = []  # 压测期间借出、还没还的书
+        self._added = 0
+
+    def _catalog_isbn(self) -> str:
+        # 个位是 1 的下标在 generate() 里没借出，借书从这些书里挑
+        i = self._random.randrange(max(1, self._books // 10)) * 10 + 1
+        return f"978-7-{min(i, self._books - 1):09d}"
+
+    def next(self) -> tuple[str, str, str]:
+        """返回 (操作名, HTTP 方法, 路径)"""
+        op = self._random.choices(self._ops, self._weights)[0]
+        user = f"u{self._random.randrange(USERS)}"
+        if op == "add":
+            self._added += 1
+            isbn = f"load-{os.getpid()}-{self._added}"
+            title = quote(f"压测图书{self._added}")
+            return op, "POST", f"/books?isbn={isbn}&title={title}&author=load"
+        if op == "get":
+            return op, "GET", f"/books/{self._catalog_isbn()}"
+        if op == "borrow":
+            isbn = self._catalog_isbn()
+            self._borrowed.append(isbn)
+            return op, "POST", f"/books/{isbn}/borrow?user_id={user}"
+        if op == "return":
+            if self._borrowed:
+                isbn = self._borrowed.pop(self._random.randrange(len(self._borrowed)))
+            else:
+                isbn = self._catalog_isbn()
+            return op, "POST", f"/books/{isbn}/return"
+        return op, "GET", f"/users/{user}/books"
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.statuses = {}  # {状态码或异常名: 次数}
+        self.errors = 0  # 5xx、连接失败、超时
+        self.rejected = 0  # 4xx：比如书已经被借走，属于正常的业务结果
+
+    def record(self, op: str, latency: float, status) -> None:
+        self.latencies[op].append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not isinstance(status, int) or status >= 500:
+            self.errors += 1
+        elif status >= 400:
+            self.rejected += 1
+
+    @property
+    def completed(self) -> int:
+        return sum(len(samples) for samples in self.latencies.values())
+
+
+async def drive(
+    host: str,
+    port: int,
+    workload: Workload,
+    rps: float,
+    duration: float,
+    connections: int,
+    timeout: float = 10.0,
+) -> dict:
+    stats = Stats()
+    queue = asyncio.Queue(maxsize=connections * 4)
+    loop = asyncio.get_running_loop()
+
+    async def worker():
+        conn = HttpConnection(host, port)
+        while (item := await queue.get()) is not None:
+            scheduled, op, method, path = item
+            try:
+                status = await asyncio.wait_for(conn.request(method, path), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                status = type(e).__name__
+            stats.record(op, loop.time() - scheduled, status)
+        conn.close()
+
+    async def progress():
+        last = 0
+        while True:
+            await asyncio.sleep(REPORT_EVERY)
+            done = stats.completed
+            line = f"{done - last:>8} 个请求 / {REPORT_EVERY:.0f}s"
+            print(f"{line}，累计错误 {stats.errors}", file=sys.stderr, flush=True)
+            last = done
+
+    workers = [asyncio.create_task(worker()) for _ in range(connections)]
+    reporter = asyncio.create_task(progress())
+    start = loop.time()
+    sent = 0
+    while (now := loop.time()) - start < duration:
+        due = int((now - start) * rps) + 1  # 到现在为止按计划应该发出的请求数
+        while sent < due:
+            scheduled = start + sent / rps
+            op, method, path = workload.next()
+            await queue.put((scheduled, op, method, path))  # 队列满说明连接数不够
+            sent += 1
+        await asyncio.sleep(max(0.0, start + sent / rps - loop.time()))
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    reporter.cancel()
+    elapsed = loop.time() - start
+    return report(stats, elapsed, rps)
+
+
+def report(stats: Stats, elapsed: float, rps: float) -> dict:
+    everything = [x for samples in stats.latencies.values() for x in samples]
+    per_op = {op: summarize(s) for op, s in stats.latencies.items() if s}
+    completed = len(everything)
+    return {
+        "target_rps": rps,
+        "seconds": elapsed,
+        "requests": completed,
+        "throughput_rps": completed / elapsed if elapsed else 0.0,
+        "error_rate": stats.errors / completed if completed else 0.0,
+        "rejected": stats.rejected,
+        "statuses": {str(k): v for k, v in sorted(stats.statuses.items(), key=str)},
+        "latency": summarize(everything),
+        "operations": per_op,
+    }
+
+
+def print_report(result: dict) -> None:
+    lat = result["latency"]
+    print(
+        f"{result['requests']:,} 个请求 / {result['seconds']:.1f}s："
+        f"{result['throughput_rps']:.0f} req/s（目标 {result['target_rps']:.0f}），"
+        f"错误率 {result['error_rate']:.2%}，4xx {result['rejected']}"
+    )
+    print(f"{'':<12}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    rows = [("全部", lat)] + list(result["operations"].items())
+    for name, s in rows:
+        print(
+            f"{name:<12}{s['ops']:>8}{s['p50_us'] / 1000:>10.2f}"
+            f"{s['p95_us'] / 1000:>10.2f}{s['p99_us'] / 1000:>10.2f}"
+        )
+    print("状态码：", result["statuses"])
+
+
+def seed(settings: Settings, books: int) -> None:
+    """不经过 HTTP 直接写存储：导入图书目录和借阅用户"""
+    book_repo, user_repo = create_repos(settings)
+    try:
+        LibraryService(book_repo, user_repo).add_books(generate(books))
+        for i in range(USERS):
+            user_repo.save(User(f"u{i}", f"读者{i}"))
+    finally:
+        close_repos(book_repo, user_repo)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: dict, workers: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", "api.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]  # fmt: skip
+    server = subprocess.Popen(cmd, cwd=APP_DIR, env=env)
+    deadline = time.monotonic() + 60  # 大目录加载要一会儿
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn 启动失败，退出码 {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("等了 60 秒 uvicorn 还没开始监听")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()  # SIGTERM：uvicorn 会跑 lifespan 的关闭逻辑，把数据落盘
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="本机 HTTP 压测 / 浸泡测试")
+    parser.add_argument("--rps", type=float, default=200, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=30, help="压测秒数")
+    parser.add_argument("--connections", type=int, default=64, help="并发连接数")
+    parser.add_argument("--mix", default=MIX, help=f"操作权重，默认 {MIX}")
+    parser.add_argument("--books", type=int, default=10_000, help="预先导入的图书数")
+    parser.add_argument("--storage", default="json", help="LIBRARY_STORAGE")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 数")
+    parser.add_argument("--url", help="压已经在跑的服务，不自己启动 uvicorn")
+    parser.add_argument("--no-seed", action="store_true", help="不导入数据")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("-o", "--output", type=Path, help="结果另存为 JSON")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+    workload = Workload(mix, args.books, args.seed)
+
+    def run(host: str, port: int) -> dict:
+        return asyncio.run(
+            drive(host, port, workload, args.rps, args.duration, args.connections)
+        )
+
+    if args.url:
+        url = urlsplit(args.url)
+        result = run(url.hostname, url.port or 80)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            env = dict(os.environ)
+            env.update(
+                LIBRARY_STORAGE=args.storage,
+                LIBRARY_DATA_DIR=data_dir,
+                LIBRARY_SQLITE_PATH=str(Path(data_dir) / "library.db"),
+                WEB_CONCURRENCY=str(args.workers),
+            )
+            if not args.no_seed:
+                settings = Settings()
+                settings.STORAGE = args.storage
+                settings.DATA_DIR = Path(data_dir)
+                settings.SQLITE_PATH = Path(data_dir) / "library.db"
+                settings.WORKERS = 1  # 导入只在这一个进程里做
+                print(f"导入 {args.books:,} 本图书 ...", file=sys.stderr, flush=True)
+                seed(settings, args.books)
+            port = free_port()
+            server = start_server(port, env, args.workers)
+            try:
+                result = run("127.0.0.1", port)
+            finally:
+                stop_server(server)
+    result["mix"] = mix
+    result["storage"] = None if args.url else args.storage
+    result["workers"] = None if args.url else args.workers
+    print_report(result)
+    if args.output:
+        args.output.write_text(
+            json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
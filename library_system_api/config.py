@@ -0,0 +1,39 @@
+# ⚙️ 配置：从环境变量读取，没设置就用默认值
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+
+
+class Settings:
+    # 存储后端：json（默认）、sqlite、lazy（books.jsonl，按需读取单本）
+    # 或 sharded（按 ISBN 分成 SHARDS 个 JSON 文件，保存时只重写一个）
+    STORAGE: str = os.getenv("LIBRARY_STORAGE", "json").lower()
+    DATA_DIR: Path = Path(os.getenv("LIBRARY_DATA_DIR", PROJECT_ROOT / "data"))
+    # json 后端：是否开启追加日志模式
+    JOURNAL: bool = os.getenv("LIBRARY_JOURNAL", "false").lower() in ("true", "1")
+    # sharded 后端：分片数
+    SHARDS: int = int(os.getenv("LIBRARY_SHARDS", "16"))
+    # sqlite 后端：数据库文件，默认放在 DATA_DIR 下
+    SQLITE_PATH: Path = Path(os.getenv("LIBRARY_SQLITE_PATH", DATA_DIR / "library.db"))
+    # json 后端延迟写盘：最多攒多少毫秒 / 多少次修改再写一次文件（不设就每次 save 都写）
+    _FLUSH_DELAY_MS = os.getenv("LIBRARY_FLUSH_DELAY_MS")
+    FLUSH_DELAY: float | None = int(_FLUSH_DELAY_MS) / 1000 if _FLUSH_DELAY_MS else None
+    FLUSH_EVERY: int = int(os.getenv("LIBRARY_FLUSH_EVERY", "1000"))
+    # worker 进程数（uvicorn --workers 也读这个变量）：大于 1 时只能用 sqlite
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # 图书读缓存：最多缓存多少本（0 表示不缓存），过期秒数（不设就不过期）
+    CACHE_SIZE: int = int(os.getenv("LIBRARY_CACHE_SIZE", "0"))
+    _CACHE_TTL = os.getenv("LIBRARY_CACHE_TTL")
+    CACHE_TTL: float | None = float(_CACHE_TTL) if _CACHE_TTL else None
+    # 借期（天）：借书时应还时间 = 借出时间 + LOAN_DAYS 天
+    LOAN_DAYS: float = float(os.getenv("LIBRARY_LOAN_DAYS", "30"))
+    # 日志：级别、额外写入的文件（不设就只输出到终端）、是否输出 JSON 行、
+    # INFO 及以下日志的采样比例（1 表示全部保留，0.1 表示随机保留一成）
+    LOG_LEVEL: str = os.getenv("LIBRARY_LOG_LEVEL", "INFO")
+    LOG_FILE: str | None = os.getenv("LIBRARY_LOG_FILE") or None
+    LOG_JSON: bool = os.getenv("LIBRARY_LOG_JSON", "false").lower() in ("true", "1")
+    LOG_SAMPLE_RATE: float = float(os.getenv("LIBRARY_LOG_SAMPLE_RATE", "1"))
+
+
+settings = Settings()
@@ -0,0 +1,152 @@
+# ⚙️ 异步版业务逻辑（`core/async_services.py`）：规则同 LibraryService，仓库是异步的
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Iterable
+from contextlib import AsyncExitStack
+from itertools import islice
+from .models import Book
+from .interfaces import AsyncBookRepository, AsyncUserRepository
+from .locks import StripedLock
+from .services import (
+    BULK_CHUNK_SIZE,
+    DAY_SECONDS,
+    LOAN_DAYS,
+    NOT_FOUND,
+    OK,
+    UNAVAILABLE,
+    UNKNOWN_USER,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLibraryService:
+    def __init__(
+        self,
+        book_repo: AsyncBookRepository,
+        user_repo: AsyncUserRepository,
+        loan_days: float = LOAN_DAYS,
+    ):
+        self._book_repo = book_repo
+        self._user_repo = user_repo
+        self._loan_seconds = loan_days * DAY_SECONDS
+        # 协程在 await 处会切换，“读-判断-写”同样要按 ISBN 加锁（用 asyncio.Lock）
+        self._locks = StripedLock(lock_factory=asyncio.Lock)
+
+    async def add_book(self, isbn: str, title: str, author: str) -> Book:
+        book = Book(isbn=isbn, title=title, author=author)
+        async with self._locks.for_key(isbn):
+            await self._book_repo.save(book)
+        logger.info("图书 %s 添加成功", title)
+        return book
+
+    async def add_books(
+        self, books: Iterable[Book], chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        it = iter(books)
+        total = 0
+        while chunk := list(islice(it, chunk_size)):
+            await self._book_repo.save_many(chunk)
+            total += len(chunk)
+        logger.info("批量导入 %d 本图书", total)
+        return total
+
+    async def borrow_book(self, isbn: str, user_id: str) -> bool:
+        user = await self._user_repo.get_by_id(user_id)
+        if not user:
+            return False
+        # sqlite 仓库在数据库里原子地判断 + 修改（多个 worker 进程也安全），
+        # 其他仓库在适配器里读-判断-写，靠这把锁串行
+        async with self._locks.for_key(isbn):
+            due_at = time.time() + self._loan_seconds
+            if not await self._book_repo.try_borrow(isbn, user_id, due_at):
+                return False
+        logger.info("用户 %s 借阅了图书 %s", user.name, isbn)
+        return True
+
+    async def return_book(self, isbn: str) -> bool:
+        async with self._locks.for_key(isbn):
+            if not await self._book_repo.try_return(isbn):
+                return False
+        logger.info("图书 %s 还书成功", isbn)
+        return True
+
+    async def borrow_many(self, user_id: str, isbns: Iterable[str]) -> dict[str, str]:
+        isbns = list(dict.fromkeys(isbns))
+        user = await self._user_repo.get_by_id(user_id)
+        if not user:
+            return dict.fromkeys(isbns, UNKNOWN_USER)
+        results = await self._change_many(isbns, user_id)
+        done = sum(r == OK for r in results.values())
+        logger.info("用户 %s 批量借阅 %d/%d 本图书", user.name, done, len(isbns))
+        return results
+
+    async def return_many(self, isbns: Iterable[str]) -> dict[str, str]:
+        isbns = list(dict.fromkeys(isbns))
+        results = await self._change_many(isbns, None)
+        done = sum(r == OK for r in results.values())
+        logger.info("批量还书 %d/%d 本", done, len(isbns))
+        return results
+
+    async def _change_many(
+        self, isbns: list[str], user_id: str | None
+    ) -> dict[str, str]:
+        async with AsyncExitStack() as stack:
+            for lock in self._locks.for_keys(isbns):  # 固定顺序加锁，不会死锁
+                await stack.enter_async_context(lock)
+            if user_id is not None:
+                due_at = time.time() + self._loan_seconds
+                done = set(
+                    await self._book_repo.try_borrow_many(isbns, user_id, due_at)
+                )
+            else:
+                done = set(await self._book_repo.try_return_many(isbns))
+        failed = [isbn for isbn in isbns if isbn not in done]
+        found = await self._book_repo.get_many(failed) if failed else {}
+        return {
+            isbn: OK if isbn in done else UNAVAILABLE if isbn in found else NOT_FOUND
+            for isbn in isbns
+        }
+
+    async def is_available(self, isbn: str) -> bool:
+        book = await self._book_repo.get_by_isbn(isbn)
+        return book is not None and not book.is_borrowed
+
+    async def get_books(self, isbns: Iterable[str]) -> dict[str, Book]:
+        return await self._book_repo.get_many(list(dict.fromkeys(isbns)))
+
+    async def availability(self, isbns: Iterable[str]) -> dict[str, bool]:
+        isbns = list(dict.fromkeys(isbns))
+        books = await self._book_repo.get_many(isbns)
+        return {i: i in books and not books[i].is_borrowed for i in isbns}
+
+    async def get_user_books(self, user_id: str) -> list[Book]:
+        return await self._book_repo.list_by_borrower(user_id)
+
+    async def overdue(
+        self, now: float | None = None, limit: int | None = None
+    ) -> list[Book]:
+        now = time.time() if now is None else now
+        return await self._book_repo.list_overdue(now, limit)
+
+    async def get_book_by_isbn(self, isbn: str) -> Book | None:
+        return await self._book_repo.get_by_isbn(isbn)
+
+    def iter_books(
+        self, after_isbn: str | None = None, limit: int | None = None
+    ) -> AsyncIterator[Book]:
+        return self._book_repo.iter_books(after_isbn, limit)
+
+    async def search(self, query: str, limit: int = 20) -> list[Book]:
+        return await self._book_repo.search(query, limit)
+
+    async def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        return await self._book_repo.suggest(prefix, k)
+
+    async def storage_stats(self) -> dict:
+        stats = await self._book_repo.stats()
+        user_stats = await self._user_repo.stats()
+        if user_stats:
+            stats["users"] = user_stats
+        return stats
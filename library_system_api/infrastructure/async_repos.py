@@ -0,0 +1,211 @@
+# ⚡ 异步仓库（`infrastructure/async_repos.py`）
+# 把任意同步仓库包一层：阻塞的文件 / SQLite I/O 放到线程池里执行，事件循环不被卡住
+import asyncio
+import time
+from core.interfaces import BookRepository, UserRepository, supports
+from core.models import Book, User, overdue_books
+from core.text import rank_books, rank_completions
+from infrastructure.indexes import PAGE_SIZE
+from infrastructure.metrics import REPO_CALL_SECONDS
+
+
+def _timed(repo: str, method: str, func, *args):
+    # 在执行它的线程里计时：只算仓库本身的耗时，不含排队等线程池的时间
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        REPO_CALL_SECONDS.observe(elapsed, repo=repo, method=method)
+
+
+class AsyncBookRepo:
+    """实现 AsyncBookRepository 协议。
+
+    offload_reads=False 适合 json/内存仓库：数据都在内存里，读只是查字典，
+    直接调用比切换到线程更快；写（要落盘）始终放到线程池。
+    """
+
+    def __init__(self, inner: BookRepository, offload_reads: bool = True):
+        self._inner = inner
+        self._offload_reads = offload_reads
+
+    async def _read(self, method: str, *args, func=None):
+        # func 缺省是底层仓库的同名方法；退回方案传自己的实现，指标仍记在 method 名下
+        func = func or getattr(self._inner, method)
+        if self._offload_reads:
+            return await asyncio.to_thread(_timed, "books", method, func, *args)
+        return _timed("books", method, func, *args)
+
+    async def _write(self, method: str, *args, func=None):
+        func = func or getattr(self._inner, method)
+        return await asyncio.to_thread(_timed, "books", method, func, *args)
+
+    async def get_by_isbn(self, isbn: str) -> Book | None:
+        return await self._read("get_by_isbn", isbn)
+
+    async def get_many(self, isbns: list[str]) -> dict[str, Book]:
+        if supports(self._inner, "get_many"):
+            return await self._read("get_many", isbns)
+        # 逐本查，但只切换一次线程
+        return await self._read("get_many", isbns, func=self._get_each)
+
+    def _get_each(self, isbns: list[str]) -> dict[str, Book]:
+        found = {}
+        for isbn in isbns:
+            book = self._inner.get_by_isbn(isbn)
+            if book is not None:
+                found[isbn] = book
+        return found
+
+    async def save(self, book: Book) -> None:
+        await self._write("save", book)
+
+    async def save_many(self, books: list[Book]) -> None:
+        if supports(self._inner, "save_many"):
+            await self._write("save_many", books)
+        else:
+            await self._write("save_many", books, func=self._save_each)
+
+    async def list_all(self) -> list[Book]:
+        return await self._read("list_all")
+
+    async def list_by_borrower(self, user_id: str) -> list[Book]:
+        if supports(self._inner, "list_by_borrower"):
+            return await self._read("list_by_borrower", user_id)
+        # 底层没有借阅人索引：退回全表扫描，读全表和过滤都在线程池里做
+        return await self._read("list_by_borrower", user_id, func=self._borrowed_by)
+
+    def _borrowed_by(self, user_id: str) -> list[Book]:
+        return [b for b in self._inner.list_all() if b.borrowed_by == user_id]
+
+    async def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        if supports(self._inner, "list_overdue"):
+            return await self._read("list_overdue", now, limit)
+        return await self._read("list_overdue", now, limit, func=self._scan_overdue)
+
+    def _scan_overdue(self, now: float, limit: int | None) -> list[Book]:
+        return overdue_books(self._inner.list_all(), now, limit)  # 退回全表扫描
+
+    async def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        """异步逐本产出图书：每次在线程里取一页，不跨线程共用同步生成器"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            page = await self._read("iter_books", after_isbn, size, func=self._page)
+            if not page:
+                return
+            for book in page:
+                yield book
+            after_isbn = page[-1].isbn
+            if remaining is not None:
+                remaining -= len(page)
+
+    async def search(self, query: str, limit: int = 20) -> list[Book]:
+        if supports(self._inner, "search"):
+            return await self._read("search", query, limit)
+        return await self._read("search", query, limit, func=self._rank_books)
+
+    def _rank_books(self, query: str, limit: int) -> list[Book]:
+        return rank_books(self._inner.list_all(), query, limit)
+
+    async def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        if supports(self._inner, "suggest"):
+            return await self._read("suggest", prefix, k)
+        return await self._read("suggest", prefix, k, func=self._rank_completions)
+
+    def _rank_completions(self, prefix: str, k: int) -> list[str]:
+        return rank_completions(self._inner.list_all(), prefix, k)
+
+    async def stats(self) -> dict:
+        if supports(self._inner, "stats"):
+            return await self._read("stats")
+        return {}
+
+    async def try_borrow(
+        self, isbn: str, user_id: str, due_at: float | None = None
+    ) -> bool:
+        if supports(self._inner, "try_borrow"):  # 存储里原子完成（多进程安全）
+            return await self._write("try_borrow", isbn, user_id, due_at)
+        # 否则读-判断-写，由调用方（service 的 ISBN 锁）保证串行
+        book = await self.get_by_isbn(isbn)
+        if book is None or book.is_borrowed:
+            return False
+        book.is_borrowed, book.borrowed_by, book.due_at = True, user_id, due_at
+        await self.save(book)
+        return True
+
+    async def try_return(self, isbn: str) -> bool:
+        if supports(self._inner, "try_return"):
+            return await self._write("try_return", isbn)
+        book = await self.get_by_isbn(isbn)
+        if book is None or not book.is_borrowed:
+            return False
+        book.is_borrowed, book.borrowed_by, book.due_at = False, None, None
+        await self.save(book)
+        return True
+
+    async def try_borrow_many(
+        self, isbns: list[str], user_id: str, due_at: float | None = None
+    ) -> list[str]:
+        if supports(self._inner, "try_borrow_many"):
+            return await self._write("try_borrow_many", isbns, user_id, due_at)
+        return await self._change_many(isbns, user_id, due_at)
+
+    async def try_return_many(self, isbns: list[str]) -> list[str]:
+        if supports(self._inner, "try_return_many"):
+            return await self._write("try_return_many", isbns)
+        return await self._change_many(isbns, None)
+
+    async def _change_many(
+        self, isbns: list[str], user_id: str | None, due_at: float | None = None
+    ) -> list[str]:
+        # 读-判断-写，整批一次 save_many；由调用方（service 的 ISBN 锁）保证串行
+        borrow = user_id is not None
+        books = await self.get_many(isbns)
+        changed = [b for b in books.values() if b.is_borrowed != borrow]
+        for book in changed:
+            book.is_borrowed, book.borrowed_by, book.due_at = borrow, user_id, due_at
+        if changed:
+            await self.save_many(changed)
+        return [book.isbn for book in changed]
+
+    async def close(self) -> None:  # 应用关闭时调用：把没落盘的修改写完
+        if supports(self._inner, "close"):
+            await asyncio.to_thread(self._inner.close)
+
+    def _save_each(self, books: list[Book]) -> None:
+        for book in books:
+            self._inner.save(book)
+
+    def _page(self, after_isbn: str | None, size: int) -> list[Book]:
+        if supports(self._inner, "iter_books"):
+            return list(self._inner.iter_books(after_isbn, size))
+        books = sorted(self._inner.list_all(), key=lambda b: b.isbn)
+        return [b for b in books if after_isbn is None or b.isbn > after_isbn][:size]
+
+
+class AsyncUserRepo:
+    # 实现 AsyncUserRepository 协议
+    def __init__(self, inner: UserRepository, offload_reads: bool = True):
+        self._inner = inner
+        self._offload_reads = offload_reads
+
+    async def get_by_id(self, user_id: str) -> User | None:
+        if self._offload_reads:
+            return await asyncio.to_thread(
+                _timed, "users", "get_by_id", self._inner.get_by_id, user_id
+            )
+        return _timed("users", "get_by_id", self._inner.get_by_id, user_id)
+
+    async def save(self, user: User) -> None:
+        await asyncio.to_thread(_timed, "users", "save", self._inner.save, user)
+
+    async def stats(self) -> dict:
+        if supports(self._inner, "stats"):
+            return await asyncio.to_thread(self._inner.stats)
+        return {}
+
+    async def close(self) -> None:
+        if supports(self._inner, "close"):
+            await asyncio.to_thread(self._inner.close)
@@ -0,0 +1,269 @@
+# 🧠 读缓存（`infrastructure/caching_repo.py`）
+# 包在任意 BookRepository 外面：get_by_isbn 先查 LRU 缓存，save 时写穿（write-through）
+# 一次借书要调用 2~3 次 get_by_isbn，sqlite 或远程仓库每次都走磁盘/网络，缓存省掉大部分
+import threading
+import time
+from collections import OrderedDict
+from core.interfaces import BookRepository, supports
+from core.models import Book, overdue_books
+from core.text import rank_books, rank_completions
+
+CACHE_SIZE = 1024  # 默认最多缓存多少本书
+
+
+class CachingBookRepo:
+    """带 LRU 缓存的图书仓库，实现 BookRepository 协议。
+
+    maxsize 是最多缓存的图书数，满了淘汰最久没用的；ttl 是秒数，
+    None 表示不过期（只有本进程写这个仓库时才安全，多进程共享数据时要设 ttl）。
+    """
+
+    def __init__(
+        self, inner: BookRepository, maxsize: int = CACHE_SIZE, ttl: float | None = None
+    ):
+        self._inner = inner
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._cache = OrderedDict()  # {isbn: (book, 过期时间)}，越靠后越新
+        # 正在从底层读的 isbn：{isbn: [读者个数, 代数]}。读的过程中这本书被改了
+        # （代数变了），读到的就是旧数据，不能再放进缓存
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _put(self, book: Book) -> None:
+        expires = None if self._ttl is None else time.monotonic() + self._ttl
+        with self._lock:
+            self._cache[book.isbn] = (book, expires)
+            self._cache.move_to_end(book.isbn)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _changed(self, isbn: str) -> None:
+        # 调用方持有 self._lock：这本书被写过，正在读它的线程读到的可能是旧值
+        entry = self._loading.get(isbn)
+        if entry is not None:
+            entry[1] += 1
+
+    def _begin_load(self, isbn: str) -> int:
+        # 调用方持有 self._lock；返回当前代数，读完交给 _finish_load
+        entry = self._loading.setdefault(isbn, [0, 0])
+        entry[0] += 1
+        return entry[1]
+
+    def _finish_load(self, isbn: str, generation: int) -> bool:
+        """读者结束；返回读到的值还能不能放进缓存（期间没有被写过）"""
+        with self._lock:
+            entry = self._loading[isbn]
+            entry[0] -= 1
+            if entry[0] == 0:
+                del self._loading[isbn]
+            return entry[1] == generation
+
+    def invalidate(self, isbn: str) -> None:
+        with self._lock:
+            self._cache.pop(isbn, None)
+            self._changed(isbn)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _lookup(self, isbn: str) -> Book | None:
+        # 调用方持有 self._lock；命中返回图书，没命中（或过期）返回 None
+        entry = self._cache.get(isbn)
+        if entry is not None:
+            book, expires = entry
+            if expires is None or expires > time.monotonic():
+                self._cache.move_to_end(isbn)
+                self.hits += 1
+                return book
+            del self._cache[isbn]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        with self._lock:
+            book = self._lookup(isbn)
+            if book is not None:
+                return book
+            generation = self._begin_load(isbn)
+        try:
+            book = self._inner.get_by_isbn(isbn)
+        finally:
+            fresh = self._finish_load(isbn, generation)
+        if book is not None and fresh:  # 不存在的书不缓存，免得乱查的 isbn 把缓存挤满
+            self._put(book)
+        return book
+
+    def get_many(self, isbns) -> dict[str, Book]:
+        found, missing = {}, {}  # missing: {isbn: 开始读时的代数}
+        with self._lock:
+            for isbn in dict.fromkeys(isbns):
+                book = self._lookup(isbn)
+                if book is None:
+                    missing[isbn] = self._begin_load(isbn)
+                else:
+                    found[isbn] = book
+        if not missing:
+            return found
+        try:  # 没命中的一次性向底层要
+            if supports(self._inner, "get_many"):
+                loaded = self._inner.get_many(list(missing))
+            else:
+                loaded = {}
+                for isbn in missing:
+                    book = self._inner.get_by_isbn(isbn)
+                    if book is not None:
+                        loaded[isbn] = book
+        finally:
+            fresh = {i for i, gen in missing.items() if self._finish_load(i, gen)}
+        for isbn, book in loaded.items():
+            if isbn in fresh:
+                self._put(book)
+        found.update(loaded)
+        return found
+
+    def save(self, book: Book) -> None:
+        try:
+            self._inner.save(book)
+        except BaseException:
+            self.invalidate(book.isbn)  # 没保存成功：缓存里可能是改了一半的对象
+            raise
+        with self._lock:
+            self._changed(book.isbn)  # 同时在读旧值的线程不要再把旧值放回来
+        self._put(book)
+
+    def save_many(self, books: list[Book]) -> None:
+        try:
+            if supports(self._inner, "save_many"):
+                self._inner.save_many(books)
+            else:
+                for book in books:
+                    self._inner.save(book)
+        except BaseException:
+            for book in books:
+                self.invalidate(book.isbn)
+            raise
+        # 批量导入的书不一定马上有人查：只更新已经在缓存里的，不挤掉热门的书
+        with self._lock:
+            for book in books:
+                self._changed(book.isbn)
+            cached = [book for book in books if book.isbn in self._cache]
+        for book in cached:
+            self._put(book)
+
+    def try_borrow(self, isbn: str, user_id: str, due_at: float | None = None) -> bool:
+        if not supports(self._inner, "try_borrow"):
+            # 底层不支持：读-判断-写，由调用方（service 的 ISBN 锁）保证串行
+            book = self.get_by_isbn(isbn)
+            if book is None or book.is_borrowed:
+                return False
+            book.is_borrowed, book.borrowed_by, book.due_at = True, user_id, due_at
+            self.save(book)
+            return True
+        try:
+            return self._inner.try_borrow(isbn, user_id, due_at)
+        finally:
+            self.invalidate(isbn)  # 成功了缓存就旧了；失败多半是缓存早就旧了
+
+    def try_return(self, isbn: str) -> bool:
+        if not supports(self._inner, "try_return"):
+            book = self.get_by_isbn(isbn)
+            if book is None or not book.is_borrowed:
+                return False
+            book.is_borrowed, book.borrowed_by, book.due_at = False, None, None
+            self.save(book)
+            return True
+        try:
+            return self._inner.try_return(isbn)
+        finally:
+            self.invalidate(isbn)
+
+    # 下面都是直接转发：列表、检索的结果不缓存，底层没有的能力就退回扫描
+    def try_borrow_many(
+        self, isbns: list[str], user_id: str, due_at: float | None = None
+    ) -> list[str]:
+        if not supports(self._inner, "try_borrow_many"):
+            return self._change_many(isbns, user_id, due_at)
+        try:
+            return self._inner.try_borrow_many(isbns, user_id, due_at)
+        finally:
+            for isbn in isbns:
+                self.invalidate(isbn)
+
+    def try_return_many(self, isbns: list[str]) -> list[str]:
+        if not supports(self._inner, "try_return_many"):
+            return self._change_many(isbns, None)
+        try:
+            return self._inner.try_return_many(isbns)
+        finally:
+            for isbn in isbns:
+                self.invalidate(isbn)
+
+    def _change_many(
+        self, isbns: list[str], user_id: str | None, due_at: float | None = None
+    ) -> list[str]:
+        # 底层不支持：读-判断-写，一次 save_many，由调用方（service 的 ISBN 锁）保证串行
+        borrow = user_id is not None
+        changed = [b for b in self.get_many(isbns).values() if b.is_borrowed != borrow]
+        for book in changed:
+            book.is_borrowed, book.borrowed_by, book.due_at = borrow, user_id, due_at
+        if changed:
+            self.save_many(changed)
+        return [book.isbn for book in changed]
+
+    def list_all(self) -> list[Book]:
+        return self._inner.list_all()
+
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        if supports(self._inner, "list_by_borrower"):
+            return self._inner.list_by_borrower(user_id)
+        return [b for b in self._inner.list_all() if b.borrowed_by == user_id]
+
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        if supports(self._inner, "list_overdue"):
+            return self._inner.list_overdue(now, limit)
+        return overdue_books(self._inner.list_all(), now, limit)
+
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        if supports(self._inner, "iter_books"):
+            return self._inner.iter_books(after_isbn, limit)
+        books = sorted(self._inner.list_all(), key=lambda b: b.isbn)
+        books = [b for b in books if after_isbn is None or b.isbn > after_isbn]
+        return iter(books if limit is None else books[:limit])
+
+    def search(self, query: str, limit: int = 20) -> list[Book]:
+        if supports(self._inner, "search"):
+            return self._inner.search(query, limit)
+        return rank_books(self._inner.list_all(), query, limit)
+
+    def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        if supports(self._inner, "suggest"):
+            return self._inner.suggest(prefix, k)
+        return rank_completions(self._inner.list_all(), prefix, k)
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def stats(self) -> dict:
+        stats = self._inner.stats() if supports(self._inner, "stats") else {}
+        return {**stats, "cache": self.cache_stats()}
+
+    def close(self) -> None:
+        if supports(self._inner, "close"):
+            self._inner.close()
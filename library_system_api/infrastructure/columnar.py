@@ -0,0 +1,76 @@
+# 🧱 按列存储图书（`infrastructure/columnar.py`）
+# 百万本书时，每本一个 Book 对象的开销（对象头、字段指针）比书名本身还大。
+# 这里每个字段一列：字符串列只存指针，借出状态一本一个字节；
+# 作者、借阅人重复很多，用 sys.intern 共用同一个字符串。Book 只在读取时临时创建
+import math
+import sys
+from array import array
+from core.models import Book
+
+
+class ColumnarBookStore:
+    """isbn -> 行号，加上按行号对齐的几列数据"""
+
+    def __init__(self):
+        self._row_of = {}  # {isbn: 行号}
+        self._isbns = []
+        self._titles = []
+        self._authors = []
+        self._borrowed = bytearray()  # 0/1
+        self._borrowers = []  # user_id 或 None
+        self._dues = array("d")  # 应还时间，没借出时是 NaN
+        self._versions = array("Q")
+
+    def __len__(self) -> int:
+        return len(self._isbns)
+
+    def __contains__(self, isbn: str) -> bool:
+        return isbn in self._row_of
+
+    def _book_at(self, row: int) -> Book:
+        return Book(
+            self._isbns[row],
+            self._titles[row],
+            self._authors[row],
+            bool(self._borrowed[row]),
+            self._borrowers[row],
+            None if math.isnan(self._dues[row]) else self._dues[row],
+            self._versions[row],
+        )
+
+    def get(self, isbn: str) -> Book | None:
+        """返回的是一份拷贝：改了它要再 put 回来才生效"""
+        row = self._row_of.get(isbn)
+        return None if row is None else self._book_at(row)
+
+    def version_of(self, isbn: str) -> int:
+        """没有这本书时是 0"""
+        row = self._row_of.get(isbn)
+        return 0 if row is None else self._versions[row]
+
+    def put(self, book: Book) -> None:
+        author = sys.intern(book.author)
+        borrower = None if book.borrowed_by is None else sys.intern(book.borrowed_by)
+        due = math.nan if book.due_at is None else book.due_at
+        row = self._row_of.get(book.isbn)
+        if row is None:
+            self._row_of[book.isbn] = len(self._isbns)
+            self._isbns.append(book.isbn)
+            self._titles.append(book.title)
+            self._authors.append(author)
+            self._borrowed.append(book.is_borrowed)
+            self._borrowers.append(borrower)
+            self._dues.append(due)
+            self._versions.append(book.version)
+            return
+        self._titles[row] = book.title
+        self._authors[row] = author
+        self._borrowed[row] = book.is_borrowed
+        self._borrowers[row] = borrower
+        self._dues[row] = due
+        self._versions[row] = book.version
+
+    def __iter__(self):
+        """按插入顺序逐本产出"""
+        for row in range(len(self._isbns)):
+            yield self._book_at(row)
@@ -0,0 +1,75 @@
+# 📦 组提交（`infrastructure/group_commit.py`）
+# 并发的写请求各自 fsync 一次，吞吐量被磁盘延迟卡死。这里让它们排队：
+# 第一个到的线程当 leader，把队列里攒下的记录一次写入、一次 fsync，
+# 然后叫醒所有等待者；leader 写的时候新来的请求进入下一批，由下一个 leader 写。
+# 每个 commit 返回时它的记录已经落盘，“确认即持久”的语义不变
+import threading
+
+
+class _Batch:
+    __slots__ = ("done", "error", "records")
+
+    def __init__(self):
+        self.records = []
+        self.done = False
+        self.error = None
+
+
+class GroupCommitter:
+    """write(records) 负责把一批记录写入并 fsync，同一时刻只有一个线程在调用它"""
+
+    def __init__(self, write):
+        self._write = write
+        self._cond = threading.Condition()
+        self._pending = _Batch()  # 正在攒的下一批
+        self._writing = False  # 有没有 leader 正在写
+        self.batches = 0
+        self.records = 0
+
+    def submit(self, records: list) -> _Batch:
+        """把记录加入下一批，不等待。调用方可以在自己的锁里 submit，保证记录顺序"""
+        with self._cond:
+            self._pending.records.extend(records)
+            return self._pending
+
+    def wait(self, batch: _Batch) -> None:
+        """等到这一批落盘；没有 leader 在写时自己来写。写失败时抛出同一个异常"""
+        with self._cond:
+            while not batch.done:
+                if not self._writing:
+                    # 没做完又没人在写，说明它就是正在攒的那一批：自己当 leader
+                    self._writing = True
+                    self._pending = _Batch()
+                    break
+                self._cond.wait()
+            else:
+                if batch.error is not None:
+                    raise batch.error
+                return
+        try:
+            if batch.records:
+                self._write(batch.records)
+        except OSError as e:  # 磁盘满、I/O 错误：这一批的等待者都拿到同一个异常
+            batch.error = e
+        except BaseException as e:  # 其他异常是 bug：等待者照样失败，leader 原样抛出
+            batch.error = e
+            raise
+        finally:  # 不管怎样都要叫醒等待者，否则它们永远等下去
+            with self._cond:
+                batch.done = True
+                self._writing = False
+                self.batches += 1
+                self.records += len(batch.records)
+                self._cond.notify_all()
+        if batch.error is not None:
+            raise batch.error
+
+    def commit(self, records: list) -> None:
+        self.wait(self.submit(records))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "records": self.records,
+            "avg_batch_size": self.records / self.batches if self.batches else 0.0,
+        }
@@ -1,6 +1,9 @@
 # 💾 第四步：实现内存存储（`infrastructure/in_memory_repos.py`）
-from core.models import Book, User
+from core.models import Book, User, next_version
+from infrastructure.columnar import ColumnarBookStore
+from infrastructure.indexes import BookIndexes
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -10,19 +13,117 @@ class InMemoryBookRepo:
     # 实现 BookRepository 协议
     def __init__(self):
         self._books = {}  # 属性的字典格式是{isbn: Book}
+        self._index = BookIndexes()  # 借阅人索引、有序 ISBN 等
+        self._lock = threading.Lock()  # 字典和索引要一起更新，防止并发 save 时不一致
 
     def get_by_isbn(self, isbn: str) -> Book | None:
         return self._books.get(isbn)
 
+    def get_many(self, isbns) -> dict[str, Book]:  # 批量获取，找不到的不在结果里
+        books = self._books
+        return {isbn: books[isbn] for isbn in isbns if isbn in books}
+
     def save(self, book: Book) -> None:
-        logger.info(f"保存图书 {book.title}")
-        self._books[book.isbn] = (
-            book  # 借书还书都要保存，放到_books里，key是isbn，不会重复
-        )
+        logger.info("保存图书 %s", book.title)
+        with self._lock:
+            book.version = next_version(self._books.get(book.isbn), book)
+            self._books[book.isbn] = (
+                book  # 借书还书都要保存，放到_books里，key是isbn，不会重复
+            )
+            self._index.update(book)
+
+    def save_many(self, books: list[Book]) -> None:
+        logger.info("批量保存图书 %d 本", len(books))
+        with self._lock:
+            for book in books:
+                book.version = next_version(self._books.get(book.isbn), book)
+                self._books[book.isbn] = book
+            self._index.update_many(books)
 
     def list_all(self) -> list[Book]:
         return list(self._books.values())
 
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        return [self._books[isbn] for isbn in self._index.borrowers.isbns_of(user_id)]
+
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        with self._lock:  # 堆和字典一起读，别读到 save 改了一半的
+            return [self._books[isbn] for isbn in self._index.due.overdue(now, limit)]
+
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        for isbn in self._index.keys.iter(after_isbn, limit):  # 按 ISBN 顺序逐本产出
+            yield self._books[isbn]
+
+    def search(self, query: str, limit: int = 20) -> list[Book]:
+        with self._lock:  # 文字索引 save 时会改（词没了就删掉），读的时候也拿锁
+            return [self._books[isbn] for isbn in self._index.text.search(query, limit)]
+
+    def suggest(self, prefix: str, k: int = 10) -> list[str]:
+        with self._lock:
+            return self._index.prefixes.suggest(prefix, k)
+
+    def stats(self) -> dict:
+        return {
+            "books": len(self._books),
+            "suggest_index": self._index.prefixes.stats(),
+        }
+
+
+class CompactBookRepo:
+    """省内存的内存仓库：按列存储（见 infrastructure/columnar.py），适合上百万本书。
+
+    get_by_isbn 每次返回新的 Book 拷贝，改完要 save 才生效（service 本来就这么用）。
+    不建全文检索 / 前缀补全索引，search、suggest 由 service 退回扫描。
+    """
+
+    def __init__(self):
+        self._books = ColumnarBookStore()
+        self._index = BookIndexes(text=False)
+        self._lock = threading.Lock()
+
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        return self._books.get(isbn)
+
+    def get_many(self, isbns) -> dict[str, Book]:
+        found = {}
+        for isbn in isbns:
+            book = self._books.get(isbn)
+            if book is not None:
+                found[isbn] = book
+        return found
+
+    def save(self, book: Book) -> None:
+        with self._lock:
+            book.version = max(self._books.version_of(book.isbn), book.version) + 1
+            self._books.put(book)
+            self._index.update(book)
+
+    def save_many(self, books: list[Book]) -> None:
+        with self._lock:
+            for book in books:
+                book.version = max(self._books.version_of(book.isbn), book.version) + 1
+                self._books.put(book)
+            self._index.update_many(books)
+
+    def list_all(self) -> list[Book]:
+        return list(self._books)
+
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        isbns = self._index.borrowers.isbns_of(user_id)
+        return [self._books.get(isbn) for isbn in isbns]
+
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        with self._lock:
+            isbns = self._index.due.overdue(now, limit)
+            return [self._books.get(isbn) for isbn in isbns]
+
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        for isbn in self._index.keys.iter(after_isbn, limit):
+            yield self._books.get(isbn)
+
+    def stats(self) -> dict:
+        return {"books": len(self._books)}
+
 
 class InMemoryUserRepo:
     # 实现 UserRepository 协议
@@ -33,7 +134,7 @@ class InMemoryUserRepo:
         return self._users.get(user_id)
 
     def save(self, user: User) -> None:
-        logger.info(f"保存用户 {user.name}")
+        logger.info("保存用户 %s", user.name)
         self._users[user.user_id] = user
 
 
@@ -0,0 +1,365 @@
+# 🗂️ 二级索引：让查询不必扫描整个图书库（`infrastructure/indexes.py`）
+import heapq
+import sys
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from core.models import Book
+from core.text import book_terms, prefix_key, tokenize
+
+PAGE_SIZE = 256  # iter 时每次从有序键里切出的一页大小
+SUGGEST_SCAN_LIMIT = 512  # 前缀范围内的词不超过这么多就直接扫描
+SUGGEST_TOP_K = 10  # 热门前缀缓存的候选个数，也是 suggest 的 k 上限
+
+
+class BorrowerIndex:
+    """借阅人 -> ISBN 集合 的索引，每次 save 时增量维护"""
+
+    def __init__(self):
+        self._by_user = {}  # {user_id: {isbn, ...}}
+        self._borrower_of = {}  # {isbn: user_id}，记住旧值，才能在还书/转借时删掉
+
+    def update(self, book: Book) -> None:
+        old = self._borrower_of.pop(book.isbn, None)
+        if old is not None:
+            isbns = self._by_user[old]
+            isbns.discard(book.isbn)
+            if not isbns:
+                del self._by_user[old]
+        if book.borrowed_by is not None:
+            self._borrower_of[book.isbn] = book.borrowed_by
+            self._by_user.setdefault(book.borrowed_by, set()).add(book.isbn)
+
+    def rebuild(self, books) -> None:
+        self._by_user.clear()
+        self._borrower_of.clear()
+        for book in books:
+            self.update(book)
+
+    def isbns_of(self, user_id: str) -> list[str]:
+        return sorted(self._by_user.get(user_id, ()))
+
+
+class DueIndex:
+    """借出中的书按应还时间排成最小堆：列出逾期的 k 本是 O(k log n)，不扫描全库。
+
+    还书、续借时不从堆里删掉旧条目（那要 O(n)），只改 _due_of 里的当前值，
+    查询时跳过对不上的旧条目；旧条目攒得比有效的还多时整体重建一次堆。
+    """
+
+    def __init__(self):
+        self._heap = []  # [(due_at, isbn), ...]，可能含过时的条目
+        self._due_of = {}  # {isbn: due_at}：只有借出中的书
+
+    def update(self, book: Book) -> None:
+        old = self._due_of.get(book.isbn)
+        if book.due_at == old:
+            return
+        if book.due_at is None:
+            del self._due_of[book.isbn]
+        else:
+            self._due_of[book.isbn] = book.due_at
+            heapq.heappush(self._heap, (book.due_at, book.isbn))
+        if len(self._heap) > 2 * len(self._due_of) + 64:
+            self._heapify()
+
+    def _heapify(self) -> None:
+        self._heap = [(due, isbn) for isbn, due in self._due_of.items()]
+        heapq.heapify(self._heap)
+
+    def rebuild(self, books) -> None:
+        self._due_of = {b.isbn: b.due_at for b in books if b.due_at is not None}
+        self._heapify()
+
+    def overdue(self, now: float, limit: int | None = None) -> list[str]:
+        """应还时间 <= now 的 ISBN，最早到期的在前。
+
+        不弹出堆里的元素：从堆顶开始，用一个小的候选堆按顺序展开子节点，
+        只会碰到到期的条目和它们的直接子节点
+        """
+        heap, found, seen = self._heap, [], set()
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and (limit is None or len(found) < limit):
+            (due, isbn), i = heapq.heappop(frontier)
+            if due > now:
+                break
+            # 还了又借、应还时间恰好相同时，堆里会有两条一样的
+            if self._due_of.get(isbn) == due and isbn not in seen:
+                found.append(isbn)
+                seen.add(isbn)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+
+class SortedKeys:
+    """有序的 ISBN 列表，用来按游标分页：找到起点是二分查找 O(log n)"""
+
+    def __init__(self):
+        self._keys = []
+
+    def _contains(self, key: str) -> bool:
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def add(self, key: str) -> None:
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            self._keys.insert(i, key)
+
+    def add_many(self, keys) -> None:
+        new = {k for k in keys if not self._contains(k)}
+        if new:
+            # 追加后整体排序：timsort 对“有序 + 一段新数据”接近线性，比逐个 insert 快
+            self._keys.extend(new)
+            self._keys.sort()
+
+    def rebuild(self, keys) -> None:
+        self._keys = sorted(keys)
+
+    def page(self, after: str | None, size: int) -> list[str]:
+        start = 0 if after is None else bisect_right(self._keys, after)
+        return self._keys[start : start + size]
+
+    def iter(self, after: str | None = None, limit: int | None = None):
+        """从 after 之后按顺序产出 key，一次只切一页，内存占用与总数无关"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining)
+            page = self.page(after, size)
+            if not page:
+                return
+            yield from page
+            after = page[-1]
+            if remaining is not None:
+                remaining -= len(page)
+
+
+class SearchIndex:
+    """书名/作者的倒排索引：词 -> {isbn: 权重}"""
+
+    def __init__(self):
+        self._postings = {}  # {term: {isbn: weight}}
+
+    def add(self, book: Book) -> None:
+        for term, weight in book_terms(book).items():
+            self._postings.setdefault(term, {})[book.isbn] = weight
+
+    def remove(self, book: Book) -> None:
+        for term in book_terms(book):
+            postings = self._postings[term]
+            del postings[book.isbn]
+            if not postings:
+                del self._postings[term]
+
+    def clear(self) -> None:
+        self._postings.clear()
+
+    def search(self, query: str, limit: int) -> list[str]:
+        """返回按相关度排序的 isbn：所有查询词都要命中，分数是权重之和"""
+        postings = []
+        for term in tokenize(query, for_query=True):
+            posting = self._postings.get(term)
+            if posting is None:
+                return []
+            postings.append(posting)
+        if not postings:
+            return []
+        postings.sort(key=len)  # 从最短的倒排表开始求交集，候选集合一开始就很小
+        scores = dict(postings[0])
+        for posting in postings[1:]:
+            scores = {i: s + posting[i] for i, s in scores.items() if i in posting}
+            if not scores:
+                return []
+        best = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [isbn for isbn, _ in best]
+
+
+class PrefixIndex:
+    """书名/作者的前缀补全。
+
+    没有用逐字建节点的 trie（几十万书名会有上百万个节点，内存太大），
+    而是一个有序的词数组：前缀对应数组里连续的一段，二分查找就能定位。
+    范围小的前缀直接扫描这一段；范围大的（热门前缀，如单个字母）
+    单独缓存前 SUGGEST_TOP_K 个候选并增量维护，所以查询耗时与图书总数无关。
+    """
+
+    def __init__(self):
+        self._keys = []  # 有序、去重的小写词
+        self._terms = {}  # {key: (出现次数, 原始写法)}
+        self._hot = {}  # {前缀: [(-次数, key), ...]}，只为范围超过阈值的前缀维护
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        lo = bisect_left(self._keys, prefix)
+        return lo, bisect_left(self._keys, prefix + "\U0010ffff", lo)
+
+    def _scan_top(self, prefix: str) -> list[tuple[int, str]]:
+        lo, hi = self._range(prefix)
+        return heapq.nsmallest(
+            SUGGEST_TOP_K, ((-self._terms[k][0], k) for k in self._keys[lo:hi])
+        )
+
+    def _change(self, label: str, delta: int) -> None:
+        key = prefix_key(label)
+        count, old_label = self._terms.get(key, (0, label))
+        count += delta
+        if count > 0:
+            self._terms[key] = (count, old_label)
+        else:
+            del self._terms[key]
+        if delta > 0 and count == delta:  # 新词
+            insort(self._keys, key)
+        elif count <= 0:  # 词没了
+            del self._keys[bisect_left(self._keys, key)]
+        for n in range(1, len(key) + 1):
+            prefix = key[:n]
+            top = self._hot.get(prefix)
+            if top is None:
+                # 前缀范围是嵌套的：短前缀都不热，长前缀更不可能热
+                lo, hi = self._range(prefix)
+                if hi - lo <= SUGGEST_SCAN_LIMIT:
+                    break
+                self._hot[prefix] = self._scan_top(prefix)
+                continue
+            entry = next((e for e in top if e[1] == key), None)
+            if entry is not None:
+                top.remove(entry)
+            if delta < 0 and entry is not None:
+                self._hot[prefix] = self._scan_top(prefix)  # 掉出前列：重新扫描（少见）
+            elif count > 0:
+                insort(top, (-count, key))
+                del top[SUGGEST_TOP_K:]
+
+    def add(self, book: Book) -> None:
+        self._change(book.title, 1)
+        self._change(book.author, 1)
+
+    def remove(self, book: Book) -> None:
+        self._change(book.title, -1)
+        self._change(book.author, -1)
+
+    def rebuild(self, books) -> None:
+        """整批重建：统计、排序一次，再找出热门前缀，比逐个 add 快得多"""
+        counts = Counter()
+        labels = {}
+        for book in books:
+            for label in (book.title, book.author):
+                key = prefix_key(label)
+                counts[key] += 1
+                labels.setdefault(key, label)
+        self._terms = {key: (n, labels[key]) for key, n in counts.items()}
+        self._keys = sorted(self._terms)
+        self._hot = {}
+        prefixes = {key[:1] for key in self._keys if key}
+        while prefixes:  # 一层层往下找：只有热门前缀的子前缀才可能热门
+            hot = set()
+            for prefix in prefixes:
+                lo, hi = self._range(prefix)
+                if hi - lo > SUGGEST_SCAN_LIMIT:
+                    self._hot[prefix] = self._scan_top(prefix)
+                    hot.add(prefix)
+            n = len(next(iter(prefixes))) + 1
+            prefixes = {
+                key[:n]
+                for p in hot
+                for key in self._keys[slice(*self._range(p))]
+                if len(key) >= n
+            }
+
+    def suggest(self, prefix: str, k: int = SUGGEST_TOP_K) -> list[str]:
+        key = prefix_key(prefix)
+        if not key:
+            return []
+        top = self._hot.get(key)
+        if top is None:
+            top = self._scan_top(key)  # 不是热门前缀：范围内的词不会太多
+        return [self._terms[term][1] for _, term in top[:k]]
+
+    def stats(self) -> dict:
+        """内存占用（字节）：只算索引自身的结构，书名字符串大多与 Book 共用"""
+        size = sys.getsizeof(self._keys) + sys.getsizeof(self._terms)
+        size += sum(sys.getsizeof(v) for v in self._terms.values())
+        size += sum(
+            sys.getsizeof(k) for k, (_, label) in self._terms.items() if k is not label
+        )
+        size += sys.getsizeof(self._hot) + sum(
+            sys.getsizeof(p) + sys.getsizeof(top) + sum(map(sys.getsizeof, top))
+            for p, top in self._hot.items()
+        )
+        return {
+            "terms": len(self._keys),
+            "hot_prefixes": len(self._hot),
+            "memory_bytes": size,
+        }
+
+
+class BookIndexes:
+    """图书仓库共用的一组索引：save 时统一维护，查询时按需取用。
+
+    text=False 时不建全文检索和前缀补全索引（它们比图书本身还占内存），
+    仓库也就不提供 search / suggest，由 service 退回扫描。
+    """
+
+    def __init__(self, text: bool = True):
+        self.borrowers = BorrowerIndex()
+        self.due = DueIndex()
+        self.keys = SortedKeys()
+        self.text = SearchIndex()
+        self.prefixes = PrefixIndex()
+        self._with_text = text
+        self._text_of = {}  # {isbn: (title, author)}：借书还书不改文字，不必重建
+
+    def _update_text(self, book: Book) -> None:
+        if not self._with_text:
+            return
+        text = (book.title, book.author)
+        old = self._text_of.get(book.isbn)
+        if old == text:
+            return
+        if old is not None:
+            old_book = Book(book.isbn, *old)
+            self.text.remove(old_book)
+            self.prefixes.remove(old_book)
+        self.text.add(book)
+        self.prefixes.add(book)
+        self._text_of[book.isbn] = text
+
+    def update(self, book: Book) -> None:
+        self.borrowers.update(book)
+        self.due.update(book)
+        self.keys.add(book.isbn)
+        self._update_text(book)
+
+    def update_many(self, books: list[Book]) -> None:
+        if self._with_text and len(books) > len(self._text_of):
+            # 批量导入比现有数据还多：直接整体重建更快（排序一次，而不是逐个插入）
+            merged = {isbn: Book(isbn, *text) for isbn, text in self._text_of.items()}
+            merged.update((b.isbn, b) for b in books)
+            for book in books:
+                self.borrowers.update(book)
+                self.due.update(book)
+            self.keys.add_many(book.isbn for book in books)
+            self._rebuild_text(merged.values())
+            return
+        for book in books:
+            self.borrowers.update(book)
+            self.due.update(book)
+            self._update_text(book)
+        self.keys.add_many(book.isbn for book in books)
+
+    def _rebuild_text(self, books) -> None:
+        if not self._with_text:
+            return
+        self.text.clear()
+        self._text_of = {}
+        for book in books:
+            self.text.add(book)
+            self._text_of[book.isbn] = (book.title, book.author)
+        self.prefixes.rebuild(books)
+
+    def rebuild(self, books) -> None:
+        books = list(books)
+        self.borrowers.rebuild(books)
+        self.due.rebuild(books)
+        self.keys.rebuild(book.isbn for book in books)
+        self._rebuild_text(books)
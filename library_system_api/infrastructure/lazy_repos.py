@@ -0,0 +1,267 @@
+# 💤 按需加载的图书仓库（`infrastructure/lazy_repos.py`）
+# 数据存成一行一本书的 books.jsonl，内存里只放 isbn -> 字节偏移量；
+# get_by_isbn 时才 seek 过去解析那一行。命令行只查几本书时，启动快、内存也小
+import json
+import logging
+import marshal
+import os
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+from typing import NamedTuple
+from core.models import Book, to_dict
+from infrastructure.indexes import BorrowerIndex, DueIndex, SortedKeys
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2  # 2：索引里多存了借出中的书（借阅人、应还时间）
+COMPACT_THRESHOLD = 4 * 1024 * 1024  # 被覆盖的旧记录超过 4MB 就重写一次文件
+
+
+def _encode(book: Book) -> bytes:
+    return (
+        json.dumps(to_dict(book), ensure_ascii=False, separators=(",", ":")) + "\n"
+    ).encode("utf-8")
+
+
+# 偏移量索引放在数据文件旁边：books.jsonl -> books.jsonl.idx
+def _index_path(file_path: Path) -> Path:
+    return file_path.with_name(file_path.name + ".idx")
+
+
+class _Loan(NamedTuple):
+    """借阅人索引、应还时间索引只看这三个字段：不用为了建索引解析整本书"""
+
+    isbn: str
+    borrowed_by: str | None
+    due_at: float | None
+
+
+class LazyBookRepo:
+    """实现 BookRepository 协议（含 save_many、iter_books）。
+
+    save 只往文件末尾追加一行，并把偏移量指向新行；旧行成了垃圾，
+    超过 compact_threshold 字节后整体重写。偏移量索引在 close / compact 时落盘，
+    下次启动只需扫描索引之后追加的部分。借出中的书另记一份借阅人和应还时间，
+    和偏移量一起落盘，list_by_borrower / list_overdue 因此不用读整个文件。
+    """
+
+    def __init__(self, books_file: Path, compact_threshold: int = COMPACT_THRESHOLD):
+        self._file = books_file
+        self._index_file = _index_path(books_file)
+        self._compact_threshold = compact_threshold
+        self._lock = threading.Lock()  # 读写共用文件位置，seek + 读/写 要串行
+        self._garbage = 0  # 被覆盖的旧记录占的字节数
+        self._offsets = {}  # {isbn: 这一行在文件里的起始位置}
+        self._loans = {}  # {isbn: (borrowed_by, due_at)}：只有借出中的书
+        self._borrowers = BorrowerIndex()
+        self._due = DueIndex()
+        if not self._file.exists():
+            self._file.touch()
+        self._load_offsets()
+        # 读写句柄一直开着，close() / _compact 里关
+        self._reader = open(self._file, "rb")  # noqa: SIM115
+        self._writer = open(self._file, "ab")  # noqa: SIM115
+        self._keys = SortedKeys()
+        self._keys.rebuild(self._offsets)  # 只为游标分页用，不用解析任何一本书
+
+    def _load_offsets(self) -> None:
+        st = self._file.stat()
+        indexed = 0
+        try:
+            with open(self._index_file, "rb") as f:
+                version, inode, size, garbage, offsets, loans = marshal.loads(f.read())
+            # 同一个文件（没被整体替换）且只在末尾追加过，索引就还能用
+            if (version, inode) == (INDEX_VERSION, st.st_ino) and size <= st.st_size:
+                self._offsets, self._garbage, indexed = offsets, garbage, size
+                self._loans = loans
+        except (OSError, EOFError, ValueError, TypeError):
+            pass  # 没有索引、索引坏了或是旧版本：从头扫描
+        loaned = [_Loan(isbn, *loan) for isbn, loan in self._loans.items()]
+        self._borrowers.rebuild(loaned)
+        self._due.rebuild(loaned)
+        scanned = self._scan_from(indexed)
+        logger.info(
+            "图书偏移量索引：%d 本，复用 %d 字节，扫描了 %d 条记录",
+            len(self._offsets),
+            indexed,
+            scanned,
+        )
+        if scanned:
+            self._save_offsets()
+
+    def _scan_from(self, start: int) -> int:
+        count = 0
+        with open(self._file, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    isbn = record["isbn"]
+                except (ValueError, KeyError):
+                    # 只可能是崩溃时最后一行没写完：截掉，后面从这里接着追加
+                    logger.warning("%s 末尾有不完整的记录，已截掉", self._file)
+                    f.close()
+                    os.truncate(self._file, offset)
+                    break
+                old = self._offsets.get(isbn)
+                if old is not None:
+                    self._garbage += self._line_length(old)
+                self._offsets[isbn] = offset
+                self._track_loan(
+                    _Loan(isbn, record.get("borrowed_by"), record.get("due_at"))
+                )
+                offset += len(line)
+                count += 1
+        return count
+
+    def _track_loan(self, loan: _Loan) -> None:
+        self._borrowers.update(loan)
+        self._due.update(loan)
+        if loan.borrowed_by is None and loan.due_at is None:
+            self._loans.pop(loan.isbn, None)
+        else:
+            self._loans[loan.isbn] = (loan.borrowed_by, loan.due_at)
+
+    def _line_length(self, offset: int) -> int:
+        with open(self._file, "rb") as f:
+            f.seek(offset)
+            return len(f.readline())
+
+    def _save_offsets(self) -> None:
+        st = self._file.stat()
+        data = (
+            INDEX_VERSION,
+            st.st_ino,
+            st.st_size,
+            self._garbage,
+            self._offsets,
+            self._loans,
+        )
+        tmp_path = self._index_file.with_name(self._index_file.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(marshal.dumps(data))
+        os.replace(tmp_path, self._index_file)
+
+    def _read_at(self, offset: int) -> bytes:
+        self._reader.seek(offset)
+        return self._reader.readline()
+
+    def get_by_isbn(self, isbn: str) -> Book | None:
+        with self._lock:
+            offset = self._offsets.get(isbn)
+            if offset is None:
+                return None
+            line = self._read_at(offset)
+        return Book(**json.loads(line))  # 解析放在锁外面
+
+    def get_many(self, isbns) -> dict[str, Book]:
+        with self._lock:
+            # 按文件里的位置排好再读，变成顺序访问
+            offsets = sorted(
+                (self._offsets[isbn], isbn)
+                for isbn in set(isbns)
+                if isbn in self._offsets
+            )
+            lines = [(isbn, self._read_at(offset)) for offset, isbn in offsets]
+        return {isbn: Book(**json.loads(line)) for isbn, line in lines}
+
+    def save(self, book: Book) -> None:
+        self.save_many([book])
+
+    def save_many(self, books: list[Book]) -> None:
+        # 同一批里重复的书只留最后一次：旧版本号要从文件里已有的那一行读
+        books = list({book.isbn: book for book in books}.values())
+        with self._lock:
+            offset = self._writer.seek(0, os.SEEK_END)
+            data = bytearray()
+            for book in books:
+                old = self._offsets.get(book.isbn)
+                version = 0
+                if old is not None:
+                    line = self._read_at(old)
+                    self._garbage += len(line)
+                    version = json.loads(line).get("version", 0)
+                book.version = max(version, book.version) + 1  # 见 next_version
+                self._offsets[book.isbn] = offset + len(data)
+                self._track_loan(_Loan(book.isbn, book.borrowed_by, book.due_at))
+                data += _encode(book)
+            self._writer.write(data)  # 一批记录一次写入、一次 flush
+            self._writer.flush()
+            self._keys.add_many(book.isbn for book in books)
+            if self._garbage >= self._compact_threshold:
+                self._compact()
+
+    def list_all(self) -> list[Book]:
+        """顺序读一遍文件（不逐本 seek），跳过被覆盖的旧记录"""
+        books = []
+        with ExitStack() as stack:
+            with self._lock:
+                self._writer.flush()
+                # 偏移量和打开的文件在锁里一起取：之后就算 _compact 把文件整个替换掉，
+                # 这个句柄读到的还是旧文件，和这份偏移量对得上
+                offsets = dict(self._offsets)
+                f = stack.enter_context(open(self._file, "rb"))
+            offset = 0
+            for line in f:  # 读文件在锁外面
+                record = json.loads(line)
+                if offsets.get(record["isbn"]) == offset:
+                    books.append(Book(**record))
+                offset += len(line)
+        return books
+
+    def list_by_borrower(self, user_id: str) -> list[Book]:
+        with self._lock:
+            isbns = self._borrowers.isbns_of(user_id)
+        books = self.get_many(isbns)
+        return [books[isbn] for isbn in isbns if isbn in books]
+
+    def list_overdue(self, now: float, limit: int | None = None) -> list[Book]:
+        with self._lock:
+            isbns = self._due.overdue(now, limit)
+        books = self.get_many(isbns)  # 按文件位置读，再排回最早到期在前
+        return [books[isbn] for isbn in isbns if isbn in books]
+
+    def iter_books(self, after_isbn: str | None = None, limit: int | None = None):
+        for isbn in self._keys.iter(after_isbn, limit):  # 按 ISBN 顺序逐本产出
+            yield self.get_by_isbn(isbn)
+
+    def stats(self) -> dict:
+        return {
+            "books": len(self._offsets),
+            "file_bytes": self._file.stat().st_size,
+            "garbage_bytes": self._garbage,
+        }
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        """按 ISBN 顺序重写只含最新记录的新文件，再原子替换"""
+        tmp_path = self._file.with_name(self._file.name + ".tmp")
+        offsets = {}
+        with open(tmp_path, "wb") as f:
+            for isbn in sorted(self._offsets):
+                offsets[isbn] = f.tell()
+                f.write(self._read_at(self._offsets[isbn]))
+        self._writer.close()
+        self._reader.close()
+        os.replace(tmp_path, self._file)
+        # 换成新文件，句柄照样一直开着
+        self._reader = open(self._file, "rb")  # noqa: SIM115
+        self._writer = open(self._file, "ab")  # noqa: SIM115
+        self._offsets = offsets
+        self._garbage = 0
+        self._save_offsets()
+        logger.info("%s 已压缩：%d 本", self._file, len(offsets))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer.closed:
+                return
+            self._writer.flush()
+            self._save_offsets()
+            self._writer.close()
+            self._reader.close()
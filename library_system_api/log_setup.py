@@ -0,0 +1,120 @@
+# 📝 日志配置（`log_setup.py`）：只在程序入口调用一次 setup_logging()
+# 业务代码照常 logger = logging.getLogger(__name__)，并且用 %s 占位：
+#     logger.info("用户 %s 借阅了图书 %s", user.name, isbn)
+# 级别没开（或被采样丢掉）时连字符串都不拼。
+# 写终端 / 文件放在后台线程里：QueueHandler 只把 LogRecord 放进队列就返回，
+# 拼消息、格式化、I/O 都由 QueueListener 的线程做，请求线程不用等磁盘
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+_listener = None  # 当前的后台写日志线程，重复调用 setup_logging 时先停掉旧的
+_queue_handler = None  # 挂在根日志器上、往 _listener 队列里放记录的 handler
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """一行一个 JSON 对象，方便日志采集系统解析"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, DATEFMT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """INFO 及以下按 rate 的比例随机保留，WARNING 及以上全部保留。
+
+    借书、保存这类每个请求都打的 INFO 日志量太大时，留一部分就够看趋势了
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # 标准的 QueueHandler 在入队前就把消息拼好（为了能跨进程传）；
+    # 同一进程里的队列不需要，拼消息也留给后台线程。所以日志参数要传不会再变的值
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(
+    level: str = "INFO",
+    log_file: str | None = None,
+    json_lines: bool = False,
+    sample_rate: float = 1.0,
+    console: bool = True,
+) -> logging.handlers.QueueListener:
+    """配置根日志器：终端（可选再加文件）输出，后台线程写，程序退出前写完队列"""
+    global _listener, _queue_handler
+    shutdown_logging()
+    if json_lines:
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter(FORMAT, DATEFMT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    if sample_rate < 1:
+        queue_handler.addFilter(SamplingFilter(sample_rate))  # 在入队前丢，最省
+    root = logging.getLogger()
+    for old in root.handlers[:]:  # 和 basicConfig(force=True) 一样替换掉旧配置
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    _queue_handler = queue_handler
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """停掉后台线程：先把队列里剩下的日志写完。
+
+    之后再打的日志（比如 lifespan 里关闭之后的）不能再进没人取的队列：
+    把真正的 handler 直接挂回根日志器，改成同步写
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    if _queue_handler in root.handlers:
+        root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            for log_filter in _queue_handler.filters:  # 采样照旧
+                handler.addFilter(log_filter)
+            root.addHandler(handler)  # 退出时由 logging 自己关闭
+    else:  # 根日志器已经被别人重新配置过：这些 handler 没人用了
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = _queue_handler = None
+    atexit.unregister(shutdown_logging)
@@ -0,0 +1,100 @@
+# tests/test_api.py
+import sys
+import os
+import importlib
+import json
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")  # TestClient 依赖 httpx
+from fastapi.testclient import TestClient
+import config
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # api.main 导入时就按 config.settings 创建仓库：先把数据目录指到临时目录
+    overrides = {
+        "STORAGE": "json",
+        "DATA_DIR": tmp_path_factory.mktemp("data"),
+        "JOURNAL": False,
+        "FLUSH_DELAY": None,
+        "CACHE_SIZE": 0,
+        "WORKERS": 1,
+        "LOG_FILE": None,
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in overrides.items():
+            mp.setattr(config.settings, name, value)
+        main = importlib.import_module("api.main")
+        with TestClient(main.app) as test_client:  # 退出时走 lifespan 关闭仓库
+            yield test_client
+
+
+def _ndjson(*records) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode()
+
+
+class TestGetBookETag:
+    def test_if_none_match(self, client):
+        client.post("/books", params={"isbn": "e1", "title": "西游记", "author": "吴"})
+
+        first = client.get("/books/e1")
+        etag = first.headers["ETag"]
+        assert first.status_code == 200 and first.json()["title"] == "西游记"
+
+        for header in (etag, f"W/{etag}", f'"nope", {etag}', "*"):
+            cached = client.get("/books/e1", headers={"If-None-Match": header})
+            assert cached.status_code == 304, header
+            assert cached.headers["ETag"] == etag and cached.content == b""
+
+        client.post("/books", params={"isbn": "e1", "title": "西游记", "author": "吴"})
+        changed = client.get("/books/e1", headers={"If-None-Match": etag})
+        assert changed.status_code == 200  # 保存过：版本号变了
+        assert changed.headers["ETag"] != etag
+
+    def test_missing_book(self, client):
+        response = client.get("/books/none", headers={"If-None-Match": "*"})
+        assert response.status_code == 404
+
+
+class TestBulkImport:
+    def test_imports_ndjson_lines(self, client):
+        body = _ndjson(
+            {"isbn": "b1", "title": "书1", "author": "甲"},
+            {"isbn": "b2", "title": "书2", "author": "乙"},
+        )
+        last = {"isbn": "b3", "title": "书3", "author": "丙"}
+        body += b"\n" + json.dumps(last, ensure_ascii=False).encode()
+
+        response = client.post("/books:bulk", content=body)  # 空行跳过，末行没换行
+
+        assert response.json() == {"imported": 3}
+        assert client.get("/books/b3").json()["title"] == "书3"
+
+    @pytest.mark.parametrize(
+        "bad_line",
+        [
+            b"not json",
+            b'{"isbn": "x2"}',
+            b"[1, 2]",
+            b'{"isbn": 1, "title": 2, "author": null}',
+            b'{"isbn": "x2", "title": "", "author": "a"}',
+        ],
+        ids=str,
+    )
+    def test_bad_line_reports_line_number(self, client, bad_line):
+        body = _ndjson({"isbn": "x1", "title": "书", "author": "甲"}) + bad_line
+
+        response = client.post(
+            "/books:bulk", params={"chunk_size": 1}, content=body + b"\n"
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "第 2 行格式错误（已导入 1 本）"
+
+    def test_chunk_size_must_be_positive(self, client):
+        response = client.post("/books:bulk", params={"chunk_size": 0}, content=b"")
+        assert response.status_code == 400
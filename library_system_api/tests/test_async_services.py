@@ -0,0 +1,149 @@
+# tests/test_async_services.py
+import sys
+import os
+import asyncio
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from unittest.mock import Mock
+from core.models import Book, User
+from core.async_services import AsyncLibraryService
+from infrastructure.async_repos import AsyncBookRepo, AsyncUserRepo
+from infrastructure.in_memory_repos import InMemoryBookRepo, InMemoryUserRepo
+from infrastructure.sqlite_repos import SqliteBookRepo, SqliteUserRepo
+
+
+def _service(book_repo, user_repo, offload_reads=True):
+    return AsyncLibraryService(
+        AsyncBookRepo(book_repo, offload_reads), AsyncUserRepo(user_repo, offload_reads)
+    )
+
+
+class TestAsyncLibraryService:
+    def test_concurrent_borrows_of_one_book(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        user_repo = SqliteUserRepo(db_path)
+        for i in range(50):
+            user_repo.save(User(f"u{i}", f"用户{i}"))
+        service = _service(SqliteBookRepo(db_path), user_repo)
+
+        async def scenario():
+            await service.add_book("1", "西游记", "吴承恩")
+            return await asyncio.gather(
+                *(service.borrow_book("1", f"u{i}") for i in range(50))
+            )
+
+        results = asyncio.run(scenario())
+
+        assert results.count(True) == 1
+        winner = f"u{results.index(True)}"
+        books = asyncio.run(service.get_user_books(winner))
+        assert [b.isbn for b in books] == ["1"]
+
+    def test_list_by_borrower_falls_back_to_scan(self):
+        inner = Mock()  # 没有 list_by_borrower 能力的仓库
+        inner.list_all.return_value = [
+            Book("1", "A", "X", is_borrowed=True, borrowed_by="u1"),
+            Book("2", "B", "Y"),
+        ]
+        service = _service(inner, InMemoryUserRepo(), offload_reads=False)
+
+        books = asyncio.run(service.get_user_books("u1"))
+
+        assert [b.isbn for b in books] == ["1"]
+
+    def test_scan_fallbacks_run_in_thread_pool(self):
+        inner = Mock()  # 只有 list_all：借阅人、逾期、搜索、补全都要全表扫描
+        threads = []
+
+        def read_file():  # 和 lazy 仓库一样：真正读文件发生在遍历的时候
+            threads.append(threading.current_thread())
+            yield Book("1", "西游记", "吴承恩", True, "u1", 0.0)
+
+        inner.list_all.side_effect = read_file
+        repo = AsyncBookRepo(inner)
+
+        async def scenario():
+            return await asyncio.gather(
+                repo.list_by_borrower("u1"),
+                repo.list_overdue(1.0),
+                repo.search("西游"),
+                repo.suggest("西"),
+            )
+
+        by_borrower, overdue, found, completions = asyncio.run(scenario())
+
+        assert [b.isbn for b in by_borrower + overdue + found] == ["1", "1", "1"]
+        assert completions == ["西游记"]
+        assert len(threads) == 4
+        assert threading.main_thread() not in threads  # 读文件不占事件循环
+
+    def test_overdue_through_adapter(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "Alice"))
+        service = AsyncLibraryService(
+            AsyncBookRepo(InMemoryBookRepo()), AsyncUserRepo(user_repo), loan_days=0
+        )
+
+        async def scenario():
+            await service.add_book("1", "西游记", "吴承恩")
+            await service.add_book("2", "水浒传", "施耐庵")
+            await service.borrow_many("u1", ["1"])
+            await service.borrow_book("2", "u1")
+            return await service.overdue()  # 借期 0 天：马上就逾期
+
+        assert [b.isbn for b in asyncio.run(scenario())] == ["1", "2"]
+
+    def test_availability_falls_back_to_get_by_isbn(self):
+        inner = Mock()  # 没有 get_many 能力的仓库
+        inner.get_by_isbn.side_effect = lambda isbn: (
+            Book(isbn, "A", "X", is_borrowed=isbn == "2") if isbn != "3" else None
+        )
+        service = _service(inner, InMemoryUserRepo())
+
+        result = asyncio.run(service.availability(["1", "2", "3", "1"]))
+
+        assert result == {"1": True, "2": False, "3": False}
+
+    def test_borrow_many_and_return_many(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "Alice"))
+        service = _service(InMemoryBookRepo(), user_repo, offload_reads=False)
+
+        async def scenario():
+            await service.add_books([Book("1", "A", "X"), Book("2", "B", "Y")])
+            await service.borrow_book("2", "u1")
+            borrowed = await service.borrow_many("u1", ["1", "2", "3"])
+            returned = await service.return_many(["1", "2"])
+            return borrowed, returned
+
+        borrowed, returned = asyncio.run(scenario())
+
+        assert borrowed == {"1": "ok", "2": "unavailable", "3": "not_found"}
+        assert returned == {"1": "ok", "2": "ok"}
+
+    def test_add_books_and_return(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "Alice"))
+        service = _service(InMemoryBookRepo(), user_repo, offload_reads=False)
+
+        async def scenario():
+            await service.add_books([Book("1", "A", "X"), Book("2", "B", "Y")])
+            assert await service.borrow_book("2", "u1") is True
+            assert await service.is_available("2") is False
+            assert await service.return_book("2") is True
+            return await service.is_available("2")
+
+        assert asyncio.run(scenario()) is True
+
+    def test_iter_books_streams_in_order(self, tmp_path):
+        book_repo = SqliteBookRepo(tmp_path / "library.db")
+        book_repo.save_many([Book(f"{i:04d}", f"书{i}", "作者") for i in range(700)])
+        service = _service(book_repo, InMemoryUserRepo())
+
+        async def collect():
+            return [b.isbn async for b in service.iter_books("0099", 300)]
+
+        isbns = asyncio.run(collect())
+
+        assert isbns == [f"{i:04d}" for i in range(100, 400)]
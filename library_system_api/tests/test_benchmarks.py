@@ -0,0 +1,89 @@
+# tests/test_benchmarks.py
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from benchmarks.bench_service import compare, parse_size, print_regressions, run_case
+from benchmarks.load_test import Workload, drive, parse_mix
+
+
+class TestBenchService:
+    def test_run_case_times_every_operation(self):
+        for backend in ("memory", "sqlite"):
+            result = run_case(backend, 300, max_ops=10, max_seconds=1)
+
+            assert result["books"] == 300
+            assert set(result["ops"]) == {
+                "add_book",
+                "borrow_book",
+                "return_book",
+                "get_user_books",
+            }
+            assert result["ops"]["borrow_book"]["ops"] == 10
+
+    def test_compare_flags_slower_metrics_only(self):
+        def result(p50, startup):
+            ops = {"borrow_book": {"p50_us": p50}}
+            return {
+                "results": [
+                    {"backend": "json", "books": 1000, "startup_seconds": startup,
+                     "bytes_per_book": 300.0, "ops": ops}
+                ]
+            }  # fmt: skip
+
+        baseline = result(100.0, 1.0)
+
+        assert compare(baseline, result(110.0, 0.5)) == []
+        assert compare(baseline, result(101.0, 1.0), threshold=0.0) == []  # 噪声以内
+        assert [r[2] for r in compare(baseline, result(200.0, 1.5))] == [
+            "startup_seconds",
+            "borrow_book.p50_us",
+        ]
+        assert parse_size("1M") == 1_000_000 and parse_size("100k") == 100_000
+
+    def test_zero_baseline_is_reported_as_new(self, capsys):
+        print_regressions([("json", 1000, "startup_seconds", 0.0, 1.5)], threshold=0.1)
+        assert "新增" in capsys.readouterr().out
+
+
+class TestLoadTest:
+    def test_drive_reports_latency_and_error_rate(self):
+        async def handle(reader, writer):
+            # 假的服务端：借书 400、还书 500、用户借阅列表用分块编码，其余 200
+            while line := await reader.readline():
+                length = 0
+                while (header := await reader.readline()) != b"\r\n":
+                    if header.lower().startswith(b"content-length"):
+                        length = int(header.split(b":")[1])
+                await reader.readexactly(length)
+                path = line.split()[1]
+                if b"/users/" in path:
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                        b"2\r\n[]\r\n0\r\n\r\n"
+                    )
+                else:
+                    status = b"400" if b"/borrow" in path else b"200"
+                    if b"/return" in path:
+                        status = b"500"
+                    writer.write(
+                        b"HTTP/1.1 " + status + b" X\r\nContent-Length: 2\r\n\r\n{}"
+                    )
+                await writer.drain()
+            writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            workload = Workload(parse_mix("get=2,borrow=1,return=1,user_books=1"), 100)
+            async with server:
+                return await drive("127.0.0.1", port, workload, 200, 0.5, 4)
+
+        result = asyncio.run(scenario())
+
+        assert 80 <= result["requests"] <= 101
+        assert result["rejected"] == result["operations"]["borrow"]["ops"]
+        returns = result["operations"]["return"]["ops"]
+        assert result["error_rate"] == returns / result["requests"]
+        assert result["latency"]["p99_us"] > 0
@@ -0,0 +1,162 @@
+# tests/test_json_repos.py
+import sys
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.interfaces import supports
+from core.models import Book, User
+from config import Settings
+from infrastructure import json_repos
+from infrastructure.factory import create_repos
+from infrastructure.json_repos import JsonBookRepo, JsonUserRepo
+
+
+class TestJsonBookRepoJournal:
+    def test_journal_survives_restart(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file, journal=True)
+        repo.save(Book("1", "西游记", "吴承恩"))
+        repo.save(Book("1", "西游记", "吴承恩", is_borrowed=True, borrowed_by="u1"))
+        repo.close()
+
+        assert not books_file.exists()  # 只写了日志，没有重写快照
+        reopened = JsonBookRepo(books_file, journal=True)
+        assert reopened.get_by_isbn("1").borrowed_by == "u1"
+        assert [b.isbn for b in reopened.list_by_borrower("u1")] == ["1"]
+
+    def test_compact_when_journal_passes_threshold(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file, journal=True, compact_threshold=200)
+        for i in range(10):
+            repo.save(Book(str(i), f"书{i}", "作者"))
+        repo.close()
+
+        assert books_file.exists()
+        assert len(JsonBookRepo(books_file).list_all()) == 10
+
+    def test_torn_last_record_is_ignored(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file, journal=True)
+        repo.save(Book("1", "A", "X"))
+        repo.close()
+        with open(tmp_path / "books.journal.jsonl", "a", encoding="utf-8") as f:
+            f.write('{"isbn": "2", "tit')  # 模拟写到一半断电
+
+        reopened = JsonBookRepo(books_file, journal=True)
+        assert [b.isbn for b in reopened.list_all()] == ["1"]
+
+    def test_save_many_writes_file_once(self, tmp_path):
+        repo = JsonBookRepo(tmp_path / "books.json")
+        books = [Book(str(i), f"书{i}", "作者") for i in range(100)]
+
+        with patch.object(
+            json_repos, "_save_json", wraps=json_repos._save_json
+        ) as save_json:
+            repo.save_many(books)
+
+        assert save_json.call_count == 1
+        assert len(JsonBookRepo(tmp_path / "books.json").list_all()) == 100
+
+
+class TestJsonSnapshot:
+    def test_restart_loads_from_snapshot(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file)
+        repo.save(Book("1", "西游记", "吴承恩", True, "u1"))
+        repo.close()  # 快照在关闭时写
+        assert (tmp_path / "books.snapshot.bin").exists()
+
+        with patch.object(json_repos, "_load_json") as load_json:
+            reopened = JsonBookRepo(books_file)
+
+        load_json.assert_not_called()  # 快照有效，不用解析 JSON
+        assert reopened.get_by_isbn("1") == Book("1", "西游记", "吴承恩", True, "u1")
+
+    def test_save_rewrites_only_json(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file)
+        with patch.object(json_repos, "_save_snapshot") as save_snapshot:
+            for i in range(5):
+                repo.save(Book(str(i), f"书{i}", "作者"))
+            save_snapshot.assert_not_called()  # 每次 save 不再多写一份快照
+            repo.close()
+        save_snapshot.assert_called_once()
+
+        # 没正常关闭（快照过期）也不会读到旧数据：加载时发现过期就改读 JSON
+        JsonBookRepo(books_file).close()
+        repo = JsonBookRepo(books_file)
+        repo.save(Book("9", "书9", "作者"))
+        assert len(JsonBookRepo(books_file).list_all()) == 6
+
+    def test_edited_json_invalidates_snapshot(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        JsonBookRepo(books_file).save(Book("1", "西游记", "吴承恩"))
+        books_file.write_text(  # 手工改了 JSON（大小变了，mtime 也变了）
+            '{"2": {"isbn": "2", "title": "水浒传", "author": "施耐庵"}}',
+            encoding="utf-8",
+        )
+
+        assert [b.isbn for b in JsonBookRepo(books_file).list_all()] == ["2"]
+        with patch.object(json_repos, "_load_json") as load_json:
+            assert [b.isbn for b in JsonBookRepo(books_file).list_all()] == ["2"]
+        load_json.assert_not_called()  # 重建过的快照又能用了
+
+
+class TestJsonWriteBehind:
+    def test_burst_is_written_once_on_close(self, tmp_path):
+        books_file = tmp_path / "books.json"
+        repo = JsonBookRepo(books_file, flush_delay=60)
+
+        with patch.object(
+            json_repos, "_save_json", wraps=json_repos._save_json
+        ) as save_json:
+            for i in range(20):
+                repo.save(Book(str(i), f"书{i}", "作者"))
+            stats = repo.stats()["write_behind"]
+            assert save_json.call_count == 0  # 请求里不再同步写文件
+            assert stats["pending"] == 20 and stats["lag_seconds"] > 0
+            repo.close()
+
+        assert save_json.call_count == 1
+        assert repo.stats()["write_behind"]["lag_seconds"] == 0
+        assert len(JsonBookRepo(books_file).list_all()) == 20
+
+    def test_flushes_after_enough_changes(self, tmp_path):
+        users_file = tmp_path / "users.json"
+        repo = JsonUserRepo(users_file, flush_delay=60, flush_every=5)
+        for i in range(5):
+            repo.save(User(f"u{i}", f"用户{i}"))
+
+        deadline = time.monotonic() + 5
+        while repo.stats()["write_behind"]["flushes"] == 0:
+            assert time.monotonic() < deadline, "后台线程没有写盘"
+            time.sleep(0.01)
+        assert JsonUserRepo(users_file).get_by_id("u4").name == "用户4"
+        repo.close()
+
+
+def close_all(*repos) -> None:
+    for repo in repos:
+        if supports(repo, "close"):
+            repo.close()
+
+
+class TestDataDirLock:
+    @pytest.mark.parametrize("storage", ["json", "lazy", "sharded"])
+    def test_second_opener_of_data_dir_fails(self, tmp_path, storage):
+        settings = Settings()
+        settings.DATA_DIR = tmp_path
+        settings.STORAGE = storage
+        settings.WORKERS = 1  # 就算没设 WEB_CONCURRENCY（uvicorn --workers）也要拦住
+        book_repo, user_repo = create_repos(settings)
+
+        # flock 锁的是打开的文件：同一进程里再打开一次和另一个 worker 进程一样被拒绝
+        with pytest.raises(RuntimeError):
+            create_repos(settings)
+
+        close_all(book_repo, user_repo)  # 用户仓库关闭时释放锁
+        close_all(*create_repos(settings))
@@ -0,0 +1,124 @@
+# tests/test_lazy_repos.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book
+from infrastructure import lazy_repos
+from infrastructure.lazy_repos import LazyBookRepo
+
+
+class TestLazyBookRepo:
+    def test_reopen_reuses_offset_index(self, tmp_path, monkeypatch):
+        books_file = tmp_path / "books.jsonl"
+        repo = LazyBookRepo(books_file)
+        repo.save_many([Book(str(i), f"书{i}", "作者") for i in range(10)])
+        repo.save(Book("3", "书3", "作者", is_borrowed=True, borrowed_by="u1"))
+        repo.close()
+
+        loaded = []
+        monkeypatch.setattr(
+            lazy_repos, "Book", lambda **kw: loaded.append(kw) or Book(**kw)
+        )
+        reopened = LazyBookRepo(books_file)
+        assert loaded == []  # 打开时一本书都没解析
+        assert reopened.get_by_isbn("3").borrowed_by == "u1"
+        assert len(loaded) == 1
+        assert reopened.get_by_isbn("x") is None
+
+    def test_list_all_skips_overwritten_records(self, tmp_path):
+        repo = LazyBookRepo(tmp_path / "books.jsonl")
+        repo.save(Book("2", "水浒传", "施耐庵"))
+        repo.save(Book("1", "西游记", "吴承恩"))
+        repo.save(Book("2", "水浒传", "施耐庵", is_borrowed=True, borrowed_by="u1"))
+
+        assert [(b.isbn, b.is_borrowed) for b in repo.list_all()] == [
+            ("1", False),
+            ("2", True),
+        ]
+        assert [b.isbn for b in repo.iter_books(after_isbn="1")] == ["2"]
+
+    def test_list_all_is_consistent_with_concurrent_compact(
+        self, tmp_path, monkeypatch
+    ):
+        repo = LazyBookRepo(tmp_path / "books.jsonl")
+        repo.save_many([Book(str(i), f"书{i}", "作者") for i in range(10)])
+        repo.save(Book("5", "书5", "作者", is_borrowed=True, borrowed_by="u1"))
+        loads = lazy_repos.json.loads
+        compacted = []
+
+        def loads_then_compact(line):
+            if not compacted:  # 读到第一行时，别的线程把文件压缩、整个替换掉了
+                compacted.append(True)
+                repo.compact()
+            return loads(line)
+
+        monkeypatch.setattr(lazy_repos.json, "loads", loads_then_compact)
+        books = repo.list_all()
+
+        assert compacted
+        assert sorted(b.isbn for b in books) == [str(i) for i in range(10)]
+        assert [b.borrowed_by for b in books if b.isbn == "5"] == ["u1"]
+
+    def test_borrower_and_overdue_indexes_survive_reopen(self, tmp_path, monkeypatch):
+        books_file = tmp_path / "books.jsonl"
+        repo = LazyBookRepo(books_file)
+        repo.save_many([Book(str(i), f"书{i}", "作者") for i in range(10)])
+        repo.save(Book("7", "书7", "作者", True, "u1", due_at=200.0))
+        repo.save(Book("3", "书3", "作者", True, "u1", due_at=100.0))
+        repo.save(Book("5", "书5", "作者", True, "u2", due_at=300.0))
+        repo.save(Book("5", "书5", "作者"))  # 已还
+        repo.close()
+
+        loads, parsed = lazy_repos.json.loads, []
+        monkeypatch.setattr(
+            lazy_repos.json,
+            "loads",
+            lambda line: parsed.append(line) or loads(line),
+        )
+        reopened = LazyBookRepo(books_file)
+        assert parsed == []  # 两个索引都从 .idx 里恢复，没有扫描文件
+        assert [b.isbn for b in reopened.list_by_borrower("u1")] == ["3", "7"]
+        assert reopened.list_by_borrower("u2") == []
+        assert [b.isbn for b in reopened.list_overdue(250.0)] == ["3", "7"]
+        assert len(parsed) == 4  # 只读了这几本书
+
+        reopened.save(Book("3", "书3", "作者"))
+        assert [b.isbn for b in reopened.list_overdue(250.0, limit=5)] == ["7"]
+
+    def test_version_continues_after_reopen(self, tmp_path):
+        books_file = tmp_path / "books.jsonl"
+        repo = LazyBookRepo(books_file)
+        repo.save(Book("1", "西游记", "吴承恩"))
+        repo.save(Book("1", "西游记", "吴承恩", is_borrowed=True, borrowed_by="u1"))
+        repo.close()
+
+        reopened = LazyBookRepo(books_file)
+        assert reopened.get_by_isbn("1").version == 2
+        reopened.save_many([Book("1", "西游记", "吴承恩")] * 2)  # 同一批重复的只算一次
+        assert reopened.get_by_isbn("1").version == 3
+
+    def test_unsaved_appends_and_torn_line_are_recovered(self, tmp_path):
+        books_file = tmp_path / "books.jsonl"
+        repo = LazyBookRepo(books_file)
+        repo.save(Book("1", "西游记", "吴承恩"))
+        repo.close()
+        repo = LazyBookRepo(books_file)
+        repo.save(Book("2", "水浒传", "施耐庵"))  # 没 close：索引里没有这本
+        with open(books_file, "a", encoding="utf-8") as f:
+            f.write('{"isbn": "3", "tit')  # 模拟写到一半断电
+
+        reopened = LazyBookRepo(books_file)
+        assert [b.isbn for b in reopened.list_all()] == ["1", "2"]
+        reopened.save(Book("3", "红楼梦", "曹雪芹"))  # 接在截掉的位置后面
+        assert reopened.get_by_isbn("3").title == "红楼梦"
+
+    def test_compact_drops_garbage(self, tmp_path):
+        books_file = tmp_path / "books.jsonl"
+        repo = LazyBookRepo(books_file, compact_threshold=500)
+        for i in range(20):
+            repo.save(Book("1", "西游记", "吴承恩", is_borrowed=i % 2 == 1))
+        repo.close()
+
+        assert len(books_file.read_bytes().splitlines()) < 20
+        assert LazyBookRepo(books_file).get_by_isbn("1").is_borrowed
@@ -1,11 +1,24 @@
 # tests/test_library_service.py
 import sys
 import os
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
 from unittest.mock import Mock
 from core.models import Book, User
-from core.services import LibraryService
+from core.services import (
+    DAY_SECONDS,
+    LibraryService,
+    NOT_FOUND,
+    OK,
+    UNAVAILABLE,
+    UNKNOWN_USER,
+)
+from infrastructure.in_memory_repos import (
+    CompactBookRepo,
+    InMemoryBookRepo,
+    InMemoryUserRepo,
+)
 
 
 class TestLibraryService:
@@ -85,3 +98,263 @@ class TestLibraryService:
 
         assert len(result) == 2
         assert all(b.borrowed_by == "u1" for b in result)
+
+    def test_get_user_books_uses_borrower_index(self):
+        book_repo = InMemoryBookRepo()
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "Alice"))
+        user_repo.save(User("u2", "Bob"))
+        service = LibraryService(book_repo, user_repo)
+        service.add_book("1", "A", "X")
+        service.add_book("2", "B", "Y")
+        service.borrow_book("1", "u1")
+        service.borrow_book("2", "u1")
+
+        service.return_book("1")
+        service.borrow_book("1", "u2")
+
+        assert [b.isbn for b in service.get_user_books("u1")] == ["2"]
+        assert [b.isbn for b in service.get_user_books("u2")] == ["1"]
+        assert service.get_user_books("nobody") == []
+
+    def test_add_books_persists_once_per_chunk(self):
+        book_repo = InMemoryBookRepo()
+        book_repo.save_many = Mock(wraps=book_repo.save_many)
+        service = LibraryService(book_repo, InMemoryUserRepo())
+
+        count = service.add_books(
+            (Book(str(i), f"书{i}", "作者") for i in range(5)), chunk_size=2
+        )
+
+        assert count == 5
+        assert book_repo.save_many.call_count == 3  # 2 + 2 + 1
+        assert len(book_repo.list_all()) == 5
+
+    def test_add_books_falls_back_to_save(self):
+        mock_book_repo = Mock()
+        service = LibraryService(mock_book_repo, Mock())
+
+        count = service.add_books([Book("1", "A", "X"), Book("2", "B", "Y")])
+
+        assert count == 2
+        assert mock_book_repo.save.call_count == 2
+
+    def test_iter_books_pages_by_cursor(self):
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, InMemoryUserRepo())
+        service.add_books(Book(f"{i:03d}", f"书{i}", "作者") for i in range(600))
+
+        first = list(service.iter_books(limit=250))
+        second = list(service.iter_books(after_isbn=first[-1].isbn, limit=250))
+        rest = list(service.iter_books(after_isbn=second[-1].isbn))
+
+        isbns = [b.isbn for b in first + second + rest]
+        assert isbns == [f"{i:03d}" for i in range(600)]
+
+    def test_iter_books_falls_back_to_sorted_scan(self):
+        mock_book_repo = Mock()
+        mock_book_repo.list_all.return_value = [
+            Book("3", "C", "Z"),
+            Book("1", "A", "X"),
+            Book("2", "B", "Y"),
+        ]
+        service = LibraryService(mock_book_repo, Mock())
+
+        result = service.iter_books(after_isbn="1", limit=1)
+
+        assert [b.isbn for b in result] == ["2"]
+
+    def test_search_ranks_title_hits_above_author_hits(self):
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, InMemoryUserRepo())
+        service.add_book("1", "西游记", "吴承恩")
+        service.add_book("2", "水浒传", "施耐庵")
+        service.add_book("3", "吴承恩传", "某人")
+        service.add_book("4", "Fluent Python", "Luciano Ramalho")
+
+        assert [b.isbn for b in service.search("西游")] == ["1"]
+        assert [b.isbn for b in service.search("吴承恩")] == ["3", "1"]
+        assert [b.isbn for b in service.search("python fluent")] == ["4"]
+        assert [b.isbn for b in service.search("传", limit=1)] == ["2"]
+        assert service.search("红楼梦") == []
+
+    def test_search_index_follows_title_changes(self):
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, InMemoryUserRepo())
+        service.add_book("1", "西游记", "吴承恩")
+        service.add_book("1", "红楼梦", "曹雪芹")  # 同一个 ISBN 重新录入
+
+        assert service.search("西游") == []
+        assert [b.isbn for b in service.search("红楼")] == ["1"]
+
+    def test_search_falls_back_to_scan(self):
+        mock_book_repo = Mock()
+        mock_book_repo.list_all.return_value = [
+            Book("1", "西游记", "吴承恩"),
+            Book("2", "水浒传", "施耐庵"),
+        ]
+        service = LibraryService(mock_book_repo, Mock())
+
+        assert [b.isbn for b in service.search("水浒")] == ["2"]
+
+    def test_suggest_returns_most_common_completions(self):
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, InMemoryUserRepo())
+        service.add_book("1", "西游记", "吴承恩")
+        service.add_book("2", "西游记", "吴承恩")  # 不同版本，同名
+        service.add_book("3", "西厢记", "王实甫")
+        service.add_book("4", "Python Cookbook", "David Beazley")
+
+        assert service.suggest("西") == ["西游记", "西厢记"]
+        assert service.suggest("西", k=1) == ["西游记"]
+        assert service.suggest("pyth") == ["Python Cookbook"]
+        assert service.suggest("吴") == ["吴承恩"]
+        assert service.storage_stats()["suggest_index"]["terms"] == 6
+
+    def test_suggest_hot_prefix_stays_correct_after_updates(self):
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, InMemoryUserRepo())
+        service.add_books(Book(str(i), f"a{i:04d}", "作者") for i in range(1000))
+        for i in range(5):
+            service.add_book(f"x{i}", "a0500", "作者")  # 让 a0500 变成最常见
+
+        assert service.suggest("a", k=2) == ["a0500", "a0000"]
+        service.add_book("0", "zzz", "作者")  # a0000 改名了
+
+        assert service.suggest("a", k=2) == ["a0500", "a0001"]
+
+    def test_suggest_falls_back_to_scan(self):
+        mock_book_repo = Mock()
+        mock_book_repo.list_all.return_value = [Book("1", "西游记", "吴承恩")]
+        service = LibraryService(mock_book_repo, Mock())
+
+        assert service.suggest("西游") == ["西游记"]
+        assert service.storage_stats() == {}
+
+    def test_compact_repo_stores_copies(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        book_repo = CompactBookRepo()
+        service = LibraryService(book_repo, user_repo)
+        service.add_book("1", "Python入门", "张三")
+        service.add_book("2", "数据结构", "张三")
+
+        book_repo.get_by_isbn("1").is_borrowed = True  # 只改了拷贝，不影响存储
+        assert service.is_available("1")
+        assert service.borrow_book("2", "u1")
+        assert [b.isbn for b in service.get_user_books("u1")] == ["2"]
+        assert [b.isbn for b in service.search("数据")] == ["2"]  # 退回逐本扫描
+        stored = book_repo.list_all()[1]
+        assert stored == Book("2", "数据结构", "张三", True, "u1", stored.due_at)
+        assert stored.due_at is not None  # 应还时间也存进了列里
+
+    def test_get_books_and_availability(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        service = LibraryService(InMemoryBookRepo(), user_repo)
+        service.add_book("1", "Python入门", "张三")
+        service.add_book("2", "数据结构", "李四")
+        service.borrow_book("2", "u1")
+
+        books = service.get_books(["2", "x", "1", "2"])
+        assert list(books) == ["2", "1"]  # 去重，找不到的不在结果里
+        assert service.availability(["1", "2", "x"]) == {
+            "1": True,
+            "2": False,
+            "x": False,
+        }
+
+    def test_get_books_falls_back_to_get_by_isbn(self):
+        mock_book_repo = Mock()
+        mock_book_repo.get_by_isbn.side_effect = lambda isbn: (
+            Book(isbn, "西游记", "吴承恩") if isbn == "1" else None
+        )
+        service = LibraryService(mock_book_repo, Mock())
+
+        assert service.availability(["1", "2"]) == {"1": True, "2": False}
+        assert mock_book_repo.get_by_isbn.call_count == 2
+
+    def test_borrow_many_reports_each_item_and_saves_once(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        book_repo = InMemoryBookRepo()
+        service = LibraryService(book_repo, user_repo)
+        service.add_books(Book(str(i), f"书{i}", "作者") for i in range(3))
+        service.borrow_book("2", "u1")
+        book_repo.save_many = Mock(wraps=book_repo.save_many)
+
+        results = service.borrow_many("u1", ["0", "1", "2", "x"])
+
+        assert results == {
+            "0": OK,
+            "1": OK,
+            "2": UNAVAILABLE,
+            "x": NOT_FOUND,
+        }
+        book_repo.save_many.assert_called_once()
+        assert service.borrow_many("nobody", ["0"]) == {"0": UNKNOWN_USER}
+        assert service.return_many(["0", "1", "x"]) == {
+            "0": OK,
+            "1": OK,
+            "x": NOT_FOUND,
+        }
+        assert [b.isbn for b in service.get_user_books("u1")] == ["2"]
+
+    def test_save_bumps_version(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        for book_repo in (InMemoryBookRepo(), CompactBookRepo()):
+            service = LibraryService(book_repo, user_repo)
+            service.add_book("1", "Python入门", "张三")
+            assert book_repo.get_by_isbn("1").version == 1
+            service.borrow_book("1", "u1")
+            service.return_book("1")
+            assert book_repo.get_by_isbn("1").version == 3
+            service.add_book("1", "Python入门", "张三")  # 覆盖也接着往上加
+            assert book_repo.get_by_isbn("1").version == 4
+
+    def test_overdue_lists_earliest_due_first(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        for book_repo in (InMemoryBookRepo(), CompactBookRepo()):
+            service = LibraryService(book_repo, user_repo, loan_days=1)
+            service.add_books(Book(str(i), f"书{i}", "作者") for i in range(5))
+            # 借出时间相同（时钟精度不够）时按 ISBN 排，所以按 ISBN 顺序借
+            for isbn in ("0", "1", "3"):
+                service.borrow_book(isbn, "u1")
+            service.borrow_many("u1", ["4"])
+            service.return_book("1")
+            later = time.time() + 2 * DAY_SECONDS
+
+            assert service.overdue() == []  # 还没到期
+            assert [b.isbn for b in service.overdue(later)] == ["0", "3", "4"]
+            assert [b.isbn for b in service.overdue(later, limit=2)] == ["0", "3"]
+            assert service.overdue(later)[0].borrowed_by == "u1"
+
+    def test_overdue_skips_stale_heap_entries(self):
+        user_repo = InMemoryUserRepo()
+        user_repo.save(User("u1", "张三"))
+        service = LibraryService(InMemoryBookRepo(), user_repo)
+        service.add_books(Book(str(i), f"书{i}", "作者") for i in range(10))
+        for _ in range(50):  # 反复借还：堆里攒下旧条目，超过阈值后重建
+            for i in range(10):
+                service.borrow_book(str(i), "u1")
+                service.return_book(str(i))
+        service.borrow_book("7", "u1")
+
+        assert [b.isbn for b in service.overdue(time.time() + 365 * DAY_SECONDS)] == [
+            "7"
+        ]
+
+    def test_overdue_falls_back_to_scan(self):
+        mock_book_repo = Mock()
+        mock_book_repo.list_all.return_value = [
+            Book("1", "A", "X", True, "u1", due_at=300.0),
+            Book("2", "B", "Y"),
+            Book("3", "C", "Z", True, "u2", due_at=100.0),
+            Book("4", "D", "W", True, "u2", due_at=900.0),
+        ]
+        service = LibraryService(mock_book_repo, Mock())
+
+        assert [b.isbn for b in service.overdue(now=500.0)] == ["3", "1"]
+        assert [b.isbn for b in service.overdue(now=500.0, limit=1)] == ["3"]
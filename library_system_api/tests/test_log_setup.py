@@ -0,0 +1,93 @@
+# tests/test_log_setup.py
+import sys
+import os
+import json
+import logging
+import logging.handlers
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+import pytest
+from log_setup import (
+    JsonLinesFormatter,
+    SamplingFilter,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    shutdown_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        if handler not in handlers:
+            handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _record(level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("core.services", level, __file__, 1, msg, args, None)
+
+
+def test_json_lines_formatter():
+    line = JsonLinesFormatter().format(_record(logging.INFO, "借阅 %s", "三体"))
+    entry = json.loads(line)
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "core.services"
+    assert entry["message"] == "借阅 三体"
+    assert "三体" in line  # 中文不转义
+
+
+def test_sampling_filter_keeps_warnings():
+    never = SamplingFilter(0.0)
+    assert not never.filter(_record(logging.INFO, "x"))
+    assert not never.filter(_record(logging.DEBUG, "x"))
+    assert never.filter(_record(logging.WARNING, "x"))
+    assert SamplingFilter(1.0).filter(_record(logging.INFO, "x"))
+
+
+def test_setup_logging_writes_in_background(tmp_path, restore_logging):
+    log_file = tmp_path / "app.log"
+    setup_logging(log_file=str(log_file), json_lines=True, console=False)
+    logger = logging.getLogger("core.services")
+    logger.info("用户 %s 借阅了图书 %s", "u1", "isbn-1")
+    logger.debug("级别没开，不会写")
+    shutdown_logging()  # 等后台线程把队列写完
+    entries = [json.loads(line) for line in log_file.read_text("utf-8").splitlines()]
+    assert [e["message"] for e in entries] == ["用户 u1 借阅了图书 isbn-1"]
+
+
+def test_setup_logging_is_idempotent(tmp_path, restore_logging):
+    setup_logging(console=False, log_file=str(tmp_path / "a.log"))
+    setup_logging(console=False, log_file=str(tmp_path / "b.log"), sample_rate=0.0)
+    logger = logging.getLogger("core.services")
+    logger.info("被采样丢掉")
+    logger.warning("总是保留")
+    shutdown_logging()
+    assert len(logging.getLogger().handlers) == 1  # 只剩 b.log，a.log 已被替换掉
+    assert (tmp_path / "a.log").read_text("utf-8") == ""
+    assert "总是保留" in (tmp_path / "b.log").read_text("utf-8")
+    assert "被采样丢掉" not in (tmp_path / "b.log").read_text("utf-8")
+
+
+def test_records_after_shutdown_are_written_directly(tmp_path, restore_logging):
+    log_file = tmp_path / "app.log"
+    setup_logging(log_file=str(log_file), console=False, sample_rate=0.0)
+    shutdown_logging()
+
+    logger = logging.getLogger("core.services")
+    logger.warning("关闭之后打的日志")  # 没有后台线程了：直接同步写，不会丢
+    logger.info("仍然按采样丢掉")
+
+    assert not any(
+        isinstance(h, logging.handlers.QueueHandler)
+        for h in logging.getLogger().handlers
+    )
+    text = log_file.read_text("utf-8")
+    assert "关闭之后打的日志" in text
+    assert "仍然按采样丢掉" not in text
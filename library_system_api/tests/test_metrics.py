@@ -0,0 +1,58 @@
+# tests/test_metrics.py
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book
+from infrastructure.async_repos import AsyncBookRepo
+from infrastructure.in_memory_repos import InMemoryBookRepo
+from infrastructure.json_repos import JsonBookRepo
+from infrastructure.metrics import (
+    FILE_WRITE_BYTES,
+    REPO_CALL_SECONDS,
+    MetricsRegistry,
+    registry,
+)
+
+
+class TestMetrics:
+    def test_histogram_renders_cumulative_buckets(self):
+        metrics = MetricsRegistry()
+        latency = metrics.histogram("t_seconds", "耗时", ("route",), buckets=(0.1, 1.0))
+        latency.observe(0.05, route="/a")
+        latency.observe(0.5, route="/a")
+        latency.observe(5, route="/a")
+        metrics.counter("t_total", "次数", ("route",)).inc(route='/"b"')
+
+        text = metrics.render()
+
+        assert "# TYPE t_seconds histogram" in text
+        assert 't_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 't_seconds_bucket{route="/a",le="1.0"} 2' in text
+        assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in text
+        assert 't_seconds_count{route="/a"} 3' in text
+        assert 't_total{route="/\\"b\\""} 1' in text
+        assert metrics.histogram("t_seconds", "耗时", ("route",)) is latency
+
+    def test_repo_calls_and_file_writes_are_recorded(self, tmp_path):
+        books_file = tmp_path / "metrics_books.json"
+        before = REPO_CALL_SECONDS.count(repo="books", method="save")
+        repo = AsyncBookRepo(JsonBookRepo(books_file))
+
+        asyncio.run(repo.save(Book("1", "西游记", "吴承恩")))
+
+        assert REPO_CALL_SECONDS.count(repo="books", method="save") == before + 1
+        written = FILE_WRITE_BYTES.value(file="metrics_books.json")
+        assert written == books_file.stat().st_size
+        assert 'library_repo_call_seconds_count{repo="books",method="save"}' in (
+            registry.render()
+        )
+
+    def test_reads_in_event_loop_are_recorded(self):
+        before = REPO_CALL_SECONDS.count(repo="books", method="get_many")
+        repo = AsyncBookRepo(InMemoryBookRepo(), offload_reads=False)
+
+        asyncio.run(repo.get_many(["1"]))
+
+        assert REPO_CALL_SECONDS.count(repo="books", method="get_many") == before + 1
@@ -0,0 +1,236 @@
+# tests/test_sqlite_repos.py
+import sys
+import os
+import multiprocessing
+import random
+import sqlite3
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))  # 添加父目录
+from core.models import Book, User
+from core.services import DAY_SECONDS, LibraryService
+from core.text import rank_completions
+from config import Settings
+from infrastructure import sqlite_repos
+from infrastructure.factory import create_repos
+from infrastructure.sqlite_repos import SqliteBookRepo, SqliteUserRepo
+
+
+def _borrow_in_worker(db_path, user_id, results):
+    # 模拟一个 uvicorn worker：自己的进程、自己的仓库和 service
+    user_repo = SqliteUserRepo(db_path)
+    service = LibraryService(SqliteBookRepo(db_path), user_repo)
+    results.put(service.borrow_book("1", user_id))
+
+
+class TestSqliteRepos:
+    def test_borrow_and_return_persist(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        book_repo = SqliteBookRepo(db_path)
+        user_repo = SqliteUserRepo(db_path)
+        user_repo.save(User("u1", "Alice"))
+        service = LibraryService(book_repo, user_repo)
+        service.add_book("1", "西游记", "吴承恩")
+        service.add_book("2", "水浒传", "施耐庵")
+
+        assert service.borrow_book("1", "u1") is True
+        assert service.borrow_book("1", "u1") is False  # 已被借出
+        book_repo.close()
+        user_repo.close()
+
+        reopened = SqliteBookRepo(db_path)
+        assert reopened.get_by_isbn("1").borrowed_by == "u1"
+        assert [b.isbn for b in reopened.list_by_borrower("u1")] == ["1"]
+        assert len(reopened.list_all()) == 2
+        reopened.close()
+
+    def test_uses_wal_and_indexes(self, tmp_path):
+        repo = SqliteBookRepo(tmp_path / "library.db")
+        conn = repo._db.connection()
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM books WHERE borrowed_by = 'u1'"
+        ).fetchall()
+        assert "idx_books_borrowed_by" in str(plan)
+        repo.close()
+
+    def test_get_many_queries_in_chunks(self, tmp_path):
+        repo = SqliteBookRepo(tmp_path / "library.db")
+        repo.save_many([Book(f"{i:04d}", f"书{i}", "作者") for i in range(1200)])
+
+        isbns = [f"{i:04d}" for i in range(0, 1200, 2)] + ["missing"]
+        books = repo.get_many(isbns)  # 超过一条 SQL 的参数上限，要分批
+
+        assert len(books) == 600
+        assert books["0598"].title == "书598"
+
+    def test_borrow_many_in_one_transaction(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        user_repo = SqliteUserRepo(db_path)
+        user_repo.save(User("u1", "Alice"))
+        service = LibraryService(SqliteBookRepo(db_path), user_repo)
+        service.add_books([Book("1", "A", "X"), Book("2", "B", "Y")])
+        service.borrow_book("2", "u1")
+
+        results = service.borrow_many("u1", ["1", "2", "3"])
+
+        assert results == {"1": "ok", "2": "unavailable", "3": "not_found"}
+        assert SqliteBookRepo(db_path).get_by_isbn("1").borrowed_by == "u1"
+        assert service.return_many(["1", "2"]) == {"1": "ok", "2": "ok"}
+
+    def test_version_bumped_on_every_change(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        conn = sqlite3.connect(db_path)  # 没有 version 列的旧数据库
+        conn.execute(
+            "CREATE TABLE books (isbn TEXT PRIMARY KEY, title TEXT NOT NULL, "
+            "author TEXT NOT NULL, is_borrowed INTEGER NOT NULL DEFAULT 0, "
+            "borrowed_by TEXT) WITHOUT ROWID"
+        )
+        conn.execute("INSERT INTO books VALUES ('1', 'A', 'X', 0, NULL)")
+        conn.commit()
+        conn.close()
+        repo = SqliteBookRepo(db_path)
+        assert repo.get_by_isbn("1").version == 0
+
+        book = Book("1", "A", "X")
+        repo.save(book)
+        assert book.version == 1
+        assert repo.try_borrow("1", "u1")
+        assert repo.try_borrow_many(["1"], "u2") == []  # 没改成功，版本不变
+        assert repo.try_return_many(["1"]) == ["1"]
+        assert repo.get_by_isbn("1").version == 3
+
+    def test_overdue_uses_due_at_index(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        user_repo = SqliteUserRepo(db_path)
+        user_repo.save(User("u1", "Alice"))
+        book_repo = SqliteBookRepo(db_path)
+        service = LibraryService(book_repo, user_repo, loan_days=1)
+        service.add_books(
+            [Book("1", "A", "X"), Book("2", "B", "Y"), Book("3", "C", "Z")]
+        )
+        service.borrow_book("1", "u1")
+        service.borrow_many("u1", ["2", "3"])
+        service.return_many(["3"])
+
+        later = time.time() + 2 * DAY_SECONDS
+        assert [b.isbn for b in service.overdue(later)] == ["1", "2"]
+        assert [b.isbn for b in service.overdue(later, limit=1)] == ["1"]
+        assert service.overdue() == []
+        assert book_repo.get_by_isbn("3").due_at is None  # 还书时清掉
+        conn = book_repo._db.connection()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM books WHERE due_at <= 0 "
+            "ORDER BY due_at, isbn"
+        ).fetchall()
+        assert "idx_books_due_at" in str(plan)
+        book_repo.close()
+
+    def test_iter_books_uses_keyset_pages(self, tmp_path):
+        repo = SqliteBookRepo(tmp_path / "library.db")
+        repo.save_many([Book(f"{i:04d}", f"书{i}", "作者") for i in range(1200)])
+
+        page = list(repo.iter_books(after_isbn="0999", limit=10))
+        everything = list(repo.iter_books())
+
+        assert [b.isbn for b in page] == [f"{i:04d}" for i in range(1000, 1010)]
+        assert len(everything) == 1200
+        repo.close()
+
+    def test_search_matches_in_memory_ranking(self, tmp_path):
+        repo = SqliteBookRepo(tmp_path / "library.db")
+        repo.save_many(
+            [
+                Book("1", "西游记", "吴承恩"),
+                Book("2", "水浒传", "施耐庵"),
+                Book("3", "吴承恩传", "某人"),
+            ]
+        )
+        repo.save(Book("2", "水浒传", "施耐庵", is_borrowed=True, borrowed_by="u1"))
+
+        assert [b.isbn for b in repo.search("吴承恩")] == ["3", "1"]
+        assert [b.isbn for b in repo.search("水浒")] == ["2"]
+        assert repo.search("红楼梦") == []
+        repo.close()
+
+    def test_suggest_counts_titles_and_authors(self, tmp_path):
+        repo = SqliteBookRepo(tmp_path / "library.db")
+        repo.save_many(
+            [
+                Book("1", "西游记", "吴承恩"),
+                Book("2", "西游记", "吴承恩"),
+                Book("3", "西厢记", "王实甫"),
+            ]
+        )
+        repo.save(Book("3", "Python", "Guido"))  # 改名后旧书名要消失
+
+        assert repo.suggest("西") == ["西游记"]
+        assert repo.suggest("py") == ["Python"]
+        assert repo.stats() == {
+            "books": 3,
+            "suggest_terms": 4,
+            "suggest_hot_prefixes": 0,
+        }
+        repo.close()
+
+    def test_hot_prefixes_match_full_scan(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sqlite_repos, "SUGGEST_SCAN_LIMIT", 5)  # 多于 5 个词算热门
+        db_path = tmp_path / "library.db"
+        repo = SqliteBookRepo(db_path)
+        rng = random.Random(7)
+        books = {}
+        for _ in range(300):  # 反复改名：词的次数有增有减，热门候选要跟着变
+            isbn = str(rng.randrange(60))
+            title = "".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+            books[isbn] = Book(isbn, title, rng.choice(["ann", "bob", "al"]))
+            repo.save(books[isbn])
+        prefixes = ["a", "b", "ab", "ba", "aab", "an", "x"]
+
+        assert repo.stats()["suggest_hot_prefixes"] > 0
+        for prefix in prefixes:
+            assert repo.suggest(prefix) == rank_completions(books.values(), prefix, 10)
+        repo.close()
+
+        conn = sqlite3.connect(db_path)  # 模拟还没有 suggest_top 数据的旧数据库
+        with conn:
+            conn.execute("DELETE FROM suggest_top")
+        conn.close()
+        reopened = SqliteBookRepo(db_path)
+        for prefix in prefixes:
+            assert reopened.suggest(prefix) == rank_completions(
+                books.values(), prefix, 10
+            )
+        reopened.close()
+
+    def test_only_one_process_can_borrow_a_book(self, tmp_path):
+        db_path = tmp_path / "library.db"
+        user_repo = SqliteUserRepo(db_path)
+        for i in range(4):
+            user_repo.save(User(f"u{i}", f"用户{i}"))
+        service = LibraryService(SqliteBookRepo(db_path), user_repo)
+        service.add_book("1", "西游记", "吴承恩")
+
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=_borrow_in_worker, args=(db_path, f"u{i}", results))
+            for i in range(4)
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        assert sorted(results.get() for _ in workers) == [False, False, False, True]
+        assert SqliteBookRepo(db_path).try_return("1")
+        assert not SqliteBookRepo(db_path).try_return("1")
+
+    def test_multiple_workers_require_sqlite(self, tmp_path):
+        settings = Settings()
+        settings.DATA_DIR = tmp_path
+        settings.WORKERS = 4
+        with pytest.raises(ValueError):
+            create_repos(settings)  # 默认的 json 存储不能多进程